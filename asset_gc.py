@@ -0,0 +1,166 @@
+"""Find image files nothing uses any more, and move them out of the site.
+
+Deleting a product or replacing its photo leaves the old file in assets/,
+and it keeps being pushed with every publish.  ``scan`` compares the
+images the catalog, the dashboard's edit journal (anything undo could
+bring back) and the storefront pages refer to with what is on disk:
+assets/ and stray folders such as "New folder/".  Sizes come from the
+asset manifest and a directory listing; nothing is hashed, so a scan
+stays cheap however many photos there are.
+
+An imported photo and its downscaled variants live and die together: the
+group is kept if the catalog uses any of them.  ``quarantine`` moves the
+orphans to .asset-quarantine/<time>/ (outside everything that is
+published) and drops them from the manifest; moving a folder back
+restores them.
+
+Stray folders are outside the published paths (and never deployed), so a
+publish does not commit their removal: quarantine only cleans the local
+copy, and a stray folder tracked in git needs its removal committed by hand.
+"""
+import os
+import re
+import time
+
+from asset_store import MANIFEST_NAME, load_manifest, save_manifest
+from journal import logged_records
+
+QUARANTINE_DIR = ".asset-quarantine"
+STRAY_DIRS = ["New folder"]
+
+# "assets/..." image refs written into index.html, stylesheets or app.js
+_SITE_REF = re.compile(r"assets/[^\"'()<>\n]+?\.(?:png|jpe?g|webp|gif|svg|avif)", re.I)
+_SITE_FILES = ("index.html", "styles", "scripts/app.js")
+
+
+def catalog_refs(store):
+    """Every image ref used by a product (main, gallery, variants) or category."""
+    return record_refs(store.products, store.categories)
+
+
+def journal_refs(folder):
+    """Image refs of the records in the journal at ``folder``: unflushed edits
+    and the versions undo / redo can restore."""
+    return record_refs(*logged_records(folder))
+
+
+def record_refs(products, categories):
+    refs = set()
+    for p in products:
+        refs.update(p.get("images") or ())
+        if p.get("image"):
+            refs.add(p["image"])
+        for v in (p.get("variants") or {}).values():
+            refs.update(v.values())
+    refs.update(c["image"] for c in categories if c.get("image"))
+    return refs
+
+
+def site_refs(base_dir):
+    """assets/ refs hard-coded in the storefront sources."""
+    paths = []
+    for rel in _SITE_FILES:
+        path = os.path.join(base_dir, rel)
+        if os.path.isdir(path):
+            paths += [os.path.join(path, n) for n in os.listdir(path) if n.endswith(".css") and ".min." not in n]
+        else:
+            paths.append(path)
+    refs = set()
+    for path in paths:
+        try:
+            with open(path, encoding="utf-8", errors="replace") as f:
+                refs.update(_SITE_REF.findall(f.read()))
+        except OSError:
+            pass
+    return refs
+
+
+def _listing(folder, prefix):
+    # {ref: size} for the files under ``folder``, refs relative to the site root
+    out = {}
+    try:
+        entries = list(os.scandir(folder))
+    except OSError:
+        return out
+    for e in entries:
+        if e.name.startswith(".") or e.name == MANIFEST_NAME:
+            continue
+        ref = prefix + e.name
+        if e.is_dir(follow_symlinks=False):
+            out.update(_listing(e.path, ref + "/"))
+        elif e.is_file(follow_symlinks=False):
+            out[ref] = e.stat().st_size
+    return out
+
+
+class AssetGC:
+    """Orphan report / quarantine for one site folder.
+
+    ``scan(refs)`` returns a dict: ``orphans`` [(ref, size, reason)] with
+    reason "unused" (imported photo nothing uses), "variant" (resized copy
+    of one), "untracked" (file in assets/ the manifest does not know) or
+    "stray" (outside assets/); ``orphan_bytes``; ``kept`` / ``kept_bytes``;
+    ``dead_blobs`` (manifest keys to drop) and ``took`` in seconds.
+    """
+
+    def __init__(self, base_dir, assets_dir="assets", stray_dirs=STRAY_DIRS):
+        self.base_dir = base_dir
+        self.assets_rel = assets_dir
+        self.assets_dir = os.path.join(base_dir, assets_dir)
+        self.stray_dirs = list(stray_dirs)
+
+    def scan(self, refs):
+        start = time.perf_counter()
+        files = _listing(self.assets_dir, self.assets_rel + "/")
+        blobs = load_manifest(self.assets_dir)
+        orphans, dead, grouped = [], [], set()
+        for digest, blob in blobs.items():
+            group = [blob["ref"], *blob.get("variants", {}).values()]
+            grouped.update(group)
+            if refs.isdisjoint(group):
+                dead.append(digest)
+                orphans += [(ref, files[ref], "unused" if ref == blob["ref"] else "variant")
+                            for ref in group if ref in files]
+        orphans += [(ref, size, "untracked") for ref, size in files.items()
+                    if ref not in grouped and ref not in refs]
+        for folder in self.stray_dirs:
+            stray = _listing(os.path.join(self.base_dir, folder), folder + "/")
+            orphans += [(ref, size, "stray") for ref, size in stray.items() if ref not in refs]
+        orphans.sort()
+        orphan_bytes = sum(size for _, size, _ in orphans)
+        return {"orphans": orphans, "orphan_bytes": orphan_bytes,
+                "kept": len(files) - sum(1 for _, _, why in orphans if why != "stray"),
+                "kept_bytes": sum(files.values()) - sum(s for _, s, why in orphans if why != "stray"),
+                "dead_blobs": dead, "took": time.perf_counter() - start}
+
+    def quarantine(self, report):
+        """Move the report's orphans under .asset-quarantine/<time>/; returns that folder."""
+        dest = os.path.join(self.base_dir, QUARANTINE_DIR, time.strftime("%Y%m%d-%H%M%S"))
+        for ref, _, _ in report["orphans"]:
+            src = os.path.join(self.base_dir, *ref.split("/"))
+            target = os.path.join(dest, *ref.split("/"))
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(src, target)
+        if report["dead_blobs"]:
+            blobs = load_manifest(self.assets_dir)
+            for digest in report["dead_blobs"]:
+                blobs.pop(digest, None)
+            save_manifest(self.assets_dir, blobs)
+        for folder in self.stray_dirs:
+            # Drop stray folders that are now empty
+            for root, _, _ in os.walk(os.path.join(self.base_dir, folder), topdown=False):
+                try:
+                    os.rmdir(root)
+                except OSError:
+                    pass
+        return dest
+
+
+def format_gc_report(report, limit=50):
+    lines = [f"  {why:9} {size:>12,} B  {ref}" for ref, size, why in report["orphans"][:limit]]
+    if len(report["orphans"]) > limit:
+        lines.append(f"  ... and {len(report['orphans']) - limit} more")
+    lines.append(f"{len(report['orphans'])} orphan files, {report['orphan_bytes']:,} bytes reclaimable;"
+                 f" {report['kept']} files ({report['kept_bytes']:,} bytes) in use"
+                 f" (scanned in {report['took'] * 1000:.0f} ms)")
+    return "\n".join(lines)
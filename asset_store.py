@@ -0,0 +1,167 @@
+"""Content-addressed image storage under assets/.
+
+Imported files are stored as ``assets/<sha256 prefix><ext>``, so two
+different photos called ``1.jpg`` no longer overwrite each other and the
+same photo added twice is stored once.  ``assets/manifest.json`` maps each
+content hash to its stored file (plus size and original file name);
+files that were already in assets/ before the manifest existed are adopted
+under their current names the first time the store is opened.  The
+original names are nobody else's business, so the manifest stays local:
+it is gitignored and the site build does not copy it.
+
+Imports also get downscaled variants (see image_variants.py), built in a
+process pool so several large photos use all cores.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import image_variants
+from catalog import file_mode, write_atomic
+from metrics import Metrics
+
+MANIFEST_NAME = "manifest.json"
+HASH_PREFIX = 20
+_CHUNK = 1 << 20
+
+
+def hash_file(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(_CHUNK), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def load_manifest(assets_dir):
+    """{sha256: blob} from assets/manifest.json; {} if missing or unreadable."""
+    try:
+        with open(os.path.join(assets_dir, MANIFEST_NAME), "r", encoding="utf-8") as f:
+            return json.load(f).get("blobs", {})
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(assets_dir, blobs):
+    data = json.dumps({"version": 1, "blobs": blobs}, ensure_ascii=False, indent=1, sort_keys=True)
+    write_atomic(os.path.join(assets_dir, MANIFEST_NAME), data.encode("utf-8"))
+
+
+def is_ref(src):
+    """True for values that are already usable in the catalog."""
+    return src.startswith(("http://", "https://", "assets/"))
+
+
+class AssetStore:
+    def __init__(self, assets_dir, workers=4, variants=True, metrics=None):
+        self.dir = assets_dir
+        self.metrics = metrics or Metrics()  # "asset_copy" timings
+        self.manifest_path = os.path.join(assets_dir, MANIFEST_NAME)
+        self.blobs = {}   # sha256 -> {"ref", "size", "name", "variants"?}
+        self._by_ref = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="assets")
+        self.make_variants = variants and image_variants.available()
+        self._procs = None  # started on first use
+        os.makedirs(assets_dir, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        self.blobs = load_manifest(self.dir)  # unreadable: rebuilt from the files below
+        self._by_ref = {b["ref"]: digest for digest, b in self.blobs.items()}
+        derived = {v for b in self.blobs.values() for v in b.get("variants", {}).values()}
+        adopted = False
+        for name in sorted(os.listdir(self.dir)):
+            ref = f"assets/{name}"
+            path = os.path.join(self.dir, name)
+            if (name == MANIFEST_NAME or name.startswith(".") or ref in self._by_ref
+                    or ref in derived or not os.path.isfile(path)):
+                continue
+            digest = hash_file(path)
+            if digest not in self.blobs:
+                self.blobs[digest] = {"ref": ref, "size": os.path.getsize(path), "name": name}
+                self._by_ref[ref] = digest
+                adopted = True
+        if adopted:
+            self._save()
+
+    def _save(self):
+        save_manifest(self.dir, self.blobs)
+
+    def path(self, ref):
+        return os.path.join(self.dir, ref[len("assets/"):])
+
+    def label(self, ref):
+        """Human-friendly name for a stored ref (the original file name)."""
+        digest = self._by_ref.get(ref)
+        if digest:
+            return self.blobs[digest].get("name") or os.path.basename(ref)
+        return os.path.basename(ref)
+
+    def variants(self, ref):
+        """{variant name: ref} for a stored image, or None."""
+        digest = self._by_ref.get(ref)
+        return self.blobs[digest].get("variants") if digest else None
+
+    def ingest(self, src):
+        """Store ``src`` (a local file) and return its ``assets/...`` ref."""
+        if is_ref(src):
+            return src
+        with self.metrics.span("asset_copy") as m:
+            digest = hash_file(src)
+            with self._lock:
+                blob = self.blobs.get(digest)
+                have = blob is not None and os.path.exists(self.path(blob["ref"]))
+            ref = blob["ref"] if have else self._copy_in(src, digest)
+            m.update(bytes=0 if have else os.path.getsize(self.path(ref)), dedup=have)
+            if not (have and blob.get("variants")):
+                self._build_variants(digest, ref)
+        return ref
+
+    def _copy_in(self, src, digest):
+        ext = os.path.splitext(src)[1].lower()
+        ref = f"assets/{digest[:HASH_PREFIX]}{ext}"
+        fd, tmp = tempfile.mkstemp(prefix=".tmp-", dir=self.dir)
+        os.close(fd)
+        try:
+            shutil.copyfile(src, tmp)
+            os.chmod(tmp, file_mode(self.path(ref)))
+            os.replace(tmp, self.path(ref))
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        with self._lock:
+            self.blobs[digest] = {"ref": ref, "size": os.path.getsize(self.path(ref)),
+                                  "name": os.path.basename(src)}
+            self._by_ref[ref] = digest
+            self._save()
+        return ref
+
+    def _build_variants(self, digest, ref):
+        if not self.make_variants:
+            return
+        with self._lock:
+            if self._procs is None:
+                self._procs = ProcessPoolExecutor()
+            procs = self._procs
+        try:
+            out = procs.submit(image_variants.build_variants, self.path(ref), self.dir, digest[:HASH_PREFIX]).result()
+        except (OSError, ValueError):
+            return  # not decodable by Pillow: the original is still served as-is
+        with self._lock:
+            self.blobs[digest]["variants"] = out
+            self._save()
+
+    def submit(self, src):
+        """Ingest on the worker pool; returns a Future resolving to the ref."""
+        return self._pool.submit(self.ingest, src)
+
+    def shutdown(self):
+        self._pool.shutdown(wait=True)
+        if self._procs is not None:
+            self._procs.shutdown(wait=True)
@@ -0,0 +1,93 @@
+"""Bulk edits over a set of products (dashboard batch mode).
+
+``batch_changes`` works out the new field values for every picked product
+up front and refuses the whole batch if any of them would be invalid, so a
+batch is applied completely or not at all.  The caller applies the result
+with ``apply_batch`` and then writes and publishes once.
+"""
+import math
+
+from catalog_io import clean_number
+
+# op code -> label shown in the dashboard
+OPS = {
+    "price_pct": "تغيير السعر بنسبة %",
+    "price_add": "زيادة/خفض السعر بمبلغ",
+    "stock_set": "تعيين المخزون",
+    "stock_add": "إضافة/خصم من المخزون",
+    "category": "نقل إلى قسم",
+}
+
+
+def parse_amount(text):
+    """Number typed in the batch bar: Arabic-Indic digits, separators and a sign are fine."""
+    text = clean_number(str(text).replace("%", ""))
+    try:
+        val = int(text)
+    except ValueError:
+        try:
+            val = float(text)
+        except ValueError:
+            raise ValueError(f"قيمة غير صالحة: {text!r}") from None
+    if not math.isfinite(val):
+        raise ValueError(f"قيمة غير صالحة: {text!r}")
+    return val
+
+
+def _money(val, like):
+    # Keep whole-pound prices whole
+    return round(val) if isinstance(like, int) else round(val, 2)
+
+
+def batch_changes(store, pids, op, value):
+    """{pid: {field: new value}} for ``op`` over ``pids``; unchanged products are left out.
+
+    Price changes move ``old_price`` by the same factor / amount so existing
+    discounts keep their size.  Raises ValueError (message for the user)
+    when the value or any resulting price/stock is invalid.
+    """
+    out = {}
+    pids = [pid for pid in pids if store.product(pid) is not None]
+    if op == "category":
+        if store.category(value) is None:
+            raise ValueError("اختر القسم أولاً")
+        for pid in pids:
+            if store.product(pid).get("category_id") != value:
+                out[pid] = {"category_id": value}
+        return out
+    if op in ("stock_set", "stock_add") and value != int(value):
+        raise ValueError("المخزون يجب أن يكون عددًا صحيحًا")
+    if op == "price_pct" and value <= -100:
+        raise ValueError("النسبة يجب أن تكون أكبر من -100%")
+    for pid in pids:
+        p = store.product(pid)
+        if op in ("price_pct", "price_add"):
+            if op == "price_pct":
+                move = lambda v: _money(v * (1 + value / 100), v)
+            else:
+                move = lambda v: _money(v + value, v)
+            ch = {"price": move(p["price"])}
+            if p.get("old_price") is not None:
+                ch["old_price"] = move(p["old_price"])
+            if ch["price"] <= 0:
+                raise ValueError(f"سعر \"{p['name']}\" سيصبح {ch['price']}")
+        elif op == "stock_set":
+            if value < 0:
+                raise ValueError("المخزون لا يمكن أن يكون سالبًا")
+            ch = {"stock": int(value)}
+        elif op == "stock_add":
+            ch = {"stock": p.get("stock", 0) + int(value)}
+            if ch["stock"] < 0:
+                raise ValueError(f"مخزون \"{p['name']}\" سيصبح {ch['stock']}")
+        else:
+            raise ValueError(f"unknown batch operation {op!r}")
+        ch = {k: v for k, v in ch.items() if p.get(k) != v}
+        if ch:
+            out[pid] = ch
+    return out
+
+
+def apply_batch(store, changes):
+    for pid, ch in changes.items():
+        store.update_product(pid, ch)
+    return len(changes)
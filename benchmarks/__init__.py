@@ -0,0 +1,3 @@
+# Benchmarks for the catalog pipeline.  Run from the repository root, e.g.
+#   python -m benchmarks.bench_parse
+# The full suite (JSON results, regression check):  python -m benchmarks.suite
@@ -0,0 +1,50 @@
+"""Parse time of products.js: catalog.parse_catalog vs. the old regex scrub.
+
+    python -m benchmarks.bench_parse [sizes...]
+"""
+import json
+import re
+import sys
+import time
+
+from catalog import dumps_catalog, parse_catalog
+from benchmarks.synthetic import make_catalog
+
+
+def legacy_load(content):
+    # The pre-catalog.py load_data, kept here as the baseline.
+    p_match = re.search(r'var products = (\[.*?\]);', content, re.DOTALL)
+    c_match = re.search(r'var categories = (\[.*?\]);', content, re.DOTALL)
+
+    def scrub(js):
+        js = re.sub(r'(\w+):\s', r'"\1": ', js)
+        js = re.sub(r',\s*]', ']', js)
+        js = re.sub(r',\s*}', '}', js)
+        return json.loads(js)
+
+    return scrub(p_match.group(1)), scrub(c_match.group(1))
+
+
+def best_of(fn, arg, runs=3):
+    best = float("inf")
+    for _ in range(runs):
+        t = time.perf_counter()
+        fn(arg)
+        best = min(best, time.perf_counter() - t)
+    return best
+
+
+def main(sizes):
+    print(f"{'products':>9} {'MB':>7} {'parse_catalog':>14} {'legacy regex':>13}")
+    for n in sizes:
+        text = dumps_catalog(*make_catalog(n))
+        new = best_of(parse_catalog, text)
+        try:
+            old = f"{best_of(legacy_load, text) * 1000:11.0f}ms"
+        except ValueError:
+            old = f"{'failed':>13}"
+        print(f"{n:>9} {len(text.encode()) / 1e6:>7.1f} {new * 1000:>12.0f}ms {old}")
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or [10_000, 100_000])
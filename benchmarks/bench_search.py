@@ -0,0 +1,54 @@
+"""Search latency at 20k products: prebuilt SearchIndex vs. linear scans.
+
+"dashboard scan" is the old refresh_product_table filter; "normalizing scan"
+is what app.js did per keystroke (normalize every name/category first).
+
+    python -m benchmarks.bench_search [n_products]
+"""
+import sys
+import time
+
+from search_index import SearchIndex, normalize_arabic
+from benchmarks.synthetic import make_catalog
+
+QUERIES = ["ج", "ضغط", "جهاز قياس", "Omron", "1234", "غير موجود"]
+
+
+def dashboard_scan(products, q):
+    q = q.lower()
+    return [p["id"] for p in products if q in p["name"].lower() or q in str(p["id"])]
+
+
+def normalizing_scan(products, cats, q):
+    q = normalize_arabic(q)
+    return [p["id"] for p in products
+            if q in normalize_arabic(p["name"]) or q in normalize_arabic(cats.get(p["category_id"], ""))]
+
+
+def ms(fn, runs=5):
+    best = float("inf")
+    for _ in range(runs):
+        t = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t)
+    return best * 1000
+
+
+def main(n):
+    products, categories = make_catalog(n)
+    cats = {c["id"]: c["name"] for c in categories}
+    t = time.perf_counter()
+    ix = SearchIndex(products, categories)
+    build = (time.perf_counter() - t) * 1000
+    size = len(ix.to_js().encode("utf-8"))
+    print(f"{n} products: index build {build:.0f}ms, search-index.js {size / 1e6:.1f} MB, {len(ix.postings)} grams")
+    print(f"{'query':>12} {'hits':>6} {'index':>9} {'dashboard scan':>15} {'normalizing scan':>17}")
+    for q in QUERIES:
+        hits = len(ix.search(q))
+        print(f"{q:>12} {hits:>6} {ms(lambda: ix.search(q)):>7.2f}ms"
+              f" {ms(lambda: dashboard_scan(products, q)):>13.2f}ms"
+              f" {ms(lambda: normalizing_scan(products, cats, q)):>15.2f}ms")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20_000)
@@ -0,0 +1,54 @@
+"""Per-row refresh and select cost: CatalogStore indexes vs. linear scans.
+
+Categories grow with the catalog (one per 100 products), which is what made
+the old refresh O(P x C).  With the indexes both columns should stay flat.
+
+    python -m benchmarks.bench_store [sizes...]
+"""
+import sys
+import time
+
+from catalog import CatalogStore
+from benchmarks.synthetic import make_catalog
+
+
+def legacy_refresh(products, categories):
+    rows = []
+    for p in products:
+        cn = next((c["name"] for c in categories if c["id"] == p.get("category_id")), "-")
+        rows.append((p["id"], p["name"], p["price"], p.get("stock", 0), cn))
+    return rows
+
+
+def store_refresh(store):
+    cat_name = store.category_name
+    return [(p["id"], p["name"], p["price"], p.get("stock", 0), cat_name(p.get("category_id")))
+            for p in store.products]
+
+
+def per_op_us(fn, ops, budget=0.5):
+    n, t0 = 0, time.perf_counter()
+    while True:
+        fn()
+        n += 1
+        elapsed = time.perf_counter() - t0
+        if elapsed > budget:
+            return elapsed / n / ops * 1e6
+
+
+def main(sizes):
+    print(f"{'products':>9} {'refresh/row':>12} {'legacy/row':>11} {'select':>9} {'legacy':>9}")
+    for n in sizes:
+        products, categories = make_catalog(n, n_categories=max(8, n // 100))
+        store = CatalogStore(products, categories)
+        ids = [p["id"] for p in products[:: max(1, n // 50)]]
+        refresh = per_op_us(lambda: store_refresh(store), n)
+        # The legacy refresh is O(P x C) with C growing with P: past 20k products it takes minutes
+        legacy = f"{per_op_us(lambda: legacy_refresh(products, categories), n):.2f}us" if n <= 20_000 else "skipped"
+        select = per_op_us(lambda: [store.product(i) for i in ids], len(ids))
+        legacy_select = per_op_us(lambda: [next(x for x in products if x["id"] == i) for i in ids], len(ids))
+        print(f"{n:>9} {refresh:>10.2f}us {legacy:>11} {select:>7.2f}us {legacy_select:>7.0f}us")
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or [1_000, 10_000, 100_000])
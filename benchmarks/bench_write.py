@@ -0,0 +1,52 @@
+"""Write latency of products.js at 50k products, against a fixed budget.
+
+    python -m benchmarks.bench_write [n_products]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from catalog import CatalogWriter, dumps_catalog
+from benchmarks.synthetic import make_catalog
+
+WRITE_BUDGET_MS = 250  # one dashboard edit at 50k products, compact + atomic
+
+
+def timed(fn):
+    t = time.perf_counter()
+    fn()
+    return (time.perf_counter() - t) * 1000
+
+
+def main(n):
+    products, categories = make_catalog(n)
+    with tempfile.TemporaryDirectory() as d:
+        legacy_path = os.path.join(d, "legacy.js")
+
+        def legacy():
+            with open(legacy_path, "w", encoding="utf-8") as f:
+                f.write(dumps_catalog(products, categories))
+
+        writer = CatalogWriter(os.path.join(d, "products.js"))
+        legacy_ms = timed(legacy)
+        write_ms = timed(lambda: writer.write(products, categories))
+        edited = products[n // 2]
+        edited["stock"] += 1
+        edit_ms = timed(lambda: writer.write(products, categories, dirty={edited["id"]}))
+        noop_ms = timed(lambda: writer.write(products, categories, dirty=()))
+        legacy_size = os.path.getsize(legacy_path)
+        size = os.path.getsize(writer.path)
+
+    print(f"{n} products")
+    print(f"  legacy indent=4 ascii  {legacy_ms:7.0f}ms  {legacy_size / 1e6:6.1f} MB (not atomic)")
+    print(f"  compact full write     {write_ms:7.0f}ms  {size / 1e6:6.1f} MB")
+    print(f"  single edit (cached)   {edit_ms:7.0f}ms")
+    print(f"  unchanged (skipped)    {noop_ms:7.0f}ms")
+    ok = edit_ms <= WRITE_BUDGET_MS
+    print(f"  budget {WRITE_BUDGET_MS}ms: {'OK' if ok else 'EXCEEDED'}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 50_000))
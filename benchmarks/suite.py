@@ -0,0 +1,216 @@
+"""The whole catalog pipeline at several catalog sizes, saved as JSON.
+
+Headless (no Tk): each step is what the dashboard does, minus the window.
+
+    load            products.js -> CatalogStore (load_data, journal miss)
+    index_build     SearchIndex over the catalog
+    search          median of the QUERIES against the index
+    check           catalog_check over the store
+    analytics       inventory_stats: totals / low stock / per category
+    commit_full     products.js, everything re-encoded
+    commit_edit     the same after editing one product (commit_to_js)
+    build_catalog   shards + search-index.js from scratch (the catalog part of build_site)
+    publish_stage   git status / stage / commit of that edit (publish, minus the push)
+    asset_ingest    hash + copy of ASSET_FILES new photos (once, not per size)
+
+Every run is written to benchmarks/results/<time>.json and compared with
+the newest earlier file there (or --baseline).  A step counts as a
+regression when it is more than --threshold slower and also slower by
+more than NOISE_MS; the exit status is 1 if any step regressed.
+
+    python -m benchmarks.suite [--sizes 1000 10000 100000] [--baseline FILE]
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from asset_store import AssetStore
+from catalog import CatalogStore, CatalogWriter, load_catalog
+from catalog_check import CatalogChecker
+from catalog_stats import inventory_stats
+from catalog_shards import ShardWriter
+from git_publish import GitPublisher
+from search_index import SearchIndex
+from benchmarks.bench_search import QUERIES
+from benchmarks.synthetic import make_catalog
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+SIZES = [1_000, 10_000, 100_000]
+ASSET_FILES = 20
+ASSET_BYTES = 256 * 1024
+NOISE_MS = 5.0
+
+
+def best_ms(fn, runs):
+    best = float("inf")
+    for _ in range(runs):
+        t = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t)
+    return round(best * 1000, 2)
+
+
+def git(cwd, *args):
+    subprocess.run(["git", *args], cwd=cwd, check=True, capture_output=True)
+
+
+def bench_size(n, runs, work):
+    out = {}
+    products, categories = make_catalog(n)
+    site = os.path.join(work, f"site-{n}")
+    scripts = os.path.join(site, "scripts")
+    os.makedirs(scripts)
+    products_js = os.path.join(scripts, "products.js")
+    CatalogWriter(products_js).write(products, categories)
+    out["products_js_bytes"] = os.path.getsize(products_js)
+
+    def load():
+        store = CatalogStore()
+        store.load(*load_catalog(products_js))
+        return store
+    out["load_ms"] = best_ms(load, runs)
+    store = load()
+
+    out["index_build_ms"] = best_ms(lambda: SearchIndex(store.products, store.categories), runs)
+    index = SearchIndex(store.products, store.categories)
+    per_query = sorted(best_ms(lambda: index.search(q), runs) for q in QUERIES)
+    out["search_ms"] = per_query[len(per_query) // 2]
+
+    checker = CatalogChecker(os.path.join(site, "assets"))
+    out["check_ms"] = best_ms(lambda: checker.check(store), runs)
+
+    out["analytics_ms"] = best_ms(lambda: inventory_stats(store.products, 5), runs)
+
+    writer = CatalogWriter(products_js)
+
+    def commit_full():
+        writer.digest = None  # force the write even though nothing changed
+        writer.write(store.products, store.categories)
+    out["commit_full_ms"] = best_ms(commit_full, runs)
+
+    pid = store.products[n // 2]["id"]
+
+    def commit_edit():
+        store.update_product(pid, {"stock": store.product(pid).get("stock", 0) + 1})
+        index.update(store, {pid})
+        writer.write(store.products, store.categories, {pid})
+    out["commit_edit_ms"] = best_ms(commit_edit, runs)
+
+    dist = os.path.join(work, f"dist-{n}", "scripts")
+
+    def build_catalog():
+        shutil.rmtree(dist, ignore_errors=True)
+        ShardWriter(os.path.join(dist, "catalog"), os.path.join(dist, "catalog-manifest.js")).write(
+            store.products, store.categories)
+        SearchIndex(store.products, store.categories).write(os.path.join(dist, "search-index.js"))
+    out["build_catalog_ms"] = best_ms(build_catalog, runs)
+
+    if shutil.which("git"):
+        git(site, "init", "-q", "-b", "main")
+        git(site, "add", "-A")
+        git(site, "commit", "-q", "-m", "base")
+        bare = os.path.join(work, f"remote-{n}.git")
+        git(work, "init", "-q", "--bare", bare)
+        git(site, "push", "-q", bare, "HEAD:refs/heads/main")
+        publisher = GitPublisher(site, ["scripts"], remote=bare, branch="main", retries=1)
+        stage = []
+        for _ in range(runs):
+            commit_edit()
+            report = publisher.publish("bench")
+            if not report["ok"]:
+                raise RuntimeError(report["error"])
+            t = report["timings"]
+            stage.append(t["scan"] + t.get("stage", 0) + t.get("commit", 0))
+        out["publish_stage_ms"] = round(min(stage) * 1000, 2)
+    return out
+
+
+def bench_assets(work):
+    src_dir = os.path.join(work, "photos")
+    os.makedirs(src_dir)
+    files = []
+    for i in range(ASSET_FILES):
+        path = os.path.join(src_dir, f"{i}.jpg")
+        with open(path, "wb") as f:
+            f.write(os.urandom(ASSET_BYTES))
+        files.append(path)
+    store = AssetStore(os.path.join(work, "assets"), variants=False)
+    try:
+        ms = best_ms(lambda: [fut.result() for fut in [store.submit(f) for f in files]], 1)
+    finally:
+        store.shutdown()
+    return {"asset_ingest_ms": ms, "asset_ingest_bytes": ASSET_FILES * ASSET_BYTES}
+
+
+def compare(results, baseline, threshold):
+    """[(size, step, before ms, after ms)] for steps that got slower."""
+    out = []
+    for size, steps in results.items():
+        for step, after in steps.items():
+            before = baseline.get(size, {}).get(step)
+            if (not step.endswith("_ms") or before is None
+                    or after <= before * (1 + threshold) or after - before <= NOISE_MS):
+                continue
+            out.append((size, step, before, after))
+    return out
+
+
+def latest_results():
+    files = sorted(glob.glob(os.path.join(RESULTS_DIR, "*.json")))
+    return files[-1] if files else None
+
+
+def main(argv):
+    ap = argparse.ArgumentParser(prog="python -m benchmarks.suite")
+    ap.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    ap.add_argument("--runs", type=int, default=3, help="best of N per step (default: %(default)s)")
+    ap.add_argument("--baseline", help="results file to compare with (default: the newest in benchmarks/results)")
+    ap.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown, 0.25 = 25%% (default: %(default)s)")
+    ap.add_argument("--out", help="where to write this run (default: benchmarks/results/<time>.json)")
+    args = ap.parse_args(argv)
+    if args.baseline and not os.path.isfile(args.baseline):
+        ap.error(f"--baseline: no such file: {args.baseline}")  # before minutes of benchmarking, not after
+    baseline_path = args.baseline or latest_results()
+    for var in ("GIT_AUTHOR_NAME", "GIT_COMMITTER_NAME"):
+        os.environ.setdefault(var, "bench")
+    for var in ("GIT_AUTHOR_EMAIL", "GIT_COMMITTER_EMAIL"):
+        os.environ.setdefault(var, "bench@localhost")
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="store-bench-") as work:
+        for n in args.sizes:
+            t = time.perf_counter()
+            results[str(n)] = bench_size(n, args.runs, work)
+            print(f"{n:>7} products  " + "  ".join(f"{k[:-3]} {v:.1f}" for k, v in results[str(n)].items()
+                                                  if k.endswith("_ms")) + f"  ({time.perf_counter() - t:.0f}s)")
+        results["assets"] = bench_assets(work)
+        print(f"{'assets':>7}           ingest {results['assets']['asset_ingest_ms']:.1f} ms for {ASSET_FILES} files")
+
+    run = {"time": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+           "platform": platform.platform(), "runs": args.runs, "results": results}
+    out = args.out or os.path.join(RESULTS_DIR, time.strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(run, f, indent=1)
+    print(f"results written to {out}")
+
+    if not baseline_path:
+        return 0
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)["results"]
+    slower = compare(results, baseline, args.threshold)
+    for size, step, before, after in slower:
+        print(f"REGRESSION {size} {step}: {before:.1f} -> {after:.1f} ms (+{(after / before - 1) * 100:.0f}%)")
+    print(f"compared with {baseline_path}: {len(slower) or 'no'} regression(s)")
+    return 1 if slower else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
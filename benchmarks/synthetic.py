@@ -0,0 +1,48 @@
+"""Deterministic synthetic catalogs with Arabic text for benchmarks."""
+import random
+
+_WORDS = [
+    "جهاز", "قياس", "ضغط", "سكر", "الدم", "كرسي", "متحرك", "سرير", "طبي",
+    "ميزان", "حرارة", "رقمي", "نيبولايزر", "أكسجين", "مشاية", "كمامة",
+    "قفازات", "شاش", "معقم", "سماعة", "طبية", "حزام", "ظهر", "رباط", "ركبة",
+    "Omron", "Beurer", "Rossmax", "Pro", "Max", "Plus",
+]
+_CATEGORIES = [
+    "الأجهزة", "مستلزمات العناية", "الكراسي المتحركة", "أجهزة القياس",
+    "مستلزمات التعقيم", "الأسرة الطبية", "الدعامات", "الإسعافات الأولية",
+]
+
+
+def make_categories(n=len(_CATEGORIES), seed=0):
+    rnd = random.Random(seed)
+    return [
+        {"id": i + 1,
+         "name": _CATEGORIES[i] if i < len(_CATEGORIES) else f"{rnd.choice(_CATEGORIES)} {i + 1}",
+         "image": f"assets/cat_{i + 1}.jpg"}
+        for i in range(n)
+    ]
+
+
+def make_products(n, categories, seed=0):
+    rnd = random.Random(seed)
+    out = []
+    for i in range(1, n + 1):
+        price = rnd.randint(50, 25000)
+        imgs = [f"assets/p{i}_{k}.jpg" for k in range(rnd.randint(0, 3))]
+        out.append({
+            "name": " ".join(rnd.choice(_WORDS) for _ in range(rnd.randint(2, 5))) + f" {i}",
+            "price": price,
+            "old_price": price + rnd.randint(10, 900) if rnd.random() < 0.4 else None,
+            "stock": rnd.randint(0, 200),
+            "description": " ".join(rnd.choice(_WORDS) for _ in range(rnd.randint(8, 30))),
+            "category_id": rnd.choice(categories)["id"],
+            "images": imgs,
+            "image": imgs[0] if imgs else "",
+            "id": i,
+        })
+    return out
+
+
+def make_catalog(n_products, n_categories=40, seed=0):
+    cats = make_categories(n_categories, seed)
+    return make_products(n_products, cats, seed), cats
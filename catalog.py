@@ -0,0 +1,591 @@
+"""Catalog engine for scripts/products.js.
+
+The storefront data file is a tiny JavaScript program made of
+``var products = [...];`` / ``var categories = [...];`` statements.  This
+module reads it with a single-pass tokenizer (tolerating the JS-isms a hand
+edit leaves behind: unquoted keys, single quotes, trailing commas, comments)
+and turns every array element into a normalized record as soon as it has been
+scanned, so callers can stream through very large catalogs.
+"""
+import hashlib
+import json
+import math
+import os
+import re
+import sys
+import tempfile
+from json.decoder import scanstring
+
+# Record schemas: field -> default.  Unknown fields are kept untouched so a
+# newer storefront can add data without the dashboard dropping it.
+PRODUCT_DEFAULTS = {
+    "name": "", "price": 0, "old_price": None, "stock": 0, "description": "",
+    "category_id": None, "images": [], "image": "",
+}
+CATEGORY_DEFAULTS = {"name": "", "image": ""}
+RECORD_KINDS = ("products", "categories")
+
+_WS = re.compile(r'(?:\s+|//[^\n]*|/\*.*?\*/)*', re.S)
+_IDENT = re.compile(r'[A-Za-z_$][\w$]*')
+_NUMBER = re.compile(r'[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?')
+_SQ_STRING = re.compile(r"'((?:[^'\\\n]|\\.)*)'", re.S)
+_SQ_ESCAPE = re.compile(r'\\.|"', re.S)
+_LITERALS = {"true": True, "false": False, "null": None, "undefined": None}
+_DECODER = json.JSONDecoder()
+
+
+def _read_umask():
+    # os.umask() can only be read by setting it, which would briefly give files
+    # other threads create a 0 umask; Linux reports it in /proc instead.
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("Umask:"):
+                    return int(line.split()[1], 8)
+    except (OSError, ValueError):
+        pass
+    return 0o022  # the usual default elsewhere (Windows only honours the read-only bit anyway)
+
+
+_UMASK = _read_umask()
+
+
+class CatalogError(ValueError):
+    """Malformed catalog data, with the exact location of the problem."""
+
+    def __init__(self, msg, text="", pos=0, path=None):
+        self.msg, self.pos, self.path = msg, pos, path
+        self.line = text.count("\n", 0, pos) + 1
+        self.col = pos - text.rfind("\n", 0, pos)
+        where = f"{path}:" if path else ""
+        super().__init__(f"{where}{self.line}:{self.col}: {msg}")
+
+
+def _requote(m):
+    # Re-escape a single-quoted JS string body so scanstring can decode it.
+    tok = m.group()
+    return '\\"' if tok == '"' else ("'" if tok == "\\'" else tok)
+
+
+class _Reader:
+    def __init__(self, text):
+        self.text = text
+        self.pos = 0
+
+    def error(self, msg, pos=None):
+        return CatalogError(msg, self.text, self.pos if pos is None else pos)
+
+    def skip(self):
+        self.pos = _WS.match(self.text, self.pos).end()
+        return self.text[self.pos:self.pos + 1]
+
+    def expect(self, ch):
+        if self.skip() != ch:
+            got = self.text[self.pos:self.pos + 1] or "end of file"
+            raise self.error(f"expected {ch!r}, found {got!r}")
+        self.pos += 1
+
+    def value(self):
+        ch = self.skip()
+        if ch == "{":
+            return self.obj()
+        if ch == "[":
+            return list(self.items())
+        if ch and ch in "\"'":
+            return self.string()
+        m = _NUMBER.match(self.text, self.pos)
+        if m:
+            self.pos = m.end()
+            num = m.group()
+            return float(num) if any(c in num for c in ".eE") else int(num)
+        m = _IDENT.match(self.text, self.pos)
+        if m and m.group() in _LITERALS:
+            self.pos = m.end()
+            return _LITERALS[m.group()]
+        raise self.error(f"unexpected {ch!r}" if ch else "unexpected end of file")
+
+    def string(self):
+        start = self.pos
+        if self.text[start] == '"':
+            try:
+                s, self.pos = scanstring(self.text, start + 1, False)
+            except json.JSONDecodeError as e:
+                raise self.error(e.msg, e.pos) from None  # already an offset into self.text
+            return s
+        m = _SQ_STRING.match(self.text, start)
+        if not m:
+            raise self.error("unterminated string", start)
+        body = _SQ_ESCAPE.sub(_requote, m.group(1))
+        self.pos = m.end()
+        try:
+            return scanstring(f'"{body}"', 1, False)[0]
+        except json.JSONDecodeError as e:
+            raise self.error(e.msg, start + e.pos) from None  # e.pos counts the added opening quote
+
+    def key(self):
+        ch = self.skip()
+        if ch and ch in "\"'":
+            return self.string()
+        m = _IDENT.match(self.text, self.pos) or _NUMBER.match(self.text, self.pos)
+        if not m:
+            raise self.error("expected property name")
+        self.pos = m.end()
+        return m.group()
+
+    def obj(self):
+        self.expect("{")
+        out = {}
+        while self.skip() != "}":
+            k = self.key()
+            self.expect(":")
+            out[k] = self.value()
+            if self.skip() == ",":
+                self.pos += 1
+            elif self.text[self.pos:self.pos + 1] != "}":
+                raise self.error("expected ',' or '}'")
+        self.pos += 1
+        return out
+
+    def items(self):
+        # Generator over the elements of an array.  Strict-JSON elements are
+        # handed to the C decoder in one call; anything else falls back to
+        # the tolerant reader above.  Yields (start_pos, value).
+        self.expect("[")
+        text = self.text
+        while self.skip() != "]":
+            start = self.pos
+            try:
+                val, self.pos = _DECODER.raw_decode(text, start)
+            except json.JSONDecodeError:
+                self.pos = start
+                val = self.value()
+            yield start, val
+            if self.skip() == ",":
+                self.pos += 1
+            elif text[self.pos:self.pos + 1] != "]":
+                raise self.error("expected ',' or ']'")
+        self.pos += 1
+
+
+def _number(val, field, rec_pos, reader, integer=False):
+    if isinstance(val, bool):
+        raise reader.error(f"{field!r} must be a number, not {val!r}", rec_pos)
+    if isinstance(val, str):
+        m = _NUMBER.fullmatch(val.strip())
+        if not m:
+            raise reader.error(f"{field!r} must be a number, not {val!r}", rec_pos)
+        val = float(m.group()) if any(c in m.group() for c in ".eE") else int(m.group())
+    if not isinstance(val, (int, float)) or not math.isfinite(val):  # NaN / Infinity are valid JSON to Python
+        raise reader.error(f"{field!r} must be a number, not {val!r}", rec_pos)
+    if integer:
+        if val != int(val):
+            raise reader.error(f"{field!r} must be a whole number, not {val!r}", rec_pos)
+        return int(val)
+    return val
+
+
+def normalize_product(rec, pos=0, reader=None):
+    reader = reader or _Reader("")
+    if not isinstance(rec, dict):
+        raise reader.error("product must be an object", pos)
+    if "id" not in rec:
+        raise reader.error("product without 'id'", pos)
+    rec["id"] = _number(rec["id"], "id", pos, reader, integer=True)
+    for k, default in PRODUCT_DEFAULTS.items():
+        if k not in rec:
+            rec[k] = list(default) if isinstance(default, list) else default
+    rec["name"] = str(rec["name"])
+    rec["price"] = _number(rec["price"], "price", pos, reader)
+    if rec["old_price"] not in (None, ""):
+        rec["old_price"] = _number(rec["old_price"], "old_price", pos, reader)
+    else:
+        rec["old_price"] = None
+    rec["stock"] = _number(rec["stock"] or 0, "stock", pos, reader, integer=True)
+    if rec["category_id"] not in (None, ""):
+        rec["category_id"] = _number(rec["category_id"], "category_id", pos, reader, integer=True)
+    else:
+        rec["category_id"] = None
+    if not isinstance(rec["images"], list):
+        rec["images"] = [rec["images"]] if rec["images"] else []
+    if rec["images"] and (not rec["image"] or rec["image"] == rec["images"][0]):
+        rec["image"] = rec["images"][0]  # one string object, not two equal copies
+    variants = rec.get("variants")
+    if isinstance(variants, dict):
+        rec["variants"] = {src: _interned(v) if isinstance(v, dict) else v for src, v in variants.items()}
+    return rec
+
+
+def normalize_category(rec, pos=0, reader=None):
+    reader = reader or _Reader("")
+    if not isinstance(rec, dict):
+        raise reader.error("category must be an object", pos)
+    if "id" not in rec:
+        raise reader.error("category without 'id'", pos)
+    rec["id"] = _number(rec["id"], "id", pos, reader, integer=True)
+    for k, default in CATEGORY_DEFAULTS.items():
+        rec.setdefault(k, default)
+    rec["name"] = str(rec["name"])
+    return rec
+
+
+_NORMALIZERS = {"products": normalize_product, "categories": normalize_category}
+
+
+def _interned(rec):
+    # Each record is decoded on its own, so without this every record holds
+    # its own copy of every key string (~50 bytes per key per product)
+    return {sys.intern(k): v for k, v in rec.items()}
+
+
+def iter_records(text):
+    """Yield ``(kind, record)`` for every product/category in file order.
+
+    Records are normalized as they are produced; other ``var`` statements
+    are parsed for syntax and skipped.
+    """
+    r = _Reader(text[1:] if text.startswith("﻿") else text)
+    while r.skip():
+        m = _IDENT.match(r.text, r.pos)
+        if m and m.group() in ("var", "let", "const"):
+            r.pos = m.end()
+            r.skip()
+            m = _IDENT.match(r.text, r.pos)
+        if not m:
+            raise r.error("expected 'var <name> = ...'")
+        name = m.group()
+        r.pos = m.end()
+        r.expect("=")
+        norm = _NORMALIZERS.get(name)
+        if norm is None:
+            r.value()
+        else:
+            if r.skip() != "[":
+                raise r.error(f"{name} must be an array")
+            for pos, rec in r.items():
+                yield name, _interned(norm(rec, pos, r))
+        if r.skip() == ";":
+            r.pos += 1
+
+
+def parse_catalog(text):
+    """Return ``(products, categories)`` lists parsed from products.js text."""
+    out = {k: [] for k in RECORD_KINDS}
+    for kind, rec in iter_records(text):
+        out[kind].append(rec)
+    return out["products"], out["categories"]
+
+
+def load_catalog(path):
+    with open(path, "r", encoding="utf-8-sig") as f:
+        text = f.read()
+    try:
+        return parse_catalog(text)
+    except CatalogError as e:
+        raise CatalogError(e.msg, text, e.pos, path) from None
+
+
+class CatalogStore:
+    """In-memory catalog with O(1) lookups.
+
+    ``products`` / ``categories`` stay plain lists of dicts in file order (that
+    is what gets serialized); the indexes below are kept in step by the
+    mutating methods, so always go through them instead of editing the lists.
+    """
+
+    def __init__(self, products=(), categories=()):
+        self.load(products, categories)
+
+    def load(self, products, categories):
+        self.products = list(products)
+        self.categories = list(categories)
+        self._by_id = {}
+        self._by_category = {}
+        for p in self.products:
+            self._by_id[p["id"]] = p
+            self._by_category.setdefault(p.get("category_id"), {})[p["id"]] = None
+        self._cat_by_id = {c["id"]: c for c in self.categories}
+        self._cat_by_name = {}
+        for c in self.categories:
+            self._cat_by_name.setdefault(c["name"], c)
+        self._next_pid = max(self._by_id, default=0) + 1
+        self._next_cid = max(self._cat_by_id, default=0) + 1
+        self._pos = None  # pid -> index in products; built on demand, dropped when rows shift
+
+    # --- Products ---
+    def product(self, pid):
+        return self._by_id.get(pid)
+
+    def products_in(self, cid):
+        """Ids of the products in category ``cid``, in insertion order."""
+        return list(self._by_category.get(cid, ()))
+
+    def next_product_id(self):
+        return self._next_pid
+
+    def add_product(self, data):
+        pid = data.get("id")
+        if pid is None or pid in self._by_id:
+            pid = data["id"] = self._next_pid
+        self._next_pid = max(self._next_pid, pid + 1)
+        self.products.append(data)
+        if self._pos is not None:
+            self._pos[pid] = len(self.products) - 1
+        self._by_id[pid] = data
+        self._by_category.setdefault(data.get("category_id"), {})[pid] = None
+        return pid
+
+    def update_product(self, pid, data):
+        p = self._by_id.get(pid)
+        if p is None:
+            return None
+        old_cid = p.get("category_id")
+        p.update(data)
+        p["id"] = pid
+        if p.get("category_id") != old_cid:
+            self._unlink(old_cid, pid)
+            self._by_category.setdefault(p.get("category_id"), {})[pid] = None
+        return p
+
+    def product_index(self, pid):
+        """Position of ``pid`` in ``products``, or None.  The first call after
+        an insert or removal in the middle rebuilds the map (a scan)."""
+        if self._pos is None:
+            self._pos = {p["id"]: i for i, p in enumerate(self.products)}
+        return self._pos.get(pid)
+
+    def put_product(self, rec, index=None):
+        """Replace the product with ``rec``'s id in place, or insert ``rec``
+        at ``index`` (default: the end).  Used to replay and undo edits."""
+        pid = rec["id"]
+        p = self._by_id.get(pid)
+        if p is not None:
+            old_cid = p.get("category_id")
+            p.clear()
+            p.update(rec)
+            if p.get("category_id") != old_cid:
+                self._unlink(old_cid, pid)
+                self._by_category.setdefault(p.get("category_id"), {})[pid] = None
+            return p
+        p = dict(rec)
+        if index is None or index >= len(self.products):
+            self.products.append(p)
+            if self._pos is not None:
+                self._pos[pid] = len(self.products) - 1
+        else:
+            self.products.insert(index, p)
+            self._pos = None
+        self._by_id[pid] = p
+        self._by_category.setdefault(p.get("category_id"), {})[pid] = None
+        self._next_pid = max(self._next_pid, pid + 1)
+        return p
+
+    def remove_product(self, pid):
+        p = self._by_id.pop(pid, None)
+        if p is None:
+            return None
+        self.products = [x for x in self.products if x["id"] != pid]
+        self._pos = None
+        self._unlink(p.get("category_id"), pid)
+        return p
+
+    def remove_products(self, pids):
+        """Remove several products in one pass over the list; returns the removed records."""
+        gone = [self._by_id.pop(pid) for pid in set(pids) if pid in self._by_id]
+        if gone:
+            ids = {p["id"] for p in gone}
+            self.products = [x for x in self.products if x["id"] not in ids]
+            self._pos = None
+            for p in gone:
+                self._unlink(p.get("category_id"), p["id"])
+        return gone
+
+    def _unlink(self, cid, pid):
+        bucket = self._by_category.get(cid)
+        if bucket is not None:
+            bucket.pop(pid, None)
+            if not bucket:
+                del self._by_category[cid]
+
+    # --- Categories ---
+    def category(self, cid):
+        return self._cat_by_id.get(cid)
+
+    def category_by_name(self, name):
+        return self._cat_by_name.get(name)
+
+    def category_name(self, cid, default="-"):
+        c = self._cat_by_id.get(cid)
+        return c["name"] if c else default
+
+    def add_category(self, name, image=""):
+        c = {"id": self._next_cid, "name": name, "image": image}
+        self._next_cid += 1
+        self.categories.append(c)
+        self._cat_by_id[c["id"]] = c
+        self._cat_by_name.setdefault(name, c)
+        return c
+
+    def update_category(self, cid, **fields):
+        c = self._cat_by_id.get(cid)
+        if c is None:
+            return None
+        if "name" in fields and fields["name"] != c["name"]:
+            if self._cat_by_name.get(c["name"]) is c:
+                del self._cat_by_name[c["name"]]
+            self._cat_by_name.setdefault(fields["name"], c)
+        c.update(fields)
+        return c
+
+    def category_index(self, cid):
+        for i, c in enumerate(self.categories):
+            if c["id"] == cid:
+                return i
+        return None
+
+    def put_category(self, rec, index=None):
+        """Category counterpart of ``put_product``."""
+        cid = rec["id"]
+        if cid in self._cat_by_id:
+            return self.update_category(cid, **{k: v for k, v in rec.items() if k != "id"})
+        c = dict(rec)
+        if index is None:
+            self.categories.append(c)
+        else:
+            self.categories.insert(index, c)
+        self._cat_by_id[cid] = c
+        self._cat_by_name.setdefault(c["name"], c)
+        self._next_cid = max(self._next_cid, cid + 1)
+        return c
+
+    def remove_category(self, cid):
+        c = self._cat_by_id.pop(cid, None)
+        if c is None:
+            return None
+        self.categories = [x for x in self.categories if x["id"] != cid]
+        if self._cat_by_name.get(c["name"]) is c:
+            del self._cat_by_name[c["name"]]
+            # Another category may share the name; let it take the slot.
+            for other in self.categories:
+                if other["name"] == c["name"]:
+                    self._cat_by_name[c["name"]] = other
+                    break
+        return c
+
+
+_encode_compact = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+
+
+def _encode_record(rec):
+    # JSON allows raw U+2028/U+2029 but older JS engines reject them in strings.
+    return _encode_compact(rec).replace("\u2028", "\\u2028").replace("\u2029", "\\u2029")
+
+
+def _join_lines(lines):
+    # One record per line: small files, readable Arabic, line-sized git diffs.
+    return "[\n" + ",\n".join(lines) + "\n]" if lines else "[]"
+
+
+def _dumps_array(items, compact):
+    if not compact:
+        return json.dumps(items, ensure_ascii=True, indent=4)
+    return _join_lines([_encode_record(r) for r in items])
+
+
+def dumps_catalog(products, categories, compact=False):
+    """Serialize back to products.js.
+
+    ``compact=False`` reproduces the historical ``indent=4`` / ASCII-escaped
+    layout; ``compact=True`` writes one unescaped record per line.
+    """
+    js = f"var products = {_dumps_array(products, compact)};\n"
+    js += f"var categories = {_dumps_array(categories, compact)};"
+    return js
+
+
+def file_mode(path):
+    """Permission bits for a new version of ``path``: the current file's, or
+    what ``open`` would give a new one.  mkstemp files start out as 0600."""
+    try:
+        return os.stat(path).st_mode & 0o7777
+    except OSError:
+        return 0o666 & ~_UMASK
+
+
+def write_atomic(path, data):
+    """Replace ``path`` with ``data`` (bytes) so readers never see a torn file."""
+    folder = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(prefix=".tmp-", dir=folder)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp, file_mode(path))
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    if hasattr(os, "O_DIRECTORY"):
+        # Persist the rename itself (POSIX only; NTFS commits it with the file).
+        dfd = os.open(folder, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dfd)
+        finally:
+            os.close(dfd)
+
+
+def file_digest(path):
+    try:
+        with open(path, "rb") as f:
+            return hashlib.sha1(f.read()).hexdigest()
+    except FileNotFoundError:
+        return None
+
+
+class CatalogWriter:
+    """Atomic products.js writer that skips writes when nothing changed.
+
+    In compact mode each product's encoded line is cached by id, so callers
+    that pass ``dirty`` (the ids they modified) only pay for re-encoding
+    those records.  ``dirty=None`` re-encodes everything.
+    """
+
+    def __init__(self, path, compact=True):
+        self.path = path
+        self.compact = compact
+        self.digest = file_digest(path)
+        self._lines = {}
+
+    def render(self, products, categories, dirty=None):
+        """Return the encoded (utf-8) file contents."""
+        if not self.compact:
+            return dumps_catalog(products, categories).encode("utf-8")
+        if dirty is None:
+            self._lines = {}
+        else:
+            for pid in dirty:
+                self._lines.pop(pid, None)
+        cache = self._lines
+        lines = []
+        for p in products:
+            line = cache.get(p["id"])
+            if line is None:
+                line = cache[p["id"]] = _encode_record(p).encode("utf-8")
+            lines.append(line)
+        if len(cache) > len(lines):
+            live = {p["id"] for p in products}
+            self._lines = {k: v for k, v in cache.items() if k in live}
+        body = b"[\n" + b",\n".join(lines) + b"\n]" if lines else b"[]"
+        cats = _dumps_array(categories, True).encode("utf-8")
+        return b"".join((b"var products = ", body, b";\nvar categories = ", cats, b";"))
+
+    def write(self, products, categories, dirty=None):
+        """Write the catalog; return False when the file already matched."""
+        data = self.render(products, categories, dirty)
+        digest = hashlib.sha1(data).hexdigest()
+        if digest == self.digest:
+            return False
+        write_atomic(self.path, data)
+        self.digest = digest
+        return True
@@ -0,0 +1,241 @@
+"""Bulk CSV / JSONL import and export for the catalog.
+
+Input is streamed one record at a time and upserted into a CatalogStore:
+a row updates the product with the same ``id``, else the one with the same
+``sku``, else it becomes a new product.  Empty CSV cells leave the current
+value alone, so a supplier price list with only ``sku,price`` columns works.
+Nothing is written here; the caller commits the catalog once at the end.
+
+CSV columns: id, sku, name, price, old_price, stock, category (name),
+category_id, description, images ("|"-separated refs or local files).
+JSONL lines are objects with the same keys; ``images`` may be a list.
+"""
+import csv
+import json
+import math
+import os
+
+from asset_store import is_ref
+from catalog import PRODUCT_DEFAULTS
+
+FORMATS = ("csv", "jsonl")
+CSV_FIELDS = ("id", "sku", "name", "price", "old_price", "stock", "category", "description", "images")
+IMAGE_SEP = "|"
+# Digit-group / decimal separators people paste from price lists
+_NUMBER_JUNK = str.maketrans({",": None, "\u066c": None, "\u00a0": None, " ": None, "\u066b": "."})
+
+
+class RowError(ValueError):
+    """An input record that could not be imported."""
+
+    def __init__(self, line, msg):
+        self.line, self.msg = line, msg
+        super().__init__(f"line {line}: {msg}")
+
+
+def detect_format(path, fmt=None):
+    if fmt:
+        return fmt
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".csv":
+        return "csv"
+    if ext in (".jsonl", ".ndjson"):
+        return "jsonl"
+    raise ValueError(f"cannot tell the format of {path!r}, pass --format csv or jsonl")
+
+
+def read_rows(f, fmt):
+    """Yield (line, row) from an open text file, one record at a time.
+
+    ``row`` is a dict, or a RowError for a record that could not be decoded
+    (the rest of the file is still read).
+    """
+    if fmt == "csv":
+        reader = csv.DictReader(f)
+        if reader.fieldnames:
+            reader.fieldnames = [(h or "").strip().lower() for h in reader.fieldnames]
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for n, line in enumerate(f, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield n, RowError(n, f"invalid JSON: {e.msg} (column {e.colno})")
+            continue
+        yield n, row if isinstance(row, dict) else RowError(n, "expected a JSON object")
+
+
+def _given(val):
+    # None (JSON null is handled by the caller) and blank CSV cells mean "keep"
+    return val is not None and not (isinstance(val, str) and not val.strip())
+
+
+def clean_number(text):
+    """``text`` without digit-group separators and the currency, with an
+    Arabic decimal point made ".", ready for ``int`` / ``float``."""
+    return str(text).translate(_NUMBER_JUNK).replace("ج.م", "").strip()
+
+
+def _number(line, field, val, integer=False):
+    if isinstance(val, bool):
+        raise RowError(line, f"{field} must be a number, not {val!r}")
+    if isinstance(val, str):
+        text = clean_number(val)
+        try:
+            val = int(text)  # also takes Arabic-Indic digits
+        except ValueError:
+            try:
+                val = float(text)
+            except ValueError:
+                raise RowError(line, f"{field} must be a number, not {val!r}") from None
+    if not isinstance(val, (int, float)) or not math.isfinite(val):
+        raise RowError(line, f"{field} must be a number, not {val!r}")
+    if val < 0:
+        raise RowError(line, f"{field} cannot be negative")
+    if val == int(val):
+        return int(val)
+    if integer:
+        raise RowError(line, f"{field} must be a whole number, not {val!r}")
+    return val
+
+
+class CatalogImporter:
+    """Upsert input rows into ``store`` and keep the counts for the summary.
+
+    ``assets`` (an AssetStore) lets rows reference local image files, which
+    are copied in; without it only existing refs are accepted.
+    ``create_categories`` adds unknown category names instead of rejecting
+    the row.
+    """
+
+    def __init__(self, store, assets=None, create_categories=False):
+        self.store = store
+        self.assets = assets
+        self.create_categories = create_categories
+        self.by_sku = {p["sku"]: p["id"] for p in store.products if p.get("sku")}
+        self.dirty = set()
+        self.rows = self.added = self.updated = self.unchanged = 0
+        self.errors = []
+
+    def run(self, rows):
+        for line, row in rows:
+            self.feed(line, row)
+        return self
+
+    def feed(self, line, row):
+        self.rows += 1
+        try:
+            if isinstance(row, RowError):
+                raise row
+            self._upsert(line, *self._fields(line, row))
+        except RowError as e:
+            self.errors.append(e)
+
+    def _fields(self, line, row):
+        # (fields, name of a category to create or None); nothing is changed
+        # here, so a row rejected halfway leaves the store as it was
+        data, new_category = {}, None
+        if _given(row.get("id")):
+            data["id"] = _number(line, "id", row["id"], integer=True)
+        if _given(row.get("sku")):
+            data["sku"] = str(row["sku"]).strip()
+        if _given(row.get("name")):
+            data["name"] = str(row["name"]).strip()
+        if _given(row.get("price")):
+            data["price"] = _number(line, "price", row["price"])
+        if "old_price" in row and row["old_price"] is None:
+            data["old_price"] = None  # explicit JSON null clears the discount
+        elif _given(row.get("old_price")):
+            data["old_price"] = _number(line, "old_price", row["old_price"])
+        if _given(row.get("stock")):
+            data["stock"] = _number(line, "stock", row["stock"], integer=True)
+        if _given(row.get("description")):
+            data["description"] = str(row["description"]).strip()
+        if _given(row.get("category")):
+            name = str(row["category"]).strip()
+            cat = self.store.category_by_name(name)
+            if cat is not None:
+                data["category_id"] = cat["id"]
+            elif self.create_categories:
+                new_category = name
+            else:
+                raise RowError(line, f"unknown category {name!r}")
+        elif _given(row.get("category_id")):
+            cid = _number(line, "category_id", row["category_id"], integer=True)
+            if self.store.category(cid) is None:
+                raise RowError(line, f"unknown category_id {cid}")
+            data["category_id"] = cid
+        if _given(row.get("images")):
+            data["images"] = self._images(line, row["images"])
+            data["image"] = data["images"][0] if data["images"] else ""
+            if self.assets is not None:
+                data["variants"] = {im: v for im in data["images"] for v in [self.assets.variants(im)] if v}
+        return data, new_category
+
+    def _images(self, line, val):
+        items = val if isinstance(val, list) else str(val).split(IMAGE_SEP)
+        refs = []
+        for im in items:
+            im = str(im).strip()
+            if not im:
+                continue
+            if not is_ref(im):
+                if self.assets is None or not os.path.isfile(im):
+                    raise RowError(line, f"image not found: {im!r}")
+                try:
+                    im = self.assets.ingest(im)
+                except OSError as e:
+                    raise RowError(line, f"cannot copy image {im!r}: {e}") from None
+            if im not in refs:
+                refs.append(im)
+        return refs
+
+    def _upsert(self, line, data, new_category=None):
+        store = self.store
+        pid = data.get("id")
+        p = store.product(pid)
+        if p is None and data.get("sku") in self.by_sku:
+            # No product with that id (or none given): the SKU decides
+            pid = self.by_sku[data["sku"]]
+            p = store.product(pid)
+        if p is None and ("name" not in data or "price" not in data):
+            raise RowError(line, "new products need a name and a price")
+        if new_category is not None:
+            data["category_id"] = store.add_category(new_category)["id"]
+        if p is None:
+            rec = {k: list(v) if isinstance(v, list) else v for k, v in PRODUCT_DEFAULTS.items()}
+            rec.update(data)
+            pid = store.add_product(rec)
+            self.added += 1
+        else:
+            changes = {k: v for k, v in data.items() if k != "id" and p.get(k, PRODUCT_DEFAULTS.get(k)) != v}
+            if not changes:
+                self.unchanged += 1
+                return
+            if "sku" in changes and self.by_sku.get(p.get("sku")) == pid:
+                del self.by_sku[p["sku"]]
+            store.update_product(pid, changes)
+            self.updated += 1
+        if data.get("sku"):
+            self.by_sku[data["sku"]] = pid
+        self.dirty.add(pid)
+
+
+def export_products(store, f, fmt):
+    """Write every product to the open text file ``f``; returns the count."""
+    if fmt == "csv":
+        w = csv.writer(f)
+        w.writerow(CSV_FIELDS)
+        for p in store.products:
+            w.writerow((p["id"], p.get("sku", ""), p["name"], p["price"],
+                        "" if p.get("old_price") is None else p["old_price"], p.get("stock", 0),
+                        store.category_name(p.get("category_id"), ""), p.get("description", ""),
+                        IMAGE_SEP.join(p.get("images", []))))
+    else:
+        for p in store.products:
+            f.write(json.dumps(p, ensure_ascii=False))
+            f.write("\n")
+    return len(store.products)
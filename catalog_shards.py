@@ -0,0 +1,119 @@
+"""Sharded copy of the catalog for the storefront.
+
+products.js stays the dashboard's single source of truth.  For visitors the
+site build splits the products into small shard files under
+``scripts/catalog/`` of the built site (one per category, or fixed-size
+runs in catalog order) plus a manifest script that index.html loads up front:
+
+    var categories = [...];
+    var catalogManifest = {"version": 1, "total": N, "shards": [
+        {"key": "cat-3", "file": "catalog/cat-3.1a2b3c4d5e.js", "count": 12, "categories": [3]}, ...]};
+
+Shard file names carry a hash of their contents, so an edit only renames
+(and re-downloads) the shard it touched.  A shard is plain JS calling
+``catalogShardLoaded(key, products)`` so it also loads from file://.
+"""
+import hashlib
+import json
+import os
+
+from catalog import _dumps_array, _encode_record, write_atomic
+
+MANIFEST_VERSION = 1
+HASH_LEN = 10
+
+
+class ShardWriter:
+    """Write shards + manifest, re-encoding only what changed.
+
+    ``shard_size=0`` makes one shard per category (products without a
+    category go to "cat-none"); otherwise products are cut into runs of
+    ``shard_size`` in catalog order.  ``dirty`` works as in CatalogWriter.
+    """
+
+    def __init__(self, out_dir, manifest_path, shard_size=0):
+        self.out_dir = out_dir
+        self.manifest_path = manifest_path
+        self.shard_size = shard_size
+        self._lines = {}
+        self._shards = {}  # key -> (ids, file name)
+        self._manifest = None
+
+    def plan(self, products, categories):
+        """[(key, [products])] in the order the storefront should load them."""
+        if self.shard_size:
+            n = self.shard_size
+            return [(f"part-{i // n}", products[i:i + n]) for i in range(0, len(products), n)]
+        groups = {c["id"]: [] for c in categories}
+        orphans = []
+        for p in products:
+            groups.get(p.get("category_id"), orphans).append(p)
+        out = [(f"cat-{cid}", items) for cid, items in groups.items() if items]
+        if orphans:
+            out.append(("cat-none", orphans))
+        return out
+
+    def write(self, products, categories, dirty=None):
+        """Bring the shard directory up to date; returns True if anything changed."""
+        if dirty is None:
+            self._lines = {}
+            self._shards = {}
+        else:
+            dirty = set(dirty)  # callers may pass any iterable, e.g. () after a category edit
+            for pid in dirty:
+                self._lines.pop(pid, None)
+        os.makedirs(self.out_dir, exist_ok=True)
+        cache = self._lines
+        entries, shards = [], {}
+        changed = False
+        for key, items in self.plan(products, categories):
+            ids = tuple(p["id"] for p in items)
+            prev = self._shards.get(key)
+            if prev and prev[0] == ids and (dirty is None or dirty.isdisjoint(ids)) \
+                    and os.path.exists(os.path.join(self.out_dir, prev[1])):
+                fname = prev[1]
+            else:
+                lines = []
+                for p in items:
+                    line = cache.get(p["id"])
+                    if line is None:
+                        line = cache[p["id"]] = _encode_record(p).encode("utf-8")
+                    lines.append(line)
+                data = b"".join((b"catalogShardLoaded(", json.dumps(key).encode(), b", [\n",
+                                 b",\n".join(lines), b"\n]);"))
+                fname = f"{key}.{hashlib.sha1(data).hexdigest()[:HASH_LEN]}.js"
+                path = os.path.join(self.out_dir, fname)
+                if not os.path.exists(path):
+                    write_atomic(path, data)
+                    changed = True
+            shards[key] = (ids, fname)
+            cats = sorted({p.get("category_id") for p in items}, key=lambda c: (c is None, c or 0))
+            entries.append({"key": key, "file": f"{os.path.basename(self.out_dir)}/{fname}",
+                            "count": len(items), "categories": cats})
+        if len(cache) > len(products):
+            live = {p["id"] for p in products}
+            self._lines = {k: v for k, v in cache.items() if k in live}
+        self._shards = shards
+
+        manifest = {"version": MANIFEST_VERSION, "total": len(products), "shards": entries}
+        js = (f"var categories = {_dumps_array(categories, True)};\n"
+              f"var catalogManifest = {json.dumps(manifest, ensure_ascii=False, separators=(',', ':'))};")
+        data = js.encode("utf-8")
+        if data != self._manifest:
+            try:
+                with open(self.manifest_path, "rb") as f:
+                    current = f.read()
+            except FileNotFoundError:
+                current = None
+            if current != data:
+                write_atomic(self.manifest_path, data)
+                changed = True
+            self._manifest = data
+        self._prune({fname for _, fname in shards.values()})
+        return changed
+
+    def _prune(self, keep):
+        # Old shard versions are no longer referenced once the manifest moved on.
+        for name in os.listdir(self.out_dir):
+            if name.endswith(".js") and name not in keep:
+                os.remove(os.path.join(self.out_dir, name))
@@ -0,0 +1,125 @@
+"""Notice when products.js changes under the dashboard, and merge it in.
+
+A publish rebases on the remote and ``manage_store.py import`` rewrites
+the file, either of which can happen while the dashboard is open with the
+catalog in memory.  ``FileWatcher.poll`` is cheap enough to run every
+couple of seconds: one ``os.stat``, a hash only when mtime / size moved,
+and a change is only reported when the hash differs from what the
+dashboard itself last wrote.
+
+``merge_catalog`` is a three-way merge by id.  The file's records win,
+except the ones edited in the dashboard since its last write (the
+journal's ``pending_base``), which keep the local version; a record both
+sides changed, differently, comes back as a conflict so it can be shown.
+Both sides adding a record under the same id is not a conflict: the local
+one moves to a fresh id and both are kept.
+"""
+import copy
+import hashlib
+import os
+
+from catalog import CatalogError, CatalogStore, file_digest, parse_catalog
+
+
+class FileWatcher:
+    """mtime / size / hash polling of one file."""
+
+    def __init__(self, path):
+        self.path = path
+        self._stat = self._key()
+        self._polled = self._stat
+
+    def _key(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def poll(self, known):
+        """sha1 of the file when its contents are no longer ``known``, else None.
+
+        Call ``seen()`` once the change is handled, or it is reported again.
+        """
+        key = self._key()
+        if key == self._stat or key is None:
+            return None
+        try:
+            digest = file_digest(self.path)
+        except OSError:
+            return None
+        if digest == known:
+            self._stat = key  # our own write, or touched without changes
+            return None
+        self._polled = key
+        return digest
+
+    def seen(self):
+        self._stat = self._polled
+
+
+def read_catalog(path):
+    """(products, categories, sha1) from one read of the file, so the digest
+    matches what was parsed.  Raises OSError / CatalogError."""
+    with open(path, "rb") as f:
+        data = f.read()
+    text = data.decode("utf-8-sig")
+    try:
+        products, categories = parse_catalog(text)
+    except CatalogError as e:
+        raise CatalogError(e.msg, text, e.pos, path) from None
+    return products, categories, hashlib.sha1(data).hexdigest()
+
+
+def merge_catalog(store, products, categories, base):
+    """Merge a re-read catalog with ``store``.
+
+    ``base`` is ``Journal.pending_base()``: the records edited locally and
+    what the file had for them.  Returns (merged CatalogStore, conflicts,
+    renamed): conflicts being [(kind, id, name)] of records changed on both
+    sides, renamed {(kind, old id): new id} of local additions whose id the
+    file took for a record of its own.
+    """
+    merged = CatalogStore(products, categories)
+    conflicts = []
+    renamed = {}
+    # Categories first, so local products follow a category that moved
+    for (kind, rid), before in sorted(base.items(), key=lambda item: item[0][0] != "c"):
+        if kind == "p":
+            ours, theirs = store.product(rid), merged.product(rid)
+            cid = ours and ours.get("category_id")
+            if ("c", cid) in renamed:
+                ours = dict(ours, category_id=renamed["c", cid])
+        else:
+            ours, theirs = store.category(rid), merged.category(rid)
+        if ours == theirs:
+            continue
+        if before is None and ours is not None and theirs is not None:
+            # Added on both sides under one id: theirs keeps it, ours gets the next free one
+            ours = copy.deepcopy(ours)
+            if kind == "p":
+                ours["id"] = renamed["p", rid] = merged.next_product_id()
+                merged.put_product(ours, store.product_index(rid))
+            else:
+                ours["id"] = renamed["c", rid] = merged.add_category(ours["name"])["id"]
+                merged.put_category(ours)
+            continue
+        if theirs != before:
+            conflicts.append((kind, rid, (ours or theirs)["name"]))
+        if kind == "p":
+            if ours is None:
+                merged.remove_products([rid])
+            else:
+                merged.put_product(copy.deepcopy(ours), store.product_index(rid) if theirs is None else None)
+        elif ours is None:
+            merged.remove_category(rid)
+        else:
+            merged.put_category(copy.deepcopy(ours), store.category_index(rid) if theirs is None else None)
+    return merged, conflicts, renamed
+
+
+def changed_products(old, new):
+    """Ids whose record differs between two stores (added, removed or edited)."""
+    ids = {p["id"] for p in old.products}
+    ids.update(p["id"] for p in new.products)
+    return {pid for pid in ids if old.product(pid) != new.product(pid)}
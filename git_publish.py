@@ -0,0 +1,207 @@
+"""Publish the storefront by committing and pushing with plain git.
+
+Replaces publish_store_silent.bat.  Only the site paths handed in (index.html,
+scripts/, styles/, assets/ ...) are looked at, and of those only the files
+``git status`` reports as changed are hashed.  The commit is built on a
+throwaway index with plumbing (update-index / write-tree / commit-tree /
+update-ref), so whatever the developer has staged in the real index is left
+alone.  Only the checked-out ``branch`` is published; from any other branch
+publish() refuses rather than push that branch's history.  Nothing is ever force-pushed: a rejected push rebases onto the remote
+and tries again; network errors are retried with exponential backoff.
+
+Works anywhere git is on PATH.  ``remote`` may be a remote name or a path /
+URL, so a local bare repository can stand in for GitHub.
+"""
+import os
+import subprocess
+import tempfile
+import threading
+import time
+
+# Hide the console window git would flash on Windows
+_NO_WINDOW = getattr(subprocess, "CREATE_NO_WINDOW", 0)
+_REJECTED = ("[rejected]", "non-fast-forward", "fetch first")
+
+
+class GitError(RuntimeError):
+    def __init__(self, args, code, err):
+        self.code, self.err = code, err.strip()
+        super().__init__(f"git {' '.join(args[:2])} failed ({code}): {self.err}")
+
+
+class GitPublisher:
+    """Commit the changed site files and push them to ``remote``/``branch``.
+
+    ``publish()`` returns a report dict: ok, commit (sha or None), files,
+    attempts, error, and ``timings`` ({phase: seconds} for scan, stage,
+    commit, push and, if needed, rebase).
+
+    ``repo_dir`` is the top of the work tree; ``paths`` are relative to it.
+    ``lock`` is held while the site files are read or rewritten (the scan,
+    commit and a rebase), so a writer that takes it too is never half seen.
+    """
+
+    def __init__(self, repo_dir, paths, remote="origin", branch="main",
+                 retries=4, backoff=1.0, log_path=None, lock=None):
+        self.repo_dir = repo_dir
+        self.paths = list(paths)
+        self.remote = remote
+        self.branch = branch
+        self.retries = retries
+        self.backoff = backoff
+        self.log_path = log_path
+        self.lock = lock or threading.Lock()
+
+    def git(self, *args, stdin=None, env=None, check=True):
+        res = subprocess.run(["git", *args], cwd=self.repo_dir, input=stdin, capture_output=True,
+                             env=env, creationflags=_NO_WINDOW)
+        if check and res.returncode:
+            raise GitError(args, res.returncode, res.stderr.decode("utf-8", "replace"))
+        return res
+
+    def changed_files(self):
+        """Site paths whose working tree differs from HEAD (new, modified or deleted)."""
+        out = self.git("status", "--porcelain=v1", "-z", "--untracked-files=all", "--", *self.paths).stdout
+        files, fields = [], out.split(b"\0")
+        i = 0
+        while i < len(fields):
+            entry = fields[i]
+            i += 1
+            if not entry:
+                continue
+            files.append(entry[3:])
+            if entry[0:1] in (b"R", b"C"):
+                files.append(fields[i])  # rename source, gone from the new tree
+                i += 1
+        return list(dict.fromkeys(files))
+
+    def publish(self, message=None):
+        report = {"ok": False, "commit": None, "files": 0, "attempts": 0, "error": None, "timings": {}}
+        timings = report["timings"]
+        try:
+            git_dir = self.git("rev-parse", "--git-dir").stdout.decode().strip()
+            git_dir = os.path.join(self.repo_dir, git_dir)
+            if any(os.path.exists(os.path.join(git_dir, d)) for d in ("rebase-merge", "rebase-apply", "MERGE_HEAD")):
+                raise RuntimeError("a rebase or merge is in progress in the repository; finish or abort it first")
+            current = self.git("symbolic-ref", "-q", "--short", "HEAD", check=False).stdout.decode().strip()
+            if current != self.branch:
+                raise RuntimeError(f"{current or 'a detached HEAD'} is checked out, not {self.branch}; "
+                                   f"switch to {self.branch} to publish")
+
+            with self.lock:
+                t = time.perf_counter()
+                files = self.changed_files()
+                timings["scan"] = time.perf_counter() - t
+                report["files"] = len(files)
+                if files:
+                    report["commit"] = self._commit(files, message, timings)
+            t = time.perf_counter()
+            try:
+                self._push(report)
+            finally:
+                timings["push"] = time.perf_counter() - t - timings.get("rebase", 0)
+            report["ok"] = True
+        except (GitError, RuntimeError, OSError) as e:
+            report["error"] = str(e)
+        self._log(report)
+        return report
+
+    def _commit(self, files, message, timings):
+        t = time.perf_counter()
+        head = self.git("rev-parse", "--verify", "-q", "HEAD", check=False).stdout.decode().strip() or None
+        # Paths the developer has staged themselves keep their index entry
+        staged = set(self.git("diff", "--cached", "--no-renames", "--name-only", "-z", "--",
+                              *self.paths).stdout.split(b"\0"))
+        fd, index = tempfile.mkstemp(prefix="publish-index-")
+        os.close(fd)
+        os.remove(index)  # git wants to create it itself
+        env = dict(os.environ, GIT_INDEX_FILE=index)
+        listing = b"\0".join(files) + b"\0"
+        try:
+            if head:
+                self.git("read-tree", head, env=env)
+            self.git("update-index", "--add", "--remove", "-z", "--stdin", stdin=listing, env=env)
+            tree = self.git("write-tree", env=env).stdout.decode().strip()
+        finally:
+            if os.path.exists(index):
+                os.remove(index)
+        timings["stage"] = time.perf_counter() - t
+
+        t = time.perf_counter()
+        if head and tree == self.git("rev-parse", head + "^{tree}").stdout.decode().strip():
+            timings["commit"] = time.perf_counter() - t
+            return None
+        message = message or time.strftime("Auto-sync %Y-%m-%d %H:%M:%S")
+        parents = ["-p", head] if head else []
+        commit = self.git("commit-tree", tree, *parents, "-m", message).stdout.decode().strip()
+        # Compare-and-swap: fails instead of clobbering a commit made meanwhile
+        self.git("update-ref", "-m", "publish: " + message, "HEAD", commit, head or "0" * 40)
+        # The real index still has the old blobs for these paths
+        ours = [f for f in files if f not in staged]
+        if ours:
+            self.git("reset", "-q", "--pathspec-from-file=-", "--pathspec-file-nul",
+                     stdin=b"\0".join(ours) + b"\0")
+        timings["commit"] = time.perf_counter() - t
+        return commit
+
+    def _push(self, report):
+        delay = self.backoff
+        for attempt in range(1, self.retries + 1):
+            report["attempts"] = attempt
+            res = self.git("push", "--porcelain", self.remote, f"HEAD:refs/heads/{self.branch}", check=False)
+            if res.returncode == 0:
+                return
+            err = res.stderr.decode("utf-8", "replace") + res.stdout.decode("utf-8", "replace")
+            if any(s in err for s in _REJECTED):
+                # Someone else pushed: replay our commits on top and push again
+                t = time.perf_counter()
+                with self.lock:
+                    self._rebase()
+                if report["commit"]:
+                    report["commit"] = self.git("rev-parse", "HEAD").stdout.decode().strip()
+                report["timings"]["rebase"] = report["timings"].get("rebase", 0) + time.perf_counter() - t
+                continue
+            if attempt == self.retries:
+                raise GitError(("push", self.remote), res.returncode, err)
+            time.sleep(delay)
+            delay *= 2
+        raise RuntimeError(f"push still rejected after {self.retries} attempts")
+
+    def _rebase(self):
+        self.git("fetch", self.remote, self.branch)
+        # Not --autostash: it re-applies staged changes as unstaged ones.  The
+        # stash is popped with --index so the developer's index comes back as it was.
+        stashed = bool(self.git("status", "--porcelain", "--untracked-files=no").stdout)
+        if stashed:
+            self.git("stash", "push", "-q", "-m", "publish: rebase")
+        res = self.git("rebase", "FETCH_HEAD", check=False)
+        if res.returncode:
+            self.git("rebase", "--abort", check=False)
+        if stashed:
+            pop = self.git("stash", "pop", "-q", "--index", check=False)
+            if pop.returncode:
+                raise GitError(("stash", "pop"), pop.returncode,
+                               pop.stderr.decode("utf-8", "replace") + " (local changes are kept in git stash)")
+        if res.returncode:
+            raise GitError(("rebase", "FETCH_HEAD"), res.returncode,
+                           res.stderr.decode("utf-8", "replace") + " (local and remote changes conflict)")
+
+    def _log(self, report):
+        if not self.log_path:
+            return
+        phases = " ".join(f"{k}={v:.2f}s" for k, v in report["timings"].items())
+        line = (f"{time.strftime('%Y-%m-%d %H:%M:%S')} {'OK' if report['ok'] else 'FAILED'}"
+                f" files={report['files']} commit={(report['commit'] or '-')[:10]}"
+                f" attempts={report['attempts']} {phases}")
+        if report["error"]:
+            line += f" error={report['error']!r}"
+        with open(self.log_path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+def format_publish_report(report):
+    phases = ", ".join(f"{k} {v * 1000:.0f} ms" for k, v in report["timings"].items())
+    if not report["ok"]:
+        return f"publish failed: {report['error']} ({phases})"
+    what = f"commit {report['commit'][:10]} ({report['files']} files)" if report["commit"] else "no changes to commit"
+    return f"published: {what}, pushed in {report['attempts']} attempt(s) ({phases})"
@@ -0,0 +1,62 @@
+"""Downscaled storefront copies of imported images.
+
+Each stored image gets a thumbnail, a card-sized and a zoom-sized WebP copy
+(JPEG if this Pillow build has no WebP encoder), named after the source's
+content hash so rebuilding is a no-op.  Pillow is optional: without it the
+storefront keeps using the original files.
+
+``build_variants`` is a top-level function so it can run in a process pool.
+"""
+import os
+
+try:
+    from PIL import Image, ImageOps
+    from PIL import features as _pil_features
+except ImportError:
+    Image = None
+
+# variant name -> longest edge in pixels
+VARIANT_SIZES = {"thumb": 160, "card": 480, "zoom": 1200}
+QUALITY = 80
+
+
+def available():
+    return Image is not None
+
+
+def _format():
+    if _pil_features.check("webp"):
+        return "WEBP", ".webp"
+    return "JPEG", ".jpg"
+
+
+def build_variants(src_path, out_dir, stem):
+    """Write the variants of ``src_path`` into ``out_dir`` as ``<stem>-<name>``.
+
+    Returns {variant name: "assets/<file>"}.  Never upscales; existing
+    outputs are reused.
+    """
+    fmt, ext = _format()
+    out = {}
+    with Image.open(src_path) as im:
+        im = ImageOps.exif_transpose(im)
+        if im.mode not in ("RGB", "RGBA"):
+            im = im.convert("RGBA" if "transparency" in im.info or im.mode in ("LA", "P") else "RGB")
+        if fmt == "JPEG" and im.mode == "RGBA":
+            bg = Image.new("RGB", im.size, "white")
+            bg.paste(im, mask=im.getchannel("A"))
+            im = bg
+        for name, edge in VARIANT_SIZES.items():
+            fn = f"{stem}-{name}{ext}"
+            dst = os.path.join(out_dir, fn)
+            if not os.path.exists(dst):
+                copy = im.copy()
+                copy.thumbnail((edge, edge), Image.LANCZOS)
+                tmp = dst + ".tmp"
+                if fmt == "WEBP":
+                    copy.save(tmp, fmt, quality=QUALITY, method=4)
+                else:
+                    copy.save(tmp, fmt, quality=QUALITY, optimize=True, progressive=True)
+                os.replace(tmp, dst)
+            out[name] = f"assets/{fn}"
+    return out
@@ -0,0 +1,352 @@
+"""Append-only change log of catalog edits, with undo/redo.
+
+Every dashboard edit is one JSON line in ``ops.jsonl``: the before and
+after image of each product/category it touched.  Undo and redo are
+logged as lines too ({"undo": seq} / {"redo": seq}), so the history
+survives restarts.  ``snapshot.json`` holds the catalog as of some
+sequence number; startup loads it and replays the lines after it, which
+is cheaper than parsing products.js.
+
+products.js is still what the storefront and the other tools read.  It is
+written in the background and each write is logged as a checkpoint with
+the file's sha1.  If products.js no longer matches the last checkpoint
+(edited by hand, by ``manage_store.py import``, or a git pull), the file
+wins and the journal starts over from it.  While the dashboard runs,
+``pending_base`` tells such a change apart from the edits it has not
+written yet (see catalog_watch.py), and ``rebase`` starts over from the
+merged result.
+"""
+import copy
+import json
+import os
+import time
+
+from catalog import file_digest, load_catalog, write_atomic
+
+SNAPSHOT_NAME = "snapshot.json"
+OPS_NAME = "ops.jsonl"
+SNAPSHOT_EVERY = 200   # edits between compactions
+UNDO_DEPTH = 50        # edits kept undoable across a compaction
+
+
+def _copy(rec):
+    return copy.deepcopy(rec) if rec is not None else None
+
+
+class Transaction:
+    """Before-images of the records one edit is about to touch.
+
+    Call ``touch_*`` before changing an existing record and ``created_*``
+    after adding one, then hand it to ``Journal.commit``.
+    """
+
+    def __init__(self, store, label):
+        self.store = store
+        self.label = label
+        self.before = {}   # (kind, id) -> (record copy or None, index)
+
+    def touch_product(self, pid):
+        key = ("p", pid)
+        if key not in self.before:
+            self.before[key] = (_copy(self.store.product(pid)), self.store.product_index(pid))
+
+    def touch_products(self, pids):
+        """``touch_product`` for many ids."""
+        where = {pid: self.store.product_index(pid) for pid in pids}
+        # Last first, so undoing a bulk delete re-inserts in ascending position
+        for pid in sorted(where, key=lambda pid: -1 if where[pid] is None else where[pid], reverse=True):
+            key = ("p", pid)
+            if key not in self.before:
+                self.before[key] = (_copy(self.store.product(pid)), where[pid])
+
+    def created_product(self, pid):
+        self.before.setdefault(("p", pid), (None, None))
+
+    def touch_category(self, cid):
+        key = ("c", cid)
+        if key not in self.before:
+            self.before[key] = (_copy(self.store.category(cid)), self.store.category_index(cid))
+
+    def created_category(self, cid):
+        self.before.setdefault(("c", cid), (None, None))
+
+    def rollback(self):
+        """Put the touched records back (for an edit that could not be logged)."""
+        _apply(self.store, self.changes(), inverse=True)
+
+    def changes(self):
+        out = []
+        for (kind, rid), (before, index) in self.before.items():
+            if kind == "p":
+                after, where = self.store.product(rid), self.store.product_index
+            else:
+                after, where = self.store.category(rid), self.store.category_index
+            if after == before:
+                continue
+            if before is None:
+                index = where(rid)
+            out.append({"k": kind, "id": rid, "i": index, "b": before, "a": _copy(after)})
+        return out
+
+
+def _apply(store, changes, inverse=False):
+    """Apply (or roll back) a logged edit; returns (product ids, categories touched)."""
+    changes = list(reversed(changes) if inverse else changes)
+    # Product removals go first, in one pass (bulk deletes); the recorded
+    # insert positions already assume those records are gone.
+    gone = [ch["id"] for ch in changes if ch["k"] == "p" and ch["b" if inverse else "a"] is None]
+    store.remove_products(gone)
+    pids, cats = set(gone), False
+    for ch in changes:
+        old, new = (ch["a"], ch["b"]) if inverse else (ch["b"], ch["a"])
+        if ch["k"] == "p":
+            if new is not None:
+                pids.add(ch["id"])
+                store.put_product(_copy(new), ch["i"] if old is None else None)
+        else:
+            cats = True
+            if new is None:
+                store.remove_category(ch["id"])
+            else:
+                store.put_category(_copy(new), ch["i"] if old is None else None)
+    return pids, cats
+
+
+class Journal:
+    """Durable edit history for one catalog.
+
+    ``undo_stack`` / ``redo_stack`` hold sequence numbers of logged edits;
+    ``unflushed`` is True while edits exist that products.js does not have.
+    """
+
+    def __init__(self, folder):
+        self.folder = folder
+        self.ops_path = os.path.join(folder, OPS_NAME)
+        self.snapshot_path = os.path.join(folder, SNAPSHOT_NAME)
+        self.seq = 0
+        self.entries = {}      # seq -> edit entry, for undo/redo
+        self.undo_stack = []
+        self.redo_stack = []
+        self.unflushed = False
+        self.since_snapshot = 0
+        self._since_flush = []  # (changes, inverse) applied since products.js was last written
+        self._file = None
+
+    # --- Startup ---
+    def open(self, store, catalog_path):
+        """Load the catalog into ``store``; returns "journal" or "catalog".
+
+        Raises OSError / CatalogError like ``load_catalog``.
+        """
+        os.makedirs(self.folder, exist_ok=True)
+        digest = file_digest(catalog_path)
+        if self._replay(store, digest):
+            self._file = open(self.ops_path, "ab")
+            return "journal"
+        products, categories = load_catalog(catalog_path) if digest is not None else ([], [])
+        store.load(products, categories)
+        self._reset(store, digest)
+        return "catalog"
+
+    def _replay(self, store, digest):
+        try:
+            with open(self.snapshot_path, encoding="utf-8") as f:
+                snap = json.load(f)
+            with open(self.ops_path, "rb") as f:
+                raw = f.read()
+        except (OSError, ValueError):
+            return False
+        entries, good = [], 0
+        for line in raw.splitlines(keepends=True):
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                break  # torn last write
+            good += len(line)
+        checkpoint = snap["checkpoint"]
+        for e in entries:
+            if "checkpoint" in e and e["seq"] > snap["seq"]:
+                checkpoint = e["checkpoint"]
+        if checkpoint != digest:
+            return False
+        if good < len(raw):
+            with open(self.ops_path, "r+b") as f:
+                f.truncate(good)
+        store.load(snap["products"], snap["categories"])
+        self.seq = snap["seq"]
+        self.unflushed = False
+        for e in entries:
+            self._track(store, e, apply=e["seq"] > snap["seq"])
+            self.seq = max(self.seq, e["seq"])
+        return True
+
+    def _track(self, store, e, apply):
+        if "checkpoint" in e:
+            if apply:
+                self.unflushed = False
+                self._since_flush.clear()
+            return
+        if "changes" in e:
+            self.entries[e["seq"]] = e
+            self.undo_stack.append(e["seq"])
+            self.redo_stack.clear()
+            if apply:
+                _apply(store, e["changes"])
+                self._since_flush.append((e["changes"], False))
+        elif "undo" in e:
+            target = self.entries.get(e["undo"])
+            if target and self.undo_stack and self.undo_stack[-1] == e["undo"]:
+                self.redo_stack.append(self.undo_stack.pop())
+                if apply:
+                    _apply(store, target["changes"], inverse=True)
+                    self._since_flush.append((target["changes"], True))
+        elif "redo" in e:
+            target = self.entries.get(e["redo"])
+            if target and self.redo_stack and self.redo_stack[-1] == e["redo"]:
+                self.undo_stack.append(self.redo_stack.pop())
+                if apply:
+                    _apply(store, target["changes"])
+                    self._since_flush.append((target["changes"], False))
+        if apply:
+            self.unflushed = True
+            self.since_snapshot += 1
+
+    def _reset(self, store, digest, keep=()):
+        # New snapshot of the current state; ``keep`` = raw edit lines to
+        # carry over so recent edits stay undoable.
+        snap = {"seq": self.seq, "checkpoint": digest,
+                "products": store.products, "categories": store.categories}
+        write_atomic(self.snapshot_path, json.dumps(snap, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+        write_atomic(self.ops_path, b"".join(keep))
+        if self._file:
+            self._file.close()
+        self._file = open(self.ops_path, "ab")
+        self.since_snapshot = 0
+        self._since_flush.clear()
+        if not keep:
+            self.entries.clear()
+            self.undo_stack.clear()
+            self.redo_stack.clear()
+
+    # --- Writing ---
+    def _append(self, entry):
+        self.seq += 1
+        entry = {"seq": self.seq, "t": round(time.time(), 3), **entry}
+        self._file.write(json.dumps(entry, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        return entry
+
+    def begin(self, store, label):
+        return Transaction(store, label)
+
+    def commit(self, tx):
+        """Log an edit; returns the product ids it touched, or None if it changed nothing."""
+        changes = tx.changes()
+        if not changes:
+            return None
+        e = self._append({"label": tx.label, "changes": changes})
+        self.entries[e["seq"]] = e
+        self.undo_stack.append(e["seq"])
+        self.redo_stack.clear()
+        self.unflushed = True
+        self.since_snapshot += 1
+        self._since_flush.append((changes, False))
+        return {c["id"] for c in changes if c["k"] == "p"}
+
+    def undo(self, store):
+        """Roll back the last edit; returns (label, product ids, categories touched) or None."""
+        if not self.undo_stack:
+            return None
+        seq = self.undo_stack[-1]
+        self._append({"undo": seq})
+        self.redo_stack.append(self.undo_stack.pop())
+        self.unflushed = True
+        self.since_snapshot += 1
+        e = self.entries[seq]
+        self._since_flush.append((e["changes"], True))
+        return (e["label"],) + _apply(store, e["changes"], inverse=True)
+
+    def redo(self, store):
+        if not self.redo_stack:
+            return None
+        seq = self.redo_stack[-1]
+        self._append({"redo": seq})
+        self.undo_stack.append(self.redo_stack.pop())
+        self.unflushed = True
+        self.since_snapshot += 1
+        e = self.entries[seq]
+        self._since_flush.append((e["changes"], False))
+        return (e["label"],) + _apply(store, e["changes"])
+
+    def undo_label(self):
+        return self.entries[self.undo_stack[-1]]["label"] if self.undo_stack else None
+
+    def checkpoint(self, store, digest):
+        """Record that products.js (sha1 ``digest``) now has every logged edit.
+
+        Every SNAPSHOT_EVERY edits this compacts the log into a new
+        snapshot, keeping the last UNDO_DEPTH edits undoable.  It waits
+        while there is something to redo, so the redo list is never cut.
+        """
+        if self.since_snapshot >= SNAPSHOT_EVERY and not self.redo_stack:
+            live = set(self.undo_stack[-UNDO_DEPTH:])
+            keep = []
+            for seq in sorted(live):
+                e = self.entries[seq]
+                keep.append(json.dumps(e, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n")
+            self.entries = {seq: self.entries[seq] for seq in live}
+            self.undo_stack = [s for s in self.undo_stack if s in live]
+            self._reset(store, digest, keep)
+        else:
+            self._append({"checkpoint": digest})
+        self.unflushed = False
+        self._since_flush.clear()
+
+    def pending_base(self):
+        """{(kind, id): record or None} as products.js last had them, for
+        every record edited since it was last written."""
+        base = {}
+        for changes, inverse in self._since_flush:
+            for ch in reversed(changes) if inverse else changes:
+                base.setdefault((ch["k"], ch["id"]), ch["a"] if inverse else ch["b"])
+        return base
+
+    def rebase(self, store, digest):
+        """Start over from ``store`` after products.js (sha1 ``digest``)
+        changed underneath; the undo history refers to the old file, so it goes."""
+        self._reset(store, digest)
+        self.unflushed = False
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+
+def logged_records(folder):
+    """(products, categories): every record version the journal in
+    ``folder`` holds, i.e. its snapshot plus both sides of each logged edit,
+    which undo / redo can bring back.  Empty lists when there is none."""
+    products, categories = [], []
+    try:
+        with open(os.path.join(folder, SNAPSHOT_NAME), encoding="utf-8") as f:
+            snap = json.load(f)
+        products += snap["products"]
+        categories += snap["categories"]
+    except (OSError, ValueError, KeyError):
+        pass
+    try:
+        with open(os.path.join(folder, OPS_NAME), "rb") as f:
+            lines = f.read().splitlines()
+    except OSError:
+        lines = []
+    for line in lines:
+        try:
+            e = json.loads(line)
+        except ValueError:
+            break  # torn last write
+        for ch in e.get("changes", ()):
+            out = products if ch["k"] == "p" else categories
+            out += [rec for rec in (ch["b"], ch["a"]) if rec is not None]
+    return products, categories
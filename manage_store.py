@@ -1,29 +1,137 @@
-import tkinter as tk
-from tkinter import ttk, messagebox, filedialog
-import json
+try:
+    import tkinter as tk
+    from tkinter import ttk, messagebox, filedialog
+except ImportError:  # headless machine: only the command line mode works
+    tk = None
+import argparse
+import base64
+import queue
 import re
 import os
-import shutil
-import subprocess
+import sys
 import time
 import threading
+import webbrowser
+
+from asset_gc import AssetGC, catalog_refs, format_gc_report, journal_refs, site_refs
+from asset_store import MANIFEST_NAME as ASSET_MANIFEST, AssetStore, is_ref
+from batch_edit import OPS as BATCH_OPS, apply_batch, batch_changes, parse_amount
+from catalog import CatalogError, CatalogStore, CatalogWriter, load_catalog
+from catalog_check import ERROR as CHECK_ERROR, CatalogChecker, count as count_issues
+from catalog_stats import inventory_stats
+from catalog_io import FORMATS, CatalogImporter, detect_format, export_products, read_rows
+from catalog_shards import ShardWriter
+from catalog_watch import FileWatcher, changed_products, merge_catalog, read_catalog
+from git_publish import GitPublisher, format_publish_report
+from journal import Journal
+from metrics import Metrics, format_stats
+from prerender import Prerenderer
+from preview import PreviewServer, format_request
+from publisher import PublishQueue
+from search_index import SearchIndex
+from site_build import SiteBuilder, copy_site, format_report
+from thumbnails import EDGE as THUMB_EDGE, ThumbnailCache, available as thumbnails_available
+from widgets import VirtualTreeview
+
+STARTED = time.perf_counter()
 
 # Paths
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 PRODUCTS_FILE = os.path.join(BASE_DIR, 'scripts', 'products.js')
+# The deployed site, built from the sources by `manage_store.py build` (here and on Vercel); not committed
+DIST_DIR = os.path.join(BASE_DIR, 'dist')
+# Copied into dist/ as they are; products.js is not deployed, visitors get the shards below
+SITE_SOURCES = ["index.html", "logo-v2.png", "styles", "scripts/app.js", "assets"]
+# ...except the asset manifest: it lists the original names of the uploaded files
+SITE_SKIP = [f"assets/{ASSET_MANIFEST}"]
+SEARCH_INDEX_FILE = os.path.join(DIST_DIR, 'scripts', 'search-index.js')
+# Storefront copy of the catalog: small manifest + lazily loaded shards
+CATALOG_MANIFEST_FILE = os.path.join(DIST_DIR, 'scripts', 'catalog-manifest.js')
+CATALOG_SHARD_DIR = os.path.join(DIST_DIR, 'scripts', 'catalog')
+# Build caches stay next to the sources so they are never deployed
+BUILD_CACHE = os.path.join(BASE_DIR, '.build-cache.json')
+PRERENDER_CACHE = os.path.join(BASE_DIR, '.prerender-cache.json')
+# 0 = one shard per category, N = shards of N products in catalog order
+SHARD_SIZE = int(os.environ.get("STORE_SHARD_SIZE", "0"))
 ASSETS_DIR = os.path.join(BASE_DIR, 'assets')
+# Decoded image previews (local, not published); STORE_THUMB_DISK=0 keeps them in memory only
+THUMB_CACHE_DIR = os.path.join(BASE_DIR, '.thumb-cache')
+THUMB_DISK = os.environ.get("STORE_THUMB_DISK", "1") != "0"
+THUMB_CACHE_MB = int(os.environ.get("STORE_THUMB_CACHE_MB", "32"))
+# Edit log + snapshot the dashboard starts from (local, not published)
+JOURNAL_DIR = os.path.join(BASE_DIR, 'journal')
 # Isolated logs
 LOG_DIR = os.path.join(BASE_DIR, 'logs')
 LOG_FILE = os.path.join(LOG_DIR, 'sync.log')
+# STORE_STARTUP_TIMING=1 appends time-to-first-paint / time-to-interactive here
+# ("exit" also closes the dashboard once it is interactive, for scripted runs)
+STARTUP_TIMING = os.environ.get("STORE_STARTUP_TIMING", "")
+STARTUP_LOG = os.path.join(LOG_DIR, 'startup.log')
+# One JSON line per timed operation (see metrics.py), rotated at 1 MB
+METRICS_FILE = os.path.join(LOG_DIR, 'metrics.jsonl')
+# Idle time after the last keystroke before the inventory search runs
+SEARCH_DELAY_MS = int(os.environ.get("STORE_SEARCH_DELAY_MS", "250"))
+# Edits are logged at once; products.js & co. are rewritten once edits pause this long
+WRITE_DELAY_MS = int(os.environ.get("STORE_WRITE_DELAY_MS", "1000"))
+# How often products.js is checked for changes from outside (git pull, import, another editor)
+WATCH_INTERVAL_MS = int(os.environ.get("STORE_WATCH_MS", "2000"))
+# How often the Tk thread runs what worker threads posted (load results, thumbnails, sync status)
+UI_POLL_MS = 50
+# Analytics page: stock at or below this counts as low
+LOW_STOCK = int(os.environ.get("STORE_LOW_STOCK", "5"))
+# Product image grid: thumbnails per page / per row
+GRID_PAGE = 24
+GRID_COLS = 6
+# Edits within this many seconds of each other are published as one sync
+PUBLISH_QUIET_SECONDS = float(os.environ.get("STORE_PUBLISH_QUIET", "5"))
+# What a sync commits (nothing else in the repo is staged) and where it goes; Vercel builds dist/ from it
+PUBLISH_PATHS = ["index.html", "vercel.json", "logo-v2.png", "scripts", "styles", "assets"]
+# Local preview server (dashboard button / `manage_store.py preview`)
+PREVIEW_PORT = int(os.environ.get("STORE_PREVIEW_PORT", "8000"))
+PUBLISH_REMOTE = os.environ.get("STORE_PUBLISH_REMOTE", "origin")
+PUBLISH_BRANCH = os.environ.get("STORE_PUBLISH_BRANCH", "main")
+
+# Held while products.js is written, dist/ is built or the sources are committed: the dashboard
+# writes products.js on the Tk thread while the preview build and a publish read it on theirs
+SITE_LOCK = threading.RLock()
 
 if not os.path.exists(ASSETS_DIR):
     os.makedirs(ASSETS_DIR)
 if not os.path.exists(LOG_DIR):
     os.makedirs(LOG_DIR)
 
+def build_site(precompress=True):
+    # dist/ from the sources: copy them, write the shards + search index from products.js,
+    # prerender, then minify + fingerprint (+ precompress for the preview)
+    with SITE_LOCK:
+        products, categories = load_catalog(PRODUCTS_FILE)
+        start = time.perf_counter()
+        copied = copy_site(BASE_DIR, DIST_DIR, SITE_SOURCES, SITE_SKIP)
+        ShardWriter(CATALOG_SHARD_DIR, CATALOG_MANIFEST_FILE, SHARD_SIZE).write(products, categories)
+        SearchIndex(products, categories).write(SEARCH_INDEX_FILE)
+        print(f"{copied} source files copied, catalog written ({time.perf_counter() - start:.2f}s)")
+        pre = Prerenderer(DIST_DIR, SHARD_SIZE, cache_path=PRERENDER_CACHE)
+        grid = pre.render_grid(products, categories)
+        # Only the fingerprinted names are referenced, so the copies they were made from go
+        report = SiteBuilder(DIST_DIR, BUILD_CACHE, precompress).build(drop_sources=True)
+        print(format_report(report))
+        # Product pages link the fingerprinted stylesheet, so they come after the build
+        start = time.perf_counter()
+        written, removed, same = pre.render_pages(products, categories)
+    print(f"prerendered: grid {'updated' if grid else 'unchanged'}, {written} product pages written,"
+          f" {removed} removed, {same} unchanged ({time.perf_counter() - start:.2f}s)")
+    return report
+
+def run_publish(remote=PUBLISH_REMOTE, branch=PUBLISH_BRANCH, message=None):
+    report = GitPublisher(BASE_DIR, PUBLISH_PATHS, remote, branch, log_path=LOG_FILE, lock=SITE_LOCK).publish(message)
+    print(format_publish_report(report))
+    if not report["ok"]: raise RuntimeError(report["error"])
+    return report
+
 class PremiumStoreManager:
     def __init__(self, root):
         self.root = root
+        self.metrics = Metrics(METRICS_FILE)
         self.root.title("ORIGINAL-MED | Premium Dashboard")
         self.root.geometry("1100x800")
         self.root.configure(bg="#0f172a") # Deep Slate
@@ -45,18 +153,51 @@ class PremiumStoreManager:
         }
 
         # App State
-        self.products = []
-        self.categories = []
+        self.store = CatalogStore()
+        self.cat_ids = [] # cat_list row -> category id
+        self.load_error = None # Set when products.js could not be parsed
+        self.loading = False # True while load_data runs in the background
+        self.startup = {} # phase -> seconds since start, see mark_startup
+        self.writer = CatalogWriter(PRODUCTS_FILE)
+        self.search_index = SearchIndex()
+        self.journal = Journal(JOURNAL_DIR)
+        self.checker = CatalogChecker(ASSETS_DIR)
+        self.issues = [] # catalog_check results of the last commit; errors block publishing
+        self.pending_dirty = set() # product ids not yet in products.js (None = all)
+        self._write_job = None
+        self.watcher = FileWatcher(PRODUCTS_FILE)
+        self.merging = False # True while an outside change to products.js is being read
         self.selected_images = []
+        self.pending_imports = 0
+        self.import_total = 0
+        self.assets = AssetStore(ASSETS_DIR, metrics=self.metrics)
+        self.thumbs = None
+        if thumbnails_available():
+            self.thumbs = ThumbnailCache(THUMB_CACHE_DIR if THUMB_DISK else None, THUMB_CACHE_MB << 20, metrics=self.metrics)
+            self.thumb_blank = tk.PhotoImage(width=THUMB_EDGE, height=THUMB_EDGE)
+        self.grid_win = None # image grid window, see open_image_grid
+        self.grid_offset = 0
+        self.selected_pid = None
+        self._search_job = None
         self.current_page = "inventory" # or "categories"
+        self.pages = {} # page code -> frame, built on first visit and then kept
         self.sync_status = "Cloud Ready"
         self.search_var = tk.StringVar()
-        self.search_var.trace_add("write", lambda *args: self.refresh_product_table())
+        self.search_var.trace_add("write", lambda *args: self.schedule_search())
+        # Worker threads never call into Tk (not even root.after: that blocks them while on_close
+        # waits in flush, and Tk is not thread-safe); they post here and poll_ui_calls runs the calls
+        self.ui_calls = queue.Queue()
+        self.publisher = PublishQueue(self.run_sync_task, quiet=PUBLISH_QUIET_SECONDS,
+                                      on_status=lambda st: self.post(self.update_sync_ui, st))
 
         self.setup_styles()
         self.create_layout()
         self.setup_bindings()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.root.after_idle(self.mark_startup, "first_paint")
         self.load_data()
+        self.root.after(WATCH_INTERVAL_MS, self.watch_catalog)
+        self.poll_ui_calls()
 
     def setup_styles(self):
         style = ttk.Style()
@@ -82,10 +223,34 @@ class PremiumStoreManager:
         # Nav Buttons
         self.nav_items = {
             "inventory": self.create_nav_btn("📦 إدارة المخزون", "inventory"),
-            "categories": self.create_nav_btn("📂 إدارة الأقسام", "categories")
+            "categories": self.create_nav_btn("📂 إدارة الأقسام", "categories"),
+            "analytics": self.create_nav_btn("📈 التحليلات", "analytics"),
+            "diagnostics": self.create_nav_btn("📊 التشخيص", "diagnostics")
         }
         self.update_nav_ui()
 
+        # Undo / Redo
+        hist = tk.Frame(self.sidebar, bg=self.colors["sidebar"])
+        hist.pack(fill="x", padx=20, pady=(20, 0))
+        self.undo_btn = tk.Button(hist, text="↶ تراجع", font=("Segoe UI Arabic", 10), bg=self.colors["sidebar_active"], fg="white", relief="flat", cursor="hand2", state="disabled", command=self.undo)
+        self.undo_btn.pack(side="right", fill="x", expand=True, padx=(5, 0))
+        self.redo_btn = tk.Button(hist, text="↷ إعادة", font=("Segoe UI Arabic", 10), bg=self.colors["sidebar_active"], fg="white", relief="flat", cursor="hand2", state="disabled", command=self.redo)
+        self.redo_btn.pack(side="left", fill="x", expand=True, padx=(0, 5))
+        self.history_lbl = tk.Label(self.sidebar, text="", font=("Segoe UI Arabic", 9), bg=self.colors["sidebar"], fg="#94a3b8")
+        self.history_lbl.pack(fill="x", padx=20, pady=(5, 0))
+        self.load_lbl = tk.Label(self.sidebar, text="", font=("Segoe UI Arabic", 9), bg=self.colors["sidebar"], fg="#fbbf24")
+        self.load_lbl.pack(fill="x", padx=20, pady=(5, 0))
+        self.check_lbl = tk.Label(self.sidebar, text="", font=("Segoe UI Arabic", 9), bg=self.colors["sidebar"], fg="#94a3b8", cursor="hand2")
+        self.check_lbl.pack(fill="x", padx=20, pady=(5, 0))
+        self.check_lbl.bind("<Button-1>", lambda e: self.show_issues())
+        self.preview = None
+        self.preview_building = self.preview_stale = False
+        self.preview_btn = tk.Button(self.sidebar, text="🌐 معاينة محلية", font=("Segoe UI Arabic", 10), bg=self.colors["sidebar_active"], fg="white", relief="flat", cursor="hand2", command=self.toggle_preview)
+        self.preview_btn.pack(fill="x", padx=20, pady=(15, 0))
+        self.preview_lbl = tk.Label(self.sidebar, text="", font=("Segoe UI", 9), bg=self.colors["sidebar"], fg="#94a3b8", cursor="hand2")
+        self.preview_lbl.pack(fill="x", padx=20, pady=(5, 0))
+        self.preview_lbl.bind("<Button-1>", lambda e: self.preview and webbrowser.open(self.preview.url))
+
         # Cloud Status in Sidebar
         self.status_lbl = tk.Label(self.sidebar, text=f"● {self.sync_status}", font=("Segoe UI", 9), bg=self.colors["sidebar"], fg=self.colors["success"])
         self.status_lbl.pack(side="bottom", pady=20)
@@ -111,20 +276,37 @@ class PremiumStoreManager:
     def show_page(self, page_code):
         self.current_page = page_code
         self.update_nav_ui()
-        
-        for w in self.main_content.winfo_children(): w.destroy()
 
-        if page_code == "inventory":
-            self.render_inventory()
-        else:
-            self.render_categories()
-
-    def render_inventory(self):
+        for code, frame in self.pages.items():
+            if code != page_code: frame.pack_forget()
+        page = self.pages.get(page_code)
+        if page is None:
+            page = self.pages[page_code] = tk.Frame(self.main_content, bg=self.colors["bg"])
+            if page_code == "inventory":
+                self.render_inventory(page)
+            elif page_code == "categories":
+                self.render_categories(page)
+            elif page_code == "analytics":
+                self.render_analytics(page)
+            else:
+                self.render_diagnostics(page)
+        elif page_code == "inventory":
+            # Category names may have changed while the page was hidden
+            self.refresh_cat_choices()
+            self.table.render()
+        elif page_code == "analytics":
+            self.refresh_analytics()
+        elif page_code == "diagnostics":
+            self.refresh_diagnostics()
+        page.pack(fill="both", expand=True)
+
+    def render_inventory(self, page):
         # Header / Search Bar
-        top_bar = tk.Frame(self.main_content, bg=self.colors["bg"], pady=10, padx=20)
+        top_bar = tk.Frame(page, bg=self.colors["bg"], pady=10, padx=20)
         top_bar.pack(fill="x")
         
         tk.Label(top_bar, text="قائمة المنتجات", font=("Segoe UI Arabic", 14, "bold"), bg=self.colors["bg"], fg="white").pack(side="right")
+        tk.Button(top_bar, text="🖼 الصور", command=self.open_image_grid, bg=self.colors["sidebar_active"], fg="white", relief="flat", padx=10).pack(side="right", padx=10)
         
         s_f = tk.Frame(top_bar, bg="white", padx=10, pady=5)
         s_f.pack(side="left", fill="x", expand=True, padx=(0, 40))
@@ -134,7 +316,7 @@ class PremiumStoreManager:
         self.attach_context_menu(ent_s)
 
         # Content Split (Table on Left, Form Card on Right)
-        container = tk.Frame(self.main_content, bg=self.colors["bg"], padx=20, pady=5)
+        container = tk.Frame(page, bg=self.colors["bg"], padx=20, pady=5)
         container.pack(fill="both", expand=True)
 
         pane = tk.PanedWindow(container, orient=tk.HORIZONTAL, bg=self.colors["bg"], sashwidth=6, relief="flat")
@@ -157,8 +339,29 @@ class PremiumStoreManager:
         self.tree.column("stock", width=70, anchor="center")
         self.tree.column("cat", width=90, anchor="center")
 
-        sb = ttk.Scrollbar(tbl_card, orient="vertical", command=self.tree.yview)
-        self.tree.configure(yscroll=sb.set)
+        self.tree.tag_configure("marked", background="#e0e7ff")
+        self.tree.tag_configure("picked", background="#fef3c7")
+        sb = ttk.Scrollbar(tbl_card, orient="vertical")
+        self.table = VirtualTreeview(self.tree, sb, self.product_row)
+        self.table.on_pick = self.update_batch_ui
+
+        # Batch bar: acts on every row picked with Ctrl/Shift+click (or Ctrl+A)
+        batch = tk.Frame(tbl_card, bg="#f8fafc", padx=8, pady=6)
+        batch.pack(side="bottom", fill="x")
+        self.batch_lbl = tk.Label(batch, text="", font=("Segoe UI Arabic", 9), bg="#f8fafc", fg=self.colors["text_muted"])
+        self.batch_lbl.pack(side="right")
+        self.batch_op = tk.StringVar(value=BATCH_OPS["price_pct"])
+        ttk.Combobox(batch, textvariable=self.batch_op, values=list(BATCH_OPS.values()), state="readonly", width=18, justify="right").pack(side="right", padx=5)
+        self.batch_val = tk.StringVar()
+        b_val = tk.Entry(batch, textvariable=self.batch_val, width=8, justify="center", highlightthickness=1, highlightbackground=self.colors["border"])
+        b_val.pack(side="right", padx=5, ipady=2)
+        self.attach_context_menu(b_val)
+        self.batch_cat = tk.StringVar()
+        self.batch_cat_box = ttk.Combobox(batch, textvariable=self.batch_cat, state="readonly", width=14, justify="right")
+        self.batch_cat_box.pack(side="right", padx=5)
+        tk.Button(batch, text="تطبيق", command=self.run_batch, bg=self.colors["primary"], fg="white", relief="flat", padx=10).pack(side="right", padx=5)
+        tk.Button(batch, text="🗑️ حذف المحدد", command=self.del_picked, bg=self.colors["danger"], fg="white", relief="flat", padx=8).pack(side="left")
+        tk.Button(batch, text="تحديد الكل", command=self.pick_all_rows, bg="#cbd5e1", relief="flat", padx=8).pack(side="left", padx=5)
         self.tree.pack(side="left", fill="both", expand=True)
         sb.pack(side="right", fill="y")
         self.tree.bind("<<TreeviewSelect>>", self.on_product_select)
@@ -181,6 +384,8 @@ class PremiumStoreManager:
         f_sb.pack(side="right", fill="y")
 
         self.build_product_fields(self.inner_form)
+        self.refresh_cat_choices()
+        self.update_batch_ui(self.table.picked)
 
         pane.add(tbl_card, width=600)
         pane.add(form_container, width=450)
@@ -199,7 +404,7 @@ class PremiumStoreManager:
         self.p_cat = tk.StringVar(); lbl("القسم:"); 
         self.p_cat_box = ttk.Combobox(target, textvariable=self.p_cat, state="readonly", font=("Segoe UI", 10), justify="right")
         self.p_cat_box.pack(fill="x", pady=2, ipady=3)
-        self.p_cat_box['values'] = [c["name"] for c in self.categories]
+        self.p_cat_box['values'] = [c["name"] for c in self.store.categories]
 
         grid_f = tk.Frame(target, bg="white")
         grid_f.pack(fill="x")
@@ -225,6 +430,10 @@ class PremiumStoreManager:
         lbl("الصور:");
         self.img_box = tk.Listbox(target, height=3, font=("Segoe UI", 9), borderwidth=0, highlightthickness=1)
         self.img_box.pack(fill="x", pady=2)
+        self.thumb_strip = tk.Frame(target, bg="white")
+        self.thumb_strip.pack(fill="x", pady=2)
+        self.import_lbl = tk.Label(target, text="", font=("Segoe UI", 9), bg="white", fg=self.colors["text_muted"])
+        self.import_lbl.pack(anchor="e")
         
         btn_f = tk.Frame(target, bg="white", pady=10)
         btn_f.pack(fill="x")
@@ -240,8 +449,8 @@ class PremiumStoreManager:
         tk.Button(del_f, text="حذف المنتج", command=self.del_product, bg="#94a3b8", fg="white", relief="flat", width=15).pack(side="left")
         tk.Button(del_f, text="تفريغ الحقول", command=self.clear_fields, bg="#64748b", fg="white", relief="flat", width=15).pack(side="right")
 
-    def render_categories(self):
-        container = tk.Frame(self.main_content, bg=self.colors["bg"], padx=40, pady=40)
+    def render_categories(self, page):
+        container = tk.Frame(page, bg=self.colors["bg"], padx=40, pady=40)
         container.pack(fill="both", expand=True)
 
         tk.Label(container, text="إدارة أقسام المتجر", font=("Segoe UI Arabic", 18, "bold"), bg=self.colors["bg"], fg="white").pack(anchor="e")
@@ -265,6 +474,8 @@ class PremiumStoreManager:
         self.cat_name_var = tk.StringVar()
         tk.Entry(r_side, textvariable=self.cat_name_var, font=("Segoe UI", 12), justify="right").pack(fill="x", pady=10)
         
+        self.cat_thumb = tk.Label(r_side, bg="white")
+        self.cat_thumb.pack(pady=(20, 0))
         self.cat_img_label = tk.Label(r_side, text="لا توجد صورة", bg="#f8fafc", height=5, highlightthickness=1)
         self.cat_img_label.pack(fill="x", pady=20)
         tk.Button(r_side, text="📷 تغيير الصورة", command=self.pick_cat_img, bg=self.colors["secondary"], fg="white", relief="flat").pack(fill="x")
@@ -280,208 +491,733 @@ class PremiumStoreManager:
         split.add(r_side, width=500)
         self.refresh_cat_list()
 
+    def render_analytics(self, page):
+        container = tk.Frame(page, bg=self.colors["bg"], padx=40, pady=40)
+        container.pack(fill="both", expand=True)
+
+        top = tk.Frame(container, bg=self.colors["bg"])
+        top.pack(fill="x")
+        tk.Label(top, text="تحليلات المخزون", font=("Segoe UI Arabic", 18, "bold"), bg=self.colors["bg"], fg="white").pack(side="right")
+        tk.Button(top, text="🔄 تحديث", command=self.refresh_analytics, bg=self.colors["secondary"], fg="white", relief="flat", padx=10).pack(side="left")
+        self.low_stock_var = tk.StringVar(value=str(LOW_STOCK))
+        low = ttk.Spinbox(top, from_=0, to=100000, width=6, textvariable=self.low_stock_var, command=self.refresh_analytics)
+        low.pack(side="left", padx=(15, 5))
+        low.bind("<Return>", lambda e: self.refresh_analytics())
+        tk.Label(top, text="حد المخزون المنخفض:", font=("Segoe UI Arabic", 10), bg=self.colors["bg"], fg="#94a3b8").pack(side="left")
+
+        cards = tk.Frame(container, bg=self.colors["bg"])
+        cards.pack(fill="x", pady=15)
+        self.stat_lbls = {}
+        for key, title in (("products", "المنتجات"), ("units", "القطع في المخزون"), ("value", "قيمة المخزون"),
+                           ("out_of_stock", "نفدت من المخزون"), ("on_sale", "عليها خصم")):
+            card = tk.Frame(cards, bg="white", padx=15, pady=10, highlightthickness=1, highlightbackground="#e2e8f0")
+            card.pack(side="right", fill="x", expand=True, padx=5)
+            tk.Label(card, text=title, font=("Segoe UI Arabic", 9), bg="white", fg=self.colors["text_muted"]).pack(anchor="e")
+            self.stat_lbls[key] = tk.Label(card, text="-", font=("Segoe UI", 14, "bold"), bg="white", fg=self.colors["text_main"])
+            self.stat_lbls[key].pack(anchor="e")
+
+        split = tk.PanedWindow(container, orient=tk.HORIZONTAL, bg=self.colors["bg"], sashwidth=4, relief="flat")
+        split.pack(fill="both", expand=True)
+        low_card = tk.Frame(split, bg="white", highlightthickness=1, highlightbackground="#e2e8f0")
+        self.low_lbl = tk.Label(low_card, text="", font=("Segoe UI Arabic", 10, "bold"), bg="white", fg=self.colors["text_main"])
+        self.low_lbl.pack(anchor="e", padx=10, pady=5)
+        self.low_tree = ttk.Treeview(low_card, columns=("id", "name", "stock"), show="headings")
+        for col, title, width in (("id", "ID", 60), ("name", "المنتج", 220), ("stock", "المخزون", 70)):
+            self.low_tree.heading(col, text=title)
+            self.low_tree.column(col, width=width, anchor="center")
+        self.low_tree.tag_configure("empty", foreground=self.colors["danger"])
+        self.low_tree.pack(fill="both", expand=True)
+        self.low_tree.bind("<Double-Button-1>", lambda e: self.low_tree.focus() and self.open_product(int(self.low_tree.focus())))
+
+        cat_card = tk.Frame(split, bg="white", highlightthickness=1, highlightbackground="#e2e8f0")
+        tk.Label(cat_card, text="حسب القسم", font=("Segoe UI Arabic", 10, "bold"), bg="white", fg=self.colors["text_main"]).pack(anchor="e", padx=10, pady=5)
+        cols = ("cat", "products", "units", "value", "out")
+        self.cat_stats_tree = ttk.Treeview(cat_card, columns=cols, show="headings")
+        for col, title, width in (("cat", "القسم", 160), ("products", "المنتجات", 70), ("units", "القطع", 70),
+                                  ("value", "القيمة", 110), ("out", "نفدت", 60)):
+            self.cat_stats_tree.heading(col, text=title)
+            self.cat_stats_tree.column(col, width=width, anchor="center")
+        self.cat_stats_tree.pack(fill="both", expand=True)
+        split.add(low_card, width=380)
+        split.add(cat_card, width=500)
+        self.refresh_analytics()
+
+    def refresh_analytics(self):
+        if self.loading or self.load_error: return
+        try: threshold = int(self.low_stock_var.get())
+        except ValueError: threshold = LOW_STOCK
+        with self.metrics.span("analytics", products=len(self.store.products)):
+            totals, (low_count, low), by_cat = inventory_stats(self.store.products, threshold)
+        for key, val in totals.items():
+            if key in self.stat_lbls: self.stat_lbls[key].config(text=f"{val:,.0f}")
+        self.stat_lbls["value"].config(text=f"{totals['value']:,.0f} ج.م")
+        if totals["on_sale"]:
+            self.stat_lbls["on_sale"].config(text=f"{totals['on_sale']:,} (متوسط {totals['avg_discount'] * 100:.0f}٪)")
+        shown = f"، يظهر أول {len(low)}" if low_count > len(low) else ""
+        self.low_lbl.config(text=f"مخزون منخفض: {low_count} منتج{shown}")
+        self.low_tree.delete(*self.low_tree.get_children())
+        for pid, stock in low:
+            self.low_tree.insert("", tk.END, iid=str(pid), values=(pid, self.store.product(pid)["name"], stock),
+                                 tags=("empty",) if stock <= 0 else ())
+        self.cat_stats_tree.delete(*self.cat_stats_tree.get_children())
+        for cid, st in sorted(by_cat.items(), key=lambda kv: -kv[1]["value"]):
+            self.cat_stats_tree.insert("", tk.END, values=(self.store.category_name(cid, "بدون قسم"), f"{st['products']:,}",
+                                                           f"{st['units']:,}", f"{st['value']:,.0f}", st["out_of_stock"]))
+
+    def render_diagnostics(self, page):
+        container = tk.Frame(page, bg=self.colors["bg"], padx=40, pady=40)
+        container.pack(fill="both", expand=True)
+
+        top = tk.Frame(container, bg=self.colors["bg"])
+        top.pack(fill="x")
+        tk.Label(top, text="التشخيص وسرعة العمليات", font=("Segoe UI Arabic", 18, "bold"), bg=self.colors["bg"], fg="white").pack(side="right")
+        tk.Button(top, text="🔄 تحديث", command=self.refresh_diagnostics, bg=self.colors["secondary"], fg="white", relief="flat", padx=10).pack(side="left")
+        tk.Label(container, text=f"الأزمنة بالملي ثانية، من {METRICS_FILE}", font=("Segoe UI", 9), bg=self.colors["bg"], fg="#94a3b8").pack(anchor="e", pady=(5, 10))
+
+        card = tk.Frame(container, bg="white", highlightthickness=1, highlightbackground="#e2e8f0")
+        card.pack(fill="both", expand=True)
+        cols = ("op", "count", "p50", "p95", "max", "errors", "bytes")
+        self.diag_tree = ttk.Treeview(card, columns=cols, show="headings")
+        for col, title, width in (("op", "العملية", 180), ("count", "العدد", 70), ("p50", "p50", 80), ("p95", "p95", 80),
+                                  ("max", "الأقصى", 80), ("errors", "أخطاء", 70), ("bytes", "البايتات", 120)):
+            self.diag_tree.heading(col, text=title)
+            self.diag_tree.column(col, width=width, anchor="center")
+        self.diag_tree.tag_configure("failed", foreground=self.colors["danger"])
+        self.diag_tree.pack(fill="both", expand=True)
+        self.refresh_diagnostics()
+
+    def refresh_diagnostics(self):
+        self.diag_tree.delete(*self.diag_tree.get_children())
+        for op, st in sorted(self.metrics.stats().items()):
+            self.diag_tree.insert("", tk.END, values=(op, st["count"], f"{st['p50']:.1f}", f"{st['p95']:.1f}", f"{st['max']:.1f}",
+                                                      st["errors"], f"{st['bytes']:,}"), tags=("failed",) if st["errors"] else ())
+
     # --- Data Operations ---
     def load_data(self):
-        if not os.path.exists(PRODUCTS_FILE): return
+        # Read + parse + index off the Tk thread; edits wait until it is done
+        self.loading = True
+        self.load_lbl.config(text="⏳ جاري تحميل المنتجات...")
+        threading.Thread(target=self.load_worker, name="catalog-load", daemon=True).start()
+
+    def load_worker(self):
+        start = time.perf_counter()
+        store, journal = CatalogStore(), Journal(JOURNAL_DIR)
         try:
-            with open(PRODUCTS_FILE, 'r', encoding='utf-8') as f: content = f.read()
-            p_match = re.search(r'var products = (\[.*?\]);', content, re.DOTALL)
-            c_match = re.search(r'var categories = (\[.*?\]);', content, re.DOTALL)
-            
-            def scrub(js):
-                js = re.sub(r'(\w+):\s', r'"\1": ', js)
-                js = re.sub(r',\s*]', ']', js)
-                js = re.sub(r',\s*}', '}', js)
-                return json.loads(js)
-
-            if p_match: self.products = scrub(p_match.group(1))
-            if c_match: self.categories = scrub(c_match.group(1))
-            
-            if self.current_page == "inventory": self.refresh_product_table()
-        except: pass
+            with self.metrics.span("load_data") as m:
+                # Snapshot + edit log when they match products.js, else products.js itself
+                source = journal.open(store, PRODUCTS_FILE)
+                result = (store, journal, SearchIndex(store.products, store.categories), source, None)
+                m.update(source=source, products=len(store.products), bytes=os.path.getsize(PRODUCTS_FILE))
+        except Exception as e:
+            # Whatever went wrong (a damaged journal, a bug) finish_load must run, or self.loading stays True
+            journal.close()
+            result = (None, None, None, None, e if isinstance(e, (OSError, CatalogError)) else f"{type(e).__name__}: {e}")
+        self.post(self.finish_load, result, time.perf_counter() - start)
+
+    def finish_load(self, result, took):
+        store, journal, index, source, error = result
+        self.loading = False
+        self.load_lbl.config(text="")
+        self.startup["load"] = took
+        self.startup["source"] = source or "error"
+        self.root.after_idle(self.mark_startup, "interactive")
+        if error:
+            # Keep the file untouched: saving over a half-read catalog would wipe it.
+            self.load_error = str(error)
+            messagebox.showerror("خطأ في ملف المنتجات", f"تعذر قراءة ملف المنتجات:\n{error}")
+            return
+        self.store, self.journal, self.search_index = store, journal, index
+        self.load_error = None
+        self.update_undo_ui()
+        if self.journal.unflushed:
+            # Edits logged before a crash never made it to products.js
+            self.mark_dirty(None)
+        self.refresh_cat_choices()
+        self.refresh_product_table()
+        if "categories" in self.pages: self.refresh_cat_list()
+        self.run_checks()
+
+    def mark_startup(self, phase):
+        self.startup[phase] = time.perf_counter() - STARTED
+        if phase != "interactive" or not STARTUP_TIMING: return
+        st = self.startup
+        line = (f"{time.strftime('%Y-%m-%d %H:%M:%S')} first_paint={st['first_paint']:.3f}s "
+                f"interactive={st['interactive']:.3f}s load={st['load']:.3f}s "
+                f"source={st['source']} products={len(self.store.products)}")
+        print(line)
+        try:
+            with open(STARTUP_LOG, "a", encoding="utf-8") as f: f.write(line + "\n")
+        except OSError:
+            pass
+        if STARTUP_TIMING == "exit": self.root.after(0, self.on_close)
+
+    def schedule_search(self):
+        # Debounce: only filter once typing pauses for SEARCH_DELAY_MS
+        if self._search_job: self.root.after_cancel(self._search_job)
+        self._search_job = self.root.after(SEARCH_DELAY_MS, self.run_search)
+
+    def run_search(self):
+        self._search_job = None
+        self.table.offset = 0
+        self.refresh_product_table()
+
+    def product_row(self, pid):
+        p = self.store.product(pid)
+        return (p["id"], p["name"], f"{p['price']} ج.م", p.get("stock",0), self.store.category_name(p.get("category_id")))
 
     def refresh_product_table(self):
-        for r in self.tree.get_children(): self.tree.delete(r)
-        q = self.search_var.get().lower()
-        for p in self.products:
-            if q and q not in p["name"].lower() and q not in str(p["id"]): continue
-            cn = next((c["name"] for c in self.categories if c["id"] == p.get("category_id")), "-")
-            self.tree.insert("", "end", values=(p["id"], p["name"], f"{p['price']} ج.م", p.get("stock",0), cn))
+        with self.metrics.span("refresh_product_table") as m:
+            ids = self.search_index.search(self.search_var.get())
+            self.table.marked = self.selected_pid
+            gone = {pid for pid in self.table.picked if self.store.product(pid) is None}
+            if gone:
+                self.table.picked -= gone
+                self.update_batch_ui(self.table.picked)
+            self.table.set_rows(ids)
+            m["rows"] = len(ids)
+
+    def refresh_cat_choices(self):
+        names = [c["name"] for c in self.store.categories]
+        self.p_cat_box['values'] = names
+        self.batch_cat_box['values'] = names
 
     def on_product_select(self, e):
         sel = self.tree.focus()
         if not sel: return
-        pid = int(self.tree.item(sel, 'values')[0])
-        p = next((x for x in self.products if x["id"] == pid), None)
+        p = self.store.product(int(sel))
         if p:
-            self.p_name.set(p["name"])
-            self.p_price.set(p["price"])
-            self.p_old_price.set(p.get("old_price", ""))
-            self.p_stock.set(p.get("stock", "0"))
-            self.p_desc.delete("1.0", tk.END); self.p_desc.insert("1.0", p["description"])
-            self.selected_images = p.get("images", [])
-            self.img_box.delete(0, tk.END)
-            for im in self.selected_images: self.img_box.insert(tk.END, os.path.basename(im))
-            cn = next((c["name"] for c in self.categories if c["id"] == p.get("category_id")), "")
-            self.p_cat.set(cn)
+            self.selected_pid = p["id"]
+            self.table.marked = p["id"]
+            self.table.anchor = p["id"]
+            self.table.pick([p["id"]])
+            self.fill_form(p)
+
+    def fill_form(self, p):
+        self.p_name.set(p["name"])
+        self.p_price.set(p["price"])
+        # Normalized records hold None for "not set"; the entries must show "" for it, not "None"
+        self.p_old_price.set("" if p.get("old_price") is None else p["old_price"])
+        self.p_stock.set(p.get("stock") or 0)
+        self.p_desc.delete("1.0", tk.END); self.p_desc.insert("1.0", p.get("description") or "")
+        self.selected_images = list(p.get("images") or [])
+        self.img_box.delete(0, tk.END)
+        for im in self.selected_images: self.img_box.insert(tk.END, self.assets.label(im))
+        self.p_cat.set(self.store.category_name(p.get("category_id"), ""))
+        self.refresh_thumbs()
 
     def get_form_data(self):
         name = self.p_name.get().strip()
         price_str = re.sub(r'[^\d]', '', self.p_price.get())
-        if not name or not price_str: return None
-        
-        try:
-            p = int(price_str)
-            o = int(re.sub(r'[^\d]', '', self.p_old_price.get())) if self.p_old_price.get() else None
-            s = int(re.sub(r'[^\d]', '', self.p_stock.get())) if self.p_stock.get() else 0
-        except: return None
-
-        cid = next((c["id"] for c in self.categories if c["name"] == self.p_cat.get()), None)
+        if not name or not price_str:
+            messagebox.showwarning("بيانات ناقصة", "اسم المنتج والسعر مطلوبان")
+            return None
+        old_str = re.sub(r'[^\d]', '', self.p_old_price.get())
+        stock_str = re.sub(r'[^\d]', '', self.p_stock.get())
+        p = int(price_str)
+        o = int(old_str) if old_str else None
+        s = int(stock_str) if stock_str else 0
+
+        cat = self.store.category_by_name(self.p_cat.get())
+        cid = cat["id"] if cat else None
         
-        final_imgs = []
-        for im in self.selected_images:
-            if im.startswith("http") or im.startswith("assets/"):
-                final_imgs.append(im)
-            else:
-                try:
-                    fn = os.path.basename(im)
-                    dst = os.path.join(ASSETS_DIR, fn)
-                    if not (os.path.exists(dst) and os.path.samefile(im, dst)):
-                        shutil.copy(im, dst)
-                    final_imgs.append(f"assets/{fn}")
-                except: final_imgs.append(im)
+        # Local paths are swapped for asset refs as their background import finishes
+        final_imgs = [im for im in self.selected_images if is_ref(im)]
+        variants = {im: v for im in final_imgs for v in [self.assets.variants(im)] if v}
 
         return {
             "name": name, "price": p, "old_price": o, "stock": s,
             "description": self.p_desc.get("1.0", tk.END).strip(),
-            "category_id": cid, "images": final_imgs, "image": final_imgs[0] if final_imgs else ""
+            "category_id": cid, "images": final_imgs, "image": final_imgs[0] if final_imgs else "",
+            "variants": variants
         }
 
+    def imports_busy(self):
+        if self.pending_imports:
+            messagebox.showinfo("انتظر", "جاري نسخ الصور، حاول مرة أخرى بعد انتهاء النسخ")
+            return True
+        return False
+
     def save_product(self):
-        sel = self.tree.focus()
-        if not sel: return
+        pid = self.selected_pid
+        if pid is None or self.imports_busy(): return
         data = self.get_form_data()
         if not data: return
-        pid = int(self.tree.item(sel, 'values')[0])
-        p = next((x for x in self.products if x["id"] == pid), None)
-        if p:
-            p.update(data)
-            self.finish_operation("تم تحديث المنتج")
+        tx = self.journal.begin(self.store, "تعديل منتج")
+        tx.touch_product(pid)
+        if self.store.update_product(pid, data):
+            self.finish_operation("تم تحديث المنتج", tx)
 
     def add_product(self):
+        if self.imports_busy(): return
         data = self.get_form_data()
         if not data: return
-        data["id"] = max([x["id"] for x in self.products] or [0]) + 1
-        self.products.append(data)
-        self.finish_operation("تمت إضافة منتج جديد")
+        tx = self.journal.begin(self.store, "إضافة منتج")
+        pid = self.store.add_product(data)
+        tx.created_product(pid)
+        self.selected_pid = pid
+        self.finish_operation("تمت إضافة منتج جديد", tx)
 
     def del_product(self):
-        sel = self.tree.focus()
-        if not sel: return
+        if self.selected_pid is None: return
         if messagebox.askyesno("تأكيد", "هل تريد حذف هذا المنتج؟"):
-            pid = int(self.tree.item(sel, 'values')[0])
-            self.products = [x for x in self.products if x["id"] != pid]
-            self.finish_operation("تم حذف المنتج")
-
-    def finish_operation(self, msg):
-        self.commit_to_js()
+            pid = self.selected_pid
+            tx = self.journal.begin(self.store, "حذف منتج")
+            tx.touch_product(pid)
+            self.store.remove_product(pid)
+            self.selected_pid = None
+            self.finish_operation("تم حذف المنتج", tx)
+
+    # --- Batch Edit ---
+    def update_batch_ui(self, picked):
+        self.batch_lbl.config(text=f"{len(picked)} محدد" if len(picked) > 1 else "Ctrl/Shift + نقر لتحديد عدة منتجات")
+
+    def pick_all_rows(self):
+        self.table.pick(self.table.keys)
+
+    def run_batch(self):
+        pids = list(self.table.picked)
+        if not pids:
+            messagebox.showinfo("تعديل جماعي", "حدد المنتجات أولاً (Ctrl أو Shift مع النقر)")
+            return
+        op = next(k for k, label in BATCH_OPS.items() if label == self.batch_op.get())
+        try:
+            if op == "category":
+                cat = self.store.category_by_name(self.batch_cat.get())
+                value = cat["id"] if cat else None
+            else:
+                value = parse_amount(self.batch_val.get())
+            changes = batch_changes(self.store, pids, op, value)
+        except ValueError as e:
+            messagebox.showerror("تعديل جماعي", str(e))
+            return
+        if not changes:
+            messagebox.showinfo("تعديل جماعي", "لا يوجد ما يتغير في المنتجات المحددة")
+            return
+        if not messagebox.askyesno("تأكيد", f"{self.batch_op.get()} لعدد {len(changes)} منتج؟"): return
+        # One journal entry, one catalog write and one publish for the whole batch
+        tx = self.journal.begin(self.store, f"تعديل جماعي ({len(changes)})")
+        tx.touch_products(changes)
+        apply_batch(self.store, changes)
+        if self.selected_pid in changes: self.fill_form(self.store.product(self.selected_pid))
+        self.finish_operation(f"تم تعديل {len(changes)} منتج", tx)
+
+    def del_picked(self):
+        pids = list(self.table.picked)
+        if not pids or not messagebox.askyesno("تأكيد", f"هل تريد حذف {len(pids)} منتج؟"): return
+        tx = self.journal.begin(self.store, f"حذف جماعي ({len(pids)})")
+        tx.touch_products(pids)
+        self.store.remove_products(pids)
+        if self.selected_pid in self.table.picked:
+            self.selected_pid = None
+            self.clear_fields()
+        self.table.pick(())
+        self.finish_operation(f"تم حذف {len(pids)} منتج", tx)
+
+    def finish_operation(self, msg, tx):
+        if not self.record(tx): return
         self.refresh_product_table()
-        self.trigger_auto_sync()
+        if self.selected_pid is not None: self.table.see(self.selected_pid)
         messagebox.showinfo("نجاح", msg)
 
-    def commit_to_js(self):
-        js = f"var products = {json.dumps(self.products, ensure_ascii=True, indent=4)};\n"
-        js += f"var categories = {json.dumps(self.categories, ensure_ascii=True, indent=4)};"
-        with open(PRODUCTS_FILE, 'w', encoding='utf-8') as f: f.write(js)
-        
-        # Cache Bust index.html
+    def record(self, tx):
+        # Log the edit (one fsync'd line); the catalog files follow in flush_catalog
+        if self.loading:
+            tx.rollback()
+            messagebox.showinfo("انتظر", "جاري تحميل المنتجات، حاول مرة أخرى بعد انتهاء التحميل")
+            return False
+        if self.load_error:
+            tx.rollback()
+            messagebox.showerror("لم يتم الحفظ", f"ملف المنتجات تالف ولم يتم تحميله، أصلحه أولاً:\n{self.load_error}")
+            return False
+        try:
+            dirty = self.journal.commit(tx)
+        except OSError as e:
+            tx.rollback()
+            messagebox.showerror("لم يتم الحفظ", f"تعذر تسجيل التعديل:\n{e}")
+            return False
+        if dirty is not None: self.mark_dirty(dirty)
+        return True
+
+    def mark_dirty(self, dirty):
+        if dirty is None or self.pending_dirty is None: self.pending_dirty = None
+        else: self.pending_dirty |= dirty
+        self.search_index.update(self.store, dirty)
+        self.update_undo_ui()
+        if self._write_job: self.root.after_cancel(self._write_job)
+        self._write_job = self.root.after(WRITE_DELAY_MS, self.flush_catalog)
+
+    def flush_catalog(self):
+        if self._write_job: self.root.after_cancel(self._write_job)
+        self._write_job = None
+        if not self.journal.unflushed: return True
+        # Never write over someone else's products.js: merge it first (finish_merge flushes)
+        if self.check_external(): return False
+        dirty, self.pending_dirty = self.pending_dirty, set()
+        if not self.commit_to_js(dirty):
+            self.pending_dirty = None
+            return False
+        # On failure the next start sees products.js != checkpoint and reloads it; only undo history is lost
+        try: self.journal.checkpoint(self.store, self.writer.digest)
+        except OSError: pass
+        if not self.run_checks()[0]: self.trigger_auto_sync()
+        if self.preview: self.rebuild_preview()
+        return True
+
+    # --- Outside Changes ---
+    def watch_catalog(self):
+        self.root.after(WATCH_INTERVAL_MS, self.watch_catalog)
+        self.check_external()
+
+    def check_external(self, wait=False):
+        # Start merging products.js if it changed under us; True while that is in progress
+        if self.merging: return True
+        if self.loading: return False
+        digest = self.watcher.poll(self.writer.digest)
+        if digest is None: return False
+        self.watcher.seen()
+        if self.load_error:
+            # Someone fixed the broken file: load it from scratch
+            self.writer = CatalogWriter(PRODUCTS_FILE)
+            self.load_data()
+            return True
+        self.merging = True
+        if wait:
+            self.finish_merge(self.read_external())
+        else:
+            threading.Thread(target=self.reload_worker, name="catalog-reload", daemon=True).start()
+        return self.merging
+
+    def reload_worker(self):
+        self.post(self.finish_merge, self.read_external())
+
+    def read_external(self):
+        try:
+            with self.metrics.span("read_external") as m:
+                products, categories, digest = read_catalog(PRODUCTS_FILE)
+                m.update(products=len(products), bytes=os.path.getsize(PRODUCTS_FILE))
+            return products, categories, digest, None
+        except (OSError, ValueError) as e:
+            return None, None, None, e
+
+    def finish_merge(self, result):
+        self.merging = False
+        products, categories, digest, error = result
+        if error:
+            # Most likely caught half-written; the next change is picked up again
+            self.load_lbl.config(text="⚠ تغيّر ملف المنتجات من خارج البرنامج وتعذرت قراءته")
+            return
+        with self.metrics.span("merge_external") as m:
+            old = self.store
+            merged, conflicts, renamed = merge_catalog(old, products, categories, self.journal.pending_base())
+            changed = changed_products(old, merged)
+            cats = old.categories != merged.categories
+            reordered = cats or [p["id"] for p in old.products] != [p["id"] for p in merged.products]
+            old.load(merged.products, merged.categories)
+            m.update(changed=len(changed), conflicts=len(conflicts), renamed=len(renamed))
+        self.writer.digest = digest
+        if not changed and not reordered:
+            # Same records, only the bytes differ; flush_catalog gave up on the edits waiting for this merge
+            if self.journal.unflushed: self.flush_catalog()
+            return
+        # The file is the new base: cached lines of changed records and the undo history are stale
+        try: self.journal.rebase(self.store, digest)
+        except OSError: pass
+        self.journal.unflushed = True
+        self.pending_dirty = None if reordered or self.pending_dirty is None else self.pending_dirty | changed
+        self.search_index.update(self.store, None if reordered else changed)
+        self.update_undo_ui()
+        if cats:
+            self.refresh_cat_choices()
+            if "categories" in self.pages: self.refresh_cat_list()
+        # A product added here whose id the file took meanwhile has moved to a new id
+        self.selected_pid = renamed.get(("p", self.selected_pid), self.selected_pid)
+        if self.selected_pid in changed:
+            p = self.store.product(self.selected_pid)
+            if p: self.fill_form(p)
+            else:
+                self.selected_pid = None
+                self.clear_fields()
+        self.refresh_product_table()
+        self.flush_catalog()
+        note = f"🔄 تحديث من خارج البرنامج: {len(changed)} منتج"
+        self.load_lbl.config(text=note + (f"، ⚠ {len(conflicts)} تعارض" if conflicts else ""))
+        if conflicts:
+            names = "\n".join(f"• {name}" for _, _, name in conflicts[:15])
+            more = f"\n... و{len(conflicts) - 15} أخرى" if len(conflicts) > 15 else ""
+            messagebox.showwarning("تعارض في التعديلات",
+                                   f"عُدّلت هذه العناصر في ملف المنتجات وفي البرنامج معًا، وتم الإبقاء على تعديلاتك:\n{names}{more}")
+
+    # --- Validation ---
+    def run_checks(self):
+        self.issues = self.checker.check(self.store)
+        errors, warnings = count_issues(self.issues)
+        if errors:
+            self.check_lbl.config(text=f"⛔ {errors} أخطاء تمنع النشر", fg=self.colors["danger"])
+        elif warnings:
+            self.check_lbl.config(text=f"⚠ {warnings} تحذيرات", fg="#fbbf24")
+        else:
+            self.check_lbl.config(text="✔ الكتالوج سليم", fg=self.colors["success"])
+        return errors, warnings
+
+    def show_issues(self):
+        if not self.issues: return
+        win = tk.Toplevel(self.root)
+        win.title("فحص الكتالوج")
+        win.geometry("700x400")
+        lb = tk.Listbox(win, font=("Segoe UI Arabic", 10), justify="right")
+        sb = ttk.Scrollbar(win, orient="vertical", command=lb.yview)
+        lb.configure(yscrollcommand=sb.set)
+        sb.pack(side="left", fill="y")
+        lb.pack(side="right", fill="both", expand=True)
+        issues = self.issues[:1000]
+        for i in issues:
+            lb.insert(tk.END, ("⛔ " if i.level == CHECK_ERROR else "⚠ ") + i.message)
+        if len(self.issues) > len(issues): lb.insert(tk.END, f"... و{len(self.issues) - len(issues)} أخرى")
+        def on_open(e):
+            sel = lb.curselection()
+            if sel and sel[0] < len(issues): self.open_issue(issues[sel[0]])
+        lb.bind("<Double-Button-1>", on_open)
+
+    def open_issue(self, issue):
+        # Jump to the record the issue is about
+        if issue.pid is not None and self.store.product(issue.pid):
+            self.open_product(issue.pid)
+        elif issue.cid is not None and self.store.category(issue.cid):
+            self.show_page("categories")
+            i = self.cat_ids.index(issue.cid)
+            self.cat_list.selection_clear(0, tk.END)
+            self.cat_list.selection_set(i)
+            self.cat_list.see(i)
+            self.on_cat_select(None)
+
+    def open_product(self, pid):
+        self.show_page("inventory")
+        if not self.table.see(pid):
+            self.search_var.set("")
+            self.run_search()
+            self.table.see(pid)
+        self.selected_pid = self.table.marked = self.table.anchor = pid
+        self.table.pick([pid])
+        self.fill_form(self.store.product(pid))
+
+    def commit_to_js(self, dirty=None):
+        # dirty: ids of the products touched by this edit (None = re-encode all)
+        if self.load_error:
+            messagebox.showerror("لم يتم الحفظ", f"ملف المنتجات تالف ولم يتم تحميله، أصلحه أولاً:\n{self.load_error}")
+            return False
+        # Only products.js: the storefront files are generated from it by the build (dist/)
+        with SITE_LOCK: # a publish may be committing it or the preview building from it right now
+            try:
+                with self.metrics.span("commit_to_js", dirty=len(dirty) if dirty is not None else "all") as m:
+                    changed = self.writer.write(self.store.products, self.store.categories, dirty)
+                    m["bytes"] = os.path.getsize(PRODUCTS_FILE) if changed else 0
+            except OSError as e:
+                error = e
+            else:
+                error = None
+        # The dialog only once the lock is released, or a publish would wait on the user
+        if error:
+            messagebox.showerror("لم يتم الحفظ", f"تعذر كتابة ملف المنتجات:\n{error}")
+            return False
+        return True
+
+    # --- Local Preview ---
+    def toggle_preview(self):
+        if self.preview:
+            self.preview.stop()
+            self.preview = None
+            self.preview_btn.config(text="🌐 معاينة محلية")
+            self.preview_lbl.config(text="")
+            return
+        self.flush_catalog()
+        server = PreviewServer(DIST_DIR, port=PREVIEW_PORT, config=os.path.join(BASE_DIR, "vercel.json"), metrics=self.metrics)
+        try:
+            url = server.start()
+        except OSError as e:
+            messagebox.showerror("المعاينة", f"تعذر تشغيل المعاينة على المنفذ {PREVIEW_PORT}:\n{e}")
+            return
+        self.preview = server
+        self.preview_btn.config(text="⏹ إيقاف المعاينة")
+        self.preview_lbl.config(text=url)
+        self.rebuild_preview(lambda: webbrowser.open(url))
+
+    def rebuild_preview(self, then=None):
+        # The preview serves dist/: rebuild it off the Tk thread, one build at a time
+        if self.preview_building:
+            self.preview_stale = True
+            return
+        self.preview_building = True
+        threading.Thread(target=self.preview_worker, args=(then,), name="preview-build", daemon=True).start()
+
+    def preview_worker(self, then):
         try:
-            idx = os.path.join(BASE_DIR, 'index.html')
-            with open(idx, 'r', encoding='utf-8') as f: c = f.read()
-            new_c = re.sub(r'src="scripts/products\.js(\?v=\d+)?"', f'src="scripts/products.js?v={int(time.time())}"', c)
-            with open(idx, 'w', encoding='utf-8') as f: f.write(new_c)
-        except: pass
+            with self.metrics.span("build_site"): build_site()
+            error = None
+        except (OSError, ValueError) as e:
+            error = e
+        self.post(self.finish_preview_build, error, then)
+
+    def finish_preview_build(self, error, then):
+        self.preview_building = False
+        if error:
+            messagebox.showerror("المعاينة", f"تعذر بناء الموقع للمعاينة:\n{error}")
+        elif then:
+            then()
+        if self.preview_stale:
+            self.preview_stale = False
+            if self.preview: self.rebuild_preview()
 
     # --- Sync Engine ---
     def trigger_auto_sync(self):
-        self.sync_status = "Syncing..."
-        self.status_lbl.config(text=f"● {self.sync_status}", fg="#fbbf24")
-        threading.Thread(target=self.run_sync_task, daemon=True).start()
+        self.publisher.request()
 
     def run_sync_task(self):
-        sh = os.path.join(BASE_DIR, 'publish_store_silent.bat')
-        res = subprocess.run([sh], capture_output=True, text=True, creationflags=0x08000000)
-        
-        def update_ui():
-            if res.returncode == 0:
-                self.sync_status = "Online & Synced"
-                self.status_lbl.config(text=f"● {self.sync_status}", fg=self.colors["success"])
-            else:
-                self.sync_status = "Sync Failed"
-                self.status_lbl.config(text=f"● {self.sync_status}", fg=self.colors["danger"])
-                # Only show error if explicitly requested or critical
-        self.root.after(0, update_ui)
+        # Runs on the publish worker thread, one sync at a time
+        errors = count_issues(self.issues)[0]
+        with self.metrics.span("run_sync_task") as m:
+            if errors: raise RuntimeError(f"{errors} catalog errors, not published")
+            report = run_publish()
+            m.update(files=report["files"], attempts=report["attempts"])
+        return report["ok"]
+
+    def on_close(self):
+        if self.journal.unflushed and (self.check_external(wait=True) or not self.flush_catalog()):
+            if not messagebox.askyesno("تأكيد", "تعذر حفظ ملف المنتجات، التعديلات محفوظة في السجل وستُكتب عند الفتح التالي. إغلاق البرنامج؟"): return
+        # Don't drop edits still waiting out the quiet period
+        if self.publisher.status()["state"] in ("waiting", "syncing"):
+            self.status_lbl.config(text="● Publishing before exit...", fg="#fbbf24")
+            self.root.update_idletasks()
+            self.publisher.flush(timeout=120) # safe to block: the worker only reports through ui_calls
+        if self.preview: self.preview.stop()
+        if self.thumbs: self.thumbs.shutdown()
+        self.journal.close()
+        self.root.destroy()
+
+    def post(self, fn, *args):
+        # Any thread: have the Tk thread call fn(*args) on its next poll
+        self.ui_calls.put((fn, args))
+
+    def poll_ui_calls(self):
+        while True:
+            try: fn, args = self.ui_calls.get_nowait()
+            except queue.Empty: break
+            fn(*args)
+        self.root.after(UI_POLL_MS, self.poll_ui_calls)
+
+    def update_sync_ui(self, st):
+        if st["state"] == "syncing":
+            self.sync_status, color = "Syncing...", "#fbbf24"
+        elif st["state"] == "waiting":
+            self.sync_status, color = "Pending changes", "#fbbf24"
+        elif st["state"] == "failed":
+            self.sync_status, color = "Sync Failed", self.colors["danger"]
+        else:
+            self.sync_status, color = "Online & Synced", self.colors["success"]
+        text = f"● {self.sync_status}"
+        if st["pending"]: text += f" | queue {st['pending']}"
+        if st["last_duration"] is not None: text += f" | last {st['last_duration']:.1f}s"
+        self.status_lbl.config(text=text, fg=color)
 
     # --- Categories Logic ---
     def refresh_cat_list(self):
         self.cat_list.delete(0, tk.END)
-        for c in self.categories: self.cat_list.insert(tk.END, c["name"])
+        self.cat_ids = [c["id"] for c in self.store.categories]
+        for c in self.store.categories: self.cat_list.insert(tk.END, c["name"])
 
     def on_cat_select(self, e):
         sel = self.cat_list.curselection()
         if not sel: return
-        name = self.cat_list.get(sel[0])
-        cat = next((c for c in self.categories if c["name"] == name), None)
+        cat = self.store.category(self.cat_ids[sel[0]])
         if cat:
             self.cat_name_var.set(cat["name"])
             self.cur_cat_img = cat.get("image", "")
-            self.cat_img_label.config(text=os.path.basename(self.cur_cat_img) if self.cur_cat_img else "لا توجد صورة")
+            self.cat_img_label.config(text=self.assets.label(self.cur_cat_img) if self.cur_cat_img else "لا توجد صورة")
+            self.show_thumb(self.cat_thumb, self.cur_cat_img)
 
     def pick_cat_img(self):
         f = filedialog.askopenfilename(filetypes=[("Images", "*.jpg;*.png;*.jpeg;*.webp")])
         if f:
             self.cur_cat_img = f
-            self.cat_img_label.config(text=os.path.basename(f))
+            self.cat_img_label.config(text=f"⏳ {os.path.basename(f)}")
+            self.show_thumb(self.cat_thumb, f)
+            self.import_images([f], self.on_cat_img_imported)
+
+    def on_cat_img_imported(self, src, ref):
+        if self.cur_cat_img != src: return # another image was picked meanwhile
+        self.cur_cat_img = ref
+        self.cat_img_label.config(text=self.assets.label(ref) if ref else "لا توجد صورة")
+        self.show_thumb(self.cat_thumb, ref)
 
     def save_category(self):
         name = self.cat_name_var.get().strip()
-        if not name: return
+        if not name or self.imports_busy(): return
         
-        img_url = "https://via.placeholder.com/150"
-        if hasattr(self, 'cur_cat_img') and self.cur_cat_img:
-            if self.cur_cat_img.startswith("http") or self.cur_cat_img.startswith("assets/"):
-                img_url = self.cur_cat_img
-            else:
-                fn = os.path.basename(self.cur_cat_img)
-                shutil.copy(self.cur_cat_img, os.path.join(ASSETS_DIR, fn))
-                img_url = f"assets/{fn}"
+        img_url = "" # no third-party placeholder; the storefront does without
+        if getattr(self, 'cur_cat_img', None) and is_ref(self.cur_cat_img):
+            img_url = self.cur_cat_img
 
+        tx = self.journal.begin(self.store, "حفظ قسم")
         sel = self.cat_list.curselection()
         if sel:
-            old = self.cat_list.get(sel[0])
-            cat = next((c for c in self.categories if c["name"] == old), None)
-            if cat: cat["name"] = name; cat["image"] = img_url
+            tx.touch_category(self.cat_ids[sel[0]])
+            self.store.update_category(self.cat_ids[sel[0]], name=name, image=img_url)
         else:
-            nid = max([c["id"] for c in self.categories] or [0]) + 1
-            self.categories.append({"id": nid, "name": name, "image": img_url})
+            tx.created_category(self.store.add_category(name, img_url)["id"])
         
-        self.commit_to_js()
+        if not self.record(tx): return
         self.refresh_cat_list()
-        self.trigger_auto_sync()
         messagebox.showinfo("نجاح", "تم حفظ القسم")
 
     def del_category(self):
         sel = self.cat_list.curselection()
         if not sel: return
-        if messagebox.askyesno("تأكيد", "حذف القسم؟"):
-            name = self.cat_list.get(sel[0])
-            self.categories = [c for c in self.categories if c["name"] != name]
-            self.commit_to_js()
+        cid = self.cat_ids[sel[0]]
+        pids = self.store.products_in(cid)
+        msg = f"حذف القسم؟\n{len(pids)} منتج في هذا القسم ستصبح بدون قسم." if pids else "حذف القسم؟"
+        if messagebox.askyesno("تأكيد", msg):
+            # Detach the products in the same step so none points at a missing category
+            tx = self.journal.begin(self.store, "حذف قسم")
+            tx.touch_category(cid)
+            tx.touch_products(pids)
+            for pid in pids: self.store.update_product(pid, {"category_id": None})
+            self.store.remove_category(cid)
+            if not self.record(tx): return
             self.refresh_cat_list()
-            self.trigger_auto_sync()
+
+    # --- Undo / Redo ---
+    def undo(self):
+        self.step_history(self.journal.undo)
+
+    def redo(self):
+        self.step_history(self.journal.redo)
+
+    def step_history(self, step):
+        if self.load_error or self.loading: return
+        try:
+            res = step(self.store)
+        except OSError as e:
+            messagebox.showerror("لم يتم الحفظ", f"تعذر تسجيل العملية:\n{e}")
+            return
+        if res is None: return
+        label, pids, cats = res
+        self.mark_dirty(pids)
+        if self.selected_pid is not None and self.store.product(self.selected_pid) is None:
+            self.selected_pid = None
+            self.clear_fields()
+        if cats: self.refresh_cat_choices()
+        self.refresh_product_table()
+        if "categories" in self.pages: self.refresh_cat_list()
+
+    def update_undo_ui(self):
+        label = self.journal.undo_label()
+        self.undo_btn.config(state="normal" if label else "disabled")
+        self.redo_btn.config(state="normal" if self.journal.redo_stack else "disabled")
+        self.history_lbl.config(text=f"آخر تعديل: {label}" if label else "")
 
     def clear_cat_fields(self):
         self.cat_name_var.set(""); self.cat_img_label.config(text="لا توجد صورة"); self.cur_cat_img = None
+        self.show_thumb(self.cat_thumb, None)
+        self.cat_list.selection_clear(0, tk.END)
 
     # --- Utilities (Universal No-Fail Interaction Engine) ---
     def setup_bindings(self):
@@ -507,9 +1243,16 @@ class PremiumStoreManager:
             elif shortcut == 'x' or code == 88:
                 w.event_generate("<<Cut>>")
             elif shortcut == 'a' or code == 65:
+                if w is getattr(self, "tree", None):
+                    self.pick_all_rows()
+                    return "break"
                 return self.perfect_select_all(w)
-        except:
-            pass
+            elif (shortcut in ('z', 'y') or code in (90, 89)) and not isinstance(w, (tk.Entry, tk.Text, ttk.Entry)):
+                # Catalog undo/redo (Ctrl+Z, Ctrl+Y / Ctrl+Shift+Z) outside text fields
+                if shortcut == 'y' or code == 89 or event.state & 0x1: self.redo()
+                else: self.undo()
+        except tk.TclError:
+            pass # widget gone or has no clipboard support
         return "break"
 
     def perfect_paste(self, w):
@@ -517,12 +1260,12 @@ class PremiumStoreManager:
         try:
             txt = ""
             try: txt = self.root.clipboard_get()
-            except: 
+            except tk.TclError:
                 try: txt = self.root.selection_get(selection='CLIPBOARD')
-                except: 
+                except tk.TclError:
                     # Last ditch fallback to virtual event if manual fails
                     try: w.event_generate("<<Paste>>")
-                    except: pass
+                    except tk.TclError: pass
                     return "break"
             
             if txt:
@@ -530,15 +1273,15 @@ class PremiumStoreManager:
                 if hasattr(w, 'selection_range') and not isinstance(w, tk.Text):
                     try:
                         if w.selection_present(): w.delete(tk.SEL_FIRST, tk.SEL_LAST)
-                    except: pass
+                    except tk.TclError: pass
                     w.insert(tk.INSERT, txt)
                 # Handle Text widget
                 elif isinstance(w, tk.Text):
                     try:
                         if w.tag_ranges(tk.SEL): w.delete(tk.SEL_FIRST, tk.SEL_LAST)
-                    except: pass
+                    except tk.TclError: pass
                     w.insert(tk.INSERT, txt)
-        except: pass
+        except tk.TclError: pass
         return "break"
 
     def perfect_select_all(self, w):
@@ -548,107 +1291,329 @@ class PremiumStoreManager:
                 w.icursor(tk.END)
             if isinstance(w, tk.Text):
                 w.tag_add(tk.SEL, "1.0", "end")
-        except: pass
+        except tk.TclError: pass
         return "break"
 
     def attach_context_menu(self, w):
         m = tk.Menu(w, tearoff=0)
         m.add_command(label="نسخ (Copy)", command=lambda: w.event_generate("<<Copy>>"))
         m.add_command(label="قص (Cut)", command=lambda: w.event_generate("<<Cut>>"))
-        m.add_command(label="لصق (Paste)", command=lambda: self.handle_paste(w))
+        m.add_command(label="لصق (Paste)", command=lambda: self.perfect_paste(w))
         m.add_separator()
-        m.add_command(label="تحديد الكل", command=lambda: self.handle_select_all(w))
+        m.add_command(label="تحديد الكل", command=lambda: self.perfect_select_all(w))
         w.bind("<Button-3>", lambda e: [w.focus_set(), m.post(e.x_root, e.y_root)])
 
     def add_imgs(self):
         fs = filedialog.askopenfilenames(filetypes=[("Images", "*.jpg;*.png;*.jpeg;*.webp")])
-        for f in fs:
-            if f not in self.selected_images:
-                self.selected_images.append(f)
-                self.img_box.insert(tk.END, os.path.basename(f))
+        new = [f for f in dict.fromkeys(fs) if f not in self.selected_images]
+        for f in new:
+            self.selected_images.append(f)
+            self.img_box.insert(tk.END, f"⏳ {os.path.basename(f)}")
+        if new:
+            self.refresh_thumbs()
+            self.import_images(new, self.on_product_img_imported)
+
+    def on_product_img_imported(self, src, ref):
+        if src not in self.selected_images: return # form was switched or image removed
+        i = self.selected_images.index(src)
+        self.img_box.delete(i)
+        if ref is None:
+            self.selected_images.pop(i)
+        elif ref in self.selected_images:
+            self.selected_images.pop(i) # same picture already attached
+        else:
+            self.selected_images[i] = ref
+            self.img_box.insert(i, self.assets.label(ref))
+        self.refresh_thumbs()
+
+    # --- Asset Imports (copied on the asset store's thread pool) ---
+    def import_images(self, files, on_done):
+        self.pending_imports += len(files)
+        self.import_total += len(files)
+        self.update_import_ui()
+        for f in files:
+            fut = self.assets.submit(f)
+            fut.add_done_callback(lambda fut, f=f: self.post(self.finish_import, f, fut, on_done))
+
+    def finish_import(self, src, fut, on_done):
+        self.pending_imports -= 1
+        try:
+            ref = fut.result()
+        except OSError as e:
+            ref = None
+            messagebox.showerror("خطأ في الصورة", f"تعذر نسخ الصورة:\n{os.path.basename(src)}\n{e}")
+        on_done(src, ref)
+        if not self.pending_imports: self.import_total = 0
+        self.update_import_ui()
+
+    def update_import_ui(self):
+        if not hasattr(self, "import_lbl") or not self.import_lbl.winfo_exists(): return
+        done = self.import_total - self.pending_imports
+        self.import_lbl.config(text=f"نسخ الصور {done}/{self.import_total}" if self.pending_imports else "")
+
+    # --- Thumbnails (decoded on the thumbnail cache's threads) ---
+    def thumb_source(self, src):
+        # File to preview: the small variant of an imported image when it has one
+        if not src or src.startswith(("http://", "https://")): return None
+        if not is_ref(src): return src # picked file still being imported
+        small = (self.assets.variants(src) or {}).get("thumb")
+        return self.assets.path(small or src)
+
+    def show_thumb(self, label, src):
+        # Preview src on label: at once when cached, else once a worker has decoded it
+        if not self.thumbs: return
+        label.thumb_src = path = self.thumb_source(src)
+        label.config(image=self.thumb_blank if path else "")
+        label.image = None
+        if not path: return
+        def ready(data):
+            if data is None or getattr(label, "thumb_src", None) != path or not label.winfo_exists(): return
+            label.image = tk.PhotoImage(data=base64.b64encode(data).decode("ascii")) # Tk drops images Python holds no reference to
+            label.config(image=label.image)
+        data = self.thumbs.get(path, lambda data: self.post(ready, data))
+        if data is not None: ready(data)
+
+    def refresh_thumbs(self):
+        for w in self.thumb_strip.winfo_children(): w.destroy()
+        if not self.thumbs: return
+        per_row = max(1, 380 // (THUMB_EDGE + 6))
+        for i, src in enumerate(self.selected_images):
+            lbl = tk.Label(self.thumb_strip, bg="#f8fafc", cursor="hand2", highlightthickness=1, highlightbackground=self.colors["border"])
+            lbl.grid(row=i // per_row, column=per_row - 1 - i % per_row, padx=2, pady=2)
+            lbl.bind("<Button-1>", lambda e, i=i: (self.img_box.selection_clear(0, tk.END), self.img_box.selection_set(i)))
+            self.show_thumb(lbl, src)
+
+    def open_image_grid(self):
+        # Thumbnails of the products in the current search, a page at a time
+        if not self.thumbs:
+            messagebox.showinfo("الصور", "لعرض الصور المصغرة ثبّت مكتبة Pillow:\npip install Pillow")
+            return
+        if self.grid_win and self.grid_win.winfo_exists():
+            self.grid_win.lift()
+            self.fill_image_grid(0)
+            return
+        win = self.grid_win = tk.Toplevel(self.root)
+        win.title("صور المنتجات")
+        win.configure(bg="white")
+        nav = tk.Frame(win, bg="white", pady=8)
+        nav.pack(fill="x")
+        tk.Button(nav, text="السابق ◀", command=lambda: self.fill_image_grid(self.grid_offset - GRID_PAGE), bg="#cbd5e1", relief="flat", padx=10).pack(side="right", padx=10)
+        self.grid_lbl = tk.Label(nav, text="", font=("Segoe UI Arabic", 10), bg="white", fg=self.colors["text_muted"])
+        self.grid_lbl.pack(side="right", expand=True)
+        tk.Button(nav, text="▶ التالي", command=lambda: self.fill_image_grid(self.grid_offset + GRID_PAGE), bg="#cbd5e1", relief="flat", padx=10).pack(side="left", padx=10)
+        body = tk.Frame(win, bg="white", padx=10, pady=10)
+        body.pack(fill="both", expand=True)
+        self.grid_cells = []
+        for i in range(GRID_PAGE):
+            cell = tk.Frame(body, bg="white", padx=6, pady=6)
+            cell.grid(row=i // GRID_COLS, column=GRID_COLS - 1 - i % GRID_COLS, sticky="n")
+            img = tk.Label(cell, bg="#f8fafc", cursor="hand2")
+            img.pack()
+            name = tk.Label(cell, font=("Segoe UI Arabic", 8), bg="white", fg=self.colors["text_main"], wraplength=THUMB_EDGE + 30, justify="center")
+            name.pack()
+            self.grid_cells.append((cell, img, name))
+        self.fill_image_grid(0)
+
+    def fill_image_grid(self, offset):
+        ids = self.table.keys
+        offset = max(0, min(offset, (len(ids) - 1) // GRID_PAGE * GRID_PAGE)) if ids else 0
+        self.grid_offset = offset
+        shown = ids[offset:offset + GRID_PAGE]
+        for i, (cell, img, name) in enumerate(self.grid_cells):
+            p = self.store.product(shown[i]) if i < len(shown) else None
+            if p is None:
+                cell.grid_remove()
+                continue
+            cell.grid()
+            name.config(text=p["name"])
+            img.bind("<Button-1>", lambda e, pid=p["id"]: self.open_product(pid))
+            self.show_thumb(img, (p.get("images") or [p.get("image")])[0])
+        self.grid_lbl.config(text=f"{offset + 1}-{offset + len(shown)} من {len(ids)}" if ids else "لا توجد منتجات")
 
     def del_img(self):
         s = self.img_box.curselection()
-        if s: self.selected_images.pop(s[0]); self.img_box.delete(s[0])
+        if s: self.selected_images.pop(s[0]); self.img_box.delete(s[0]); self.refresh_thumbs()
 
     def clear_fields(self):
         self.p_name.set(""); self.p_price.set(""); self.p_old_price.set(""); self.p_stock.set("")
         self.p_desc.delete("1.0", tk.END); self.selected_images = []; self.img_box.delete(0, tk.END)
         self.p_cat.set("")
+        self.refresh_thumbs()
 
-    def on_cat_click(self, e):
-        sel = self.cat_list.curselection()
-        if not sel: return
-        name = self.cat_list.get(sel[0])
-        cat = next((c for c in self.categories if c["name"] == name), None)
-        if cat:
-            self.cat_name_v.set(cat["name"])
-            self.cur_cat_img = cat.get("image", "")
-            self.cat_img_l.config(text=os.path.basename(self.cur_cat_img) if self.cur_cat_img else "لا توجد صورة")
-
-    def pick_cat_img(self):
-        f = filedialog.askopenfilename(filetypes=[("Images", "*.jpg;*.png;*.jpeg;*.webp")])
-        if f:
-            self.cur_cat_img = f
-            self.cat_img_l.config(text=os.path.basename(f))
-
-    def save_cat(self):
-        name = self.cat_name_v.get().strip()
-        if not name: return
-        
-        # Process Category Image
-        img_url = "https://via.placeholder.com/150"
-        if hasattr(self, 'cur_cat_img') and self.cur_cat_img:
-            if self.cur_cat_img.startswith("http") or self.cur_cat_img.startswith("assets/"):
-                img_url = self.cur_cat_img
-            else:
-                try:
-                    fn = os.path.basename(self.cur_cat_img)
-                    dst = os.path.join(ASSETS_DIR, fn)
-                    shutil.copy(self.cur_cat_img, dst)
-                    img_url = f"assets/{fn}"
-                except: img_url = self.cur_cat_img
-
-        sel = self.cat_list.curselection()
-        if sel: # Update
-            old_name = self.cat_list.get(sel[0])
-            cat = next((c for c in self.categories if c["name"] == old_name), None)
-            if cat:
-                cat["name"] = name
-                cat["image"] = img_url
-        else: # Add New
-            new_id = max([c["id"] for c in self.categories] or [0]) + 1
-            self.categories.append({"id": new_id, "name": name, "image": img_url})
-
-        self.final_save()
-        self.refresh_cat_list()
-        messagebox.showinfo("نجاح", "تم حفظ القسم بنجاح")
-
-    def del_cat(self):
-        sel = self.cat_list.curselection()
-        if not sel: return
-        if messagebox.askyesno("تأكيد", "هل أنت متأكد من حذف هذا القسم؟"):
-            name = self.cat_list.get(sel[0])
-            self.categories = [c for c in self.categories if c["name"] != name]
-            self.final_save()
-            self.refresh_cat_list()
-
-    def clear_cat(self):
-        self.cat_name_v.set("")
-        self.cur_cat_img = None
-        self.cat_img_l.config(text="لم يتم اختيار صورة")
-        self.cat_list.selection_clear(0, tk.END)
-    def add_imgs(self):
-        fs = filedialog.askopenfilenames(filetypes=[("Images", "*.jpg;*.png;*.jpeg;*.webp")])
-        for f in fs:
-            if f not in self.selected_images:
-                self.selected_images.append(f)
-                self.img_list.insert(tk.END, os.path.basename(f))
-    def del_img(self):
-        s = self.img_list.curselection()
-        if s: self.selected_images.pop(s[0]); self.img_list.delete(s[0])
+# --- Command line (no tkinter needed) ---
+def cli_import(args):
+    fmt = detect_format(args.file, args.format)
+    store = CatalogStore()
+    if os.path.exists(PRODUCTS_FILE):
+        try:
+            store.load(*load_catalog(PRODUCTS_FILE))
+        except (OSError, CatalogError) as e:
+            print(f"cannot read {PRODUCTS_FILE}: {e}", file=sys.stderr)
+            return 1
+    assets = AssetStore(ASSETS_DIR)
+    start = time.perf_counter()
+    try:
+        if args.file == "-":
+            importer = CatalogImporter(store, assets, args.create_categories).run(read_rows(sys.stdin, fmt))
+        else:
+            with open(args.file, encoding="utf-8-sig", newline="") as f:
+                importer = CatalogImporter(store, assets, args.create_categories).run(read_rows(f, fmt))
+    finally:
+        assets.shutdown()
+    took = time.perf_counter() - start
+    rate = importer.rows / took if took else 0
+    print(f"{importer.rows} rows in {took:.2f}s ({rate:,.0f} rows/s): {importer.added} added, "
+          f"{importer.updated} updated, {importer.unchanged} unchanged, {len(importer.errors)} invalid")
+    for e in importer.errors[:20]:
+        print(f"  {e}", file=sys.stderr)
+    if len(importer.errors) > 20:
+        print(f"  ... and {len(importer.errors) - 20} more", file=sys.stderr)
+    if args.dry_run or (args.strict and importer.errors):
+        print("nothing written")
+        return 1 if importer.errors else 0
+
+    # The whole import is a single catalog commit
+    start = time.perf_counter()
+    changed = CatalogWriter(PRODUCTS_FILE).write(store.products, store.categories)
+    print(f"catalog {'written' if changed else 'unchanged'} in {time.perf_counter() - start:.2f}s")
+    check_errors = print_issues(CatalogChecker(ASSETS_DIR).check(store), limit=20)
+    if changed and args.publish:
+        if check_errors: print("not published: fix the catalog errors first")
+        else: run_publish()
+    return 1 if importer.errors else 0
+
+def print_issues(issues, limit=50):
+    errors, warnings = count_issues(issues)
+    for i in issues[:limit]:
+        print(f"  {i.level}: {i.message}", file=sys.stderr)
+    if len(issues) > limit:
+        print(f"  ... and {len(issues) - limit} more", file=sys.stderr)
+    print(f"catalog check: {errors} errors, {warnings} warnings")
+    return errors
+
+def cli_check(args):
+    store = CatalogStore()
+    store.load(*load_catalog(PRODUCTS_FILE))
+    start = time.perf_counter()
+    issues = CatalogChecker(ASSETS_DIR).check(store)
+    took = time.perf_counter() - start
+    errors = print_issues(issues)
+    print(f"{len(store.products)} products checked in {took * 1000:.0f} ms")
+    return 1 if errors else 0
+
+def cli_gc(args):
+    store = CatalogStore()
+    store.load(*load_catalog(PRODUCTS_FILE))
+    gc = AssetGC(BASE_DIR)
+    report = gc.scan(catalog_refs(store) | journal_refs(JOURNAL_DIR) | site_refs(BASE_DIR))
+    print(format_gc_report(report))
+    if args.quarantine and report["orphans"]:
+        print(f"moved to {gc.quarantine(report)}")
+        stray = sorted({ref.split("/")[0] for ref, _, why in report["orphans"] if why == "stray"})
+        if stray:
+            # Not among PUBLISH_PATHS, so publishing leaves them in the repository
+            print("publishing does not commit the removal from " + ", ".join(f'"{d}/"' for d in stray)
+                  + "; commit it yourself: git add -A -- " + " ".join(f'"{d}"' for d in stray))
+    return 0
+
+def cli_metrics(args):
+    stats = Metrics(METRICS_FILE).stats()
+    print(format_stats(stats) if stats else f"no metrics recorded yet in {METRICS_FILE}")
+    return 0
+
+def cli_preview(args):
+    if not args.no_build: build_site()
+    server = PreviewServer(DIST_DIR, args.host, args.port, config=os.path.join(BASE_DIR, "vercel.json"),
+                           metrics=Metrics(METRICS_FILE), on_request=lambda e: print(format_request(e), flush=True))
+    url = server.start()
+    print(f"serving {DIST_DIR} at {url} (Ctrl+C to stop)")
+    if args.open: webbrowser.open(url)
+    server.serve_forever()
+    t = server.totals
+    print(f"{t['requests']} requests, {t['bytes']:,} bytes sent, {t['not_modified']} answered 304")
+    return 0
+
+def cli_export(args):
+    fmt = detect_format(args.file, args.format)
+    store = CatalogStore()
+    try:
+        store.load(*load_catalog(PRODUCTS_FILE))
+    except (OSError, CatalogError) as e:
+        print(f"cannot read {PRODUCTS_FILE}: {e}", file=sys.stderr)
+        return 1
+    start = time.perf_counter()
+    if args.file == "-":
+        n = export_products(store, sys.stdout, fmt)
+    else:
+        # BOM so Excel shows Arabic CSV correctly
+        with open(args.file, "w", encoding="utf-8-sig" if fmt == "csv" else "utf-8", newline="") as f:
+            n = export_products(store, f, fmt)
+    took = time.perf_counter() - start
+    print(f"{n} products in {took:.2f}s ({n / took if took else 0:,.0f} rows/s)", file=sys.stderr)
+    return 0
+
+def cli_build(args):
+    start = time.perf_counter()
+    build_site(precompress=not args.no_compress)
+    print(f"built in {time.perf_counter() - start:.2f}s (* = rebuilt)")
+    return 0
+
+def cli_publish(args):
+    if cli_check(args):
+        print("not published: fix the catalog errors first")
+        return 1
+    run_publish(args.remote, args.branch, args.message)
+    return 0
+
+def run_cli(argv):
+    ap = argparse.ArgumentParser(prog="manage_store.py",
+                                 description="Bulk catalog import/export and site build. Run without arguments for the dashboard.")
+    sub = ap.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("import", help="upsert products from a CSV/JSONL file (by id, then sku)")
+    p.add_argument("file", help="input file, or - for stdin (needs --format)")
+    p.add_argument("--format", choices=FORMATS)
+    p.add_argument("--create-categories", action="store_true", help="add unknown category names instead of rejecting the row")
+    p.add_argument("--strict", action="store_true", help="write nothing if any row is invalid")
+    p.add_argument("--dry-run", action="store_true", help="validate and report only")
+    p.add_argument("--publish", action="store_true", help="publish once after writing")
+    p.set_defaults(func=cli_import)
+    p = sub.add_parser("export", help="write all products to a CSV/JSONL file")
+    p.add_argument("file", help="output file, or - for stdout (needs --format)")
+    p.add_argument("--format", choices=FORMATS)
+    p.set_defaults(func=cli_export)
+    p = sub.add_parser("build", help="build the deployable site into dist/: catalog shards, prerendered pages, minified and fingerprinted files")
+    p.add_argument("--no-compress", action="store_true", help="skip the .gz/.br files (the host compresses on its own)")
+    p.set_defaults(func=cli_build)
+    p = sub.add_parser("check", help="validate the catalog (errors block publishing)")
+    p.set_defaults(func=cli_check)
+    p = sub.add_parser("gc", help="list image files no product or category uses (close the dashboard first)")
+    p.add_argument("--quarantine", action="store_true", help="move them to .asset-quarantine/ instead of only listing them")
+    p.set_defaults(func=cli_gc)
+    p = sub.add_parser("preview", help="serve the site locally with the deployed cache headers, ETags and gzip")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=PREVIEW_PORT)
+    p.add_argument("--open", action="store_true", help="open it in the browser")
+    p.add_argument("--no-build", action="store_true", help="serve dist/ as it is")
+    p.set_defaults(func=cli_preview)
+    p = sub.add_parser("metrics", help="p50/p95 timings of the dashboard operations (logs/metrics.jsonl)")
+    p.set_defaults(func=cli_metrics)
+    p = sub.add_parser("publish", help="validate, commit the changed storefront sources and push them (the host builds dist/)")
+    p.add_argument("--remote", default=PUBLISH_REMOTE, help="remote name, URL or path (default: %(default)s)")
+    p.add_argument("--branch", default=PUBLISH_BRANCH)
+    p.add_argument("-m", "--message", help="commit message (default: Auto-sync <time>)")
+    p.set_defaults(func=cli_publish)
+    args = ap.parse_args(argv)
+    try:
+        return args.func(args)
+    except (OSError, ValueError, RuntimeError) as e:
+        print(e, file=sys.stderr)
+        return 1
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        sys.exit(run_cli(sys.argv[1:]))
+    if tk is None:
+        sys.exit("tkinter is not available; see `manage_store.py --help` for the command line mode")
     r = tk.Tk()
     app = PremiumStoreManager(r)
     r.mainloop()
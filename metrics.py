@@ -0,0 +1,126 @@
+"""Timings of dashboard operations, kept in memory and logged as JSON lines.
+
+    with metrics.span("commit_to_js", products=n) as m:
+        ...
+        m["bytes"] = size
+
+logs one line per operation to logs/metrics.jsonl: {"t", "op", "ms",
+"bytes"?, "error"?, ...extra fields}.  An exception inside the block is
+recorded as the span's error and re-raised.  The file rotates at
+``max_bytes`` (metrics.jsonl.1, .2, ...), so it never grows without bound.
+``stats()`` gives count / p50 / p95 / max per operation for the
+Diagnostics page; the last two files are read back at startup so the
+figures cover earlier sessions too.  Safe to use from worker threads.
+"""
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+KEEP = 1000  # recent durations per operation used for the percentiles
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of a non-empty list, ``q`` in 0..100."""
+    values = sorted(values)
+    return values[max(0, math.ceil(q / 100 * len(values)) - 1)]
+
+
+class Metrics:
+    """``path=None`` keeps the figures in memory only."""
+
+    def __init__(self, path=None, max_bytes=1 << 20, backups=3):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._lock = threading.Lock()
+        self._ms = {}      # op -> deque of durations
+        self._totals = {}  # op -> [count, errors, bytes]
+        if path:
+            self._read_back()
+
+    def _read_back(self):
+        # The current file and the last rotated one, oldest first
+        lines = []
+        for path in (self.path + ".1", self.path):
+            try:
+                with open(path, "rb") as f:
+                    lines += f.read().splitlines()
+            except OSError:
+                pass
+        for line in lines:
+            try:
+                rec = json.loads(line)
+                self._add(rec["op"], rec["ms"], rec.get("bytes"), rec.get("error"))
+            except (ValueError, KeyError, TypeError):
+                continue  # torn or foreign line
+
+    def _add(self, op, ms, nbytes, error):
+        self._ms.setdefault(op, deque(maxlen=KEEP)).append(ms)
+        tot = self._totals.setdefault(op, [0, 0, 0])
+        tot[0] += 1
+        tot[1] += bool(error)
+        tot[2] += nbytes or 0
+
+    def record(self, op, seconds, nbytes=None, error=None, **fields):
+        rec = {"t": round(time.time(), 3), "op": op, "ms": round(seconds * 1000, 2)}
+        if nbytes is not None:
+            rec["bytes"] = nbytes
+        if error:
+            rec["error"] = error
+        rec.update(fields)
+        with self._lock:
+            self._add(op, rec["ms"], nbytes, error)
+            if self.path:
+                self._write(json.dumps(rec, ensure_ascii=False, separators=(",", ":")) + "\n")
+
+    def _write(self, line):
+        try:
+            if os.path.exists(self.path) and os.path.getsize(self.path) + len(line) > self.max_bytes:
+                self._rotate()
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+        except OSError:
+            pass  # losing a metrics line must never break the operation being timed
+
+    def _rotate(self):
+        for i in range(self.backups - 1, 0, -1):
+            src = f"{self.path}.{i}"
+            if os.path.exists(src):
+                os.replace(src, f"{self.path}.{i + 1}")
+        os.replace(self.path, self.path + ".1")
+
+    @contextmanager
+    def span(self, op, **fields):
+        """Time the block; set ``bytes`` (and any other field) on the yielded dict."""
+        start = time.perf_counter()
+        error = None
+        try:
+            yield fields
+        except BaseException as e:
+            error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            nbytes = fields.pop("bytes", None)
+            self.record(op, time.perf_counter() - start, nbytes, error, **fields)
+
+    def stats(self):
+        """{op: {"count", "errors", "bytes", "p50", "p95", "max"}}, times in ms."""
+        with self._lock:
+            out = {}
+            for op, ms in self._ms.items():
+                count, errors, nbytes = self._totals[op]
+                out[op] = {"count": count, "errors": errors, "bytes": nbytes,
+                           "p50": percentile(ms, 50), "p95": percentile(ms, 95), "max": max(ms)}
+            return out
+
+
+def format_stats(stats):
+    lines = [f"{'operation':<20} {'count':>7} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9} {'errors':>7} {'bytes':>14}"]
+    for op, s in sorted(stats.items()):
+        lines.append(f"{op:<20} {s['count']:>7} {s['p50']:>9.1f} {s['p95']:>9.1f} {s['max']:>9.1f}"
+                     f" {s['errors']:>7} {s['bytes']:>14,}")
+    return "\n".join(lines)
@@ -0,0 +1,217 @@
+"""Static HTML for the storefront, written by the site build.
+
+``render_grid`` puts the first page of the home grid straight into the
+built index.html, so phones paint products before any script has loaded and
+crawlers see real content.  The cards are the ones app.js would build
+(same markup as its ``cardHtml``, each tagged with ``data-id``); app.js
+keeps them and only appends the rest ("hydrates") when its first
+products match.  The first page is the head of the first catalog shard,
+which is what app.js shows first.
+
+``render_pages`` writes product/<id>.html for every product: name,
+category, price, images and description, plus Open Graph and
+schema.org Product data.  Pages are compared by hash against
+.prerender-cache.json (``cache_path``) and only changed ones are written;
+pages of deleted products are removed.
+"""
+import hashlib
+import html
+import json
+import os
+import re
+
+from catalog import write_atomic
+from catalog_shards import ShardWriter
+
+GRID_COUNT = 24
+PAGES_DIR = "product"
+CACHE_NAME = ".prerender-cache.json"
+FALLBACK_IMG = "styles/placeholder.svg"  # same as app.js
+
+_GRID = re.compile(r'(<section\b[^>]*\bid="product-grid"[^>]*>)(.*?)(</section>)', re.S)
+_META = re.compile(r'<meta\s+property="og:url"\s+content="([^"]*)"')
+_STYLESHEET = re.compile(r'<link rel="stylesheet" href="(styles/[^"]+\.css)">')
+
+_esc = html.escape
+
+
+def _num(v):
+    # 120.0 -> "120", like JS string interpolation
+    return str(int(v)) if isinstance(v, float) and v.is_integer() else str(v)
+
+
+def _images(p):
+    return p.get("images") or [p.get("image", "")]
+
+
+def _variant(p, src, size):
+    v = (p.get("variants") or {}).get(src)
+    return (v and v.get(size)) or src
+
+
+def card_html(p, index, cat_name):
+    """One grid card, as app.js ``cardHtml`` renders it."""
+    pid, name = p["id"], _esc(p["name"])
+    images = _images(p)
+    if p.get("old_price") and p["old_price"] > p["price"]:
+        price = (f'<div class="product-price-container"><span class="price">{_num(p["price"])} <span>ج.م</span></span>'
+                 f'<span class="product-price old" style="font-size: 0.8rem; margin-right: 5px;">{_num(p["old_price"])} ج.م</span></div>')
+    else:
+        price = f'<div class="price">{_num(p["price"])} <span>ج.م</span></div>'
+    arrows = ""
+    if len(images) > 1:
+        arrows = (f'<button class="card-arrow prev" onclick="changeCardImage(event, {pid}, -1)">&#10094;</button>'
+                  f'<button class="card-arrow next" onclick="changeCardImage(event, {pid}, 1)">&#10095;</button>')
+    desc = ""
+    if p.get("description"):
+        desc = ('<p class="product-desc" style="font-size: 0.75rem; color: #7f8c8d; margin-bottom: 5px; height: 32px; overflow: hidden;'
+                f' display: -webkit-box; -webkit-line-clamp: 2; -webkit-box-orient: vertical;">{_esc(p["description"])}</p>')
+    card_img = _variant(p, images[0], "card") or FALLBACK_IMG
+    thumb = _variant(p, images[0], "thumb") or FALLBACK_IMG
+    add = _esc(f"event.stopPropagation(); addToCart({pid}, {json.dumps(p['name'], ensure_ascii=False)}, {_num(p['price'])}, '{thumb}', event)")
+    return (
+        f'<div class="item-card slide-up" data-id="{pid}" style="animation-delay: {(index % 10) / 10}s; cursor: pointer;" onclick="openQuickView({pid})">'
+        f'<div class="card-img-container"><img src="{_esc(card_img)}" alt="{name}" class="card-img" id="img-{pid}" data-img-index="0"'
+        f' loading="{"eager" if index < 4 else "lazy"}" onerror="this.src=\'{FALLBACK_IMG}\'">{arrows}</div>'
+        f'<div class="card-body"><a href="#" class="card-category" onclick="event.stopPropagation(); filterByCategory(event, \'{p.get("category_id")}\')">{_esc(cat_name)}</a>'
+        f'<h3 class="card-title" title="{name}">{name}</h3><div class="card-stock">{desc}</div>'
+        f'<div class="card-footer">{price}<button class="add-btn" title="أضف للسلة" onclick="{add}"><i class="fa-solid fa-cart-plus"></i></button></div>'
+        f'</div></div>'
+    )
+
+
+def _page_html(p, cat_name, site_url, stylesheet):
+    name, pid = _esc(p["name"]), p["id"]
+    images = [src for src in _images(p) if src]
+    urls = [_variant(p, src, "zoom") for src in images]
+    rel = lambda src: src if src.startswith(("http://", "https://")) else "../" + src
+    absolute = lambda src: src if src.startswith(("http://", "https://")) else site_url + src
+    desc = p.get("description") or ""
+    summary = " ".join(desc.split())[:160]
+    old = p.get("old_price")
+    old_html = f' <s class="product-price old">{_num(old)} ج.م</s>' if old and old > p["price"] else ""
+    gallery = "".join(f'<img src="{_esc(rel(u))}" alt="{name}" loading="{"eager" if i == 0 else "lazy"}">'
+                      for i, u in enumerate(urls)) or f'<img src="../{FALLBACK_IMG}" alt="{name}">'
+    ld = {"@context": "https://schema.org", "@type": "Product", "name": p["name"], "sku": p.get("sku") or str(pid),
+          "description": summary, "image": [absolute(u) for u in urls],
+          "offers": {"@type": "Offer", "price": p["price"], "priceCurrency": "EGP",
+                     "availability": "https://schema.org/" + ("InStock" if p.get("stock", 0) > 0 else "OutOfStock"),
+                     "url": f"{site_url}{PAGES_DIR}/{pid}.html"}}
+    ld_json = json.dumps(ld, ensure_ascii=False).replace("</", "<\\/")
+    order = f"../index.html?product={pid}" + (f"&amp;cat={p['category_id']}" if p.get("category_id") is not None else "")
+    og_image = f'\n    <meta property="og:image" content="{_esc(absolute(urls[0]))}">' if urls else ""
+    return f"""<!DOCTYPE html>
+<html lang="ar" dir="rtl">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>{name} | Original MED</title>
+    <meta name="description" content="{_esc(summary)}">
+    <link rel="canonical" href="{site_url}{PAGES_DIR}/{pid}.html">
+    <meta property="og:type" content="product">
+    <meta property="og:title" content="{name}">
+    <meta property="og:description" content="{_esc(summary)}">{og_image}
+    <link href="https://fonts.googleapis.com/css2?family=Cairo:wght@400;600;800&display=swap" rel="stylesheet">
+    <link rel="stylesheet" href="../{stylesheet}">
+    <style>
+        .product-page {{ max-width: 900px; margin: 0 auto; padding: 2rem 1rem; }}
+        .product-page .gallery {{ display: grid; grid-template-columns: repeat(auto-fill, minmax(240px, 1fr)); gap: 1rem; }}
+        .product-page .gallery img {{ width: 100%; border-radius: 12px; background: #fff; }}
+        .product-page .description {{ white-space: pre-line; line-height: 1.8; }}
+    </style>
+    <script type="application/ld+json">{ld_json}</script>
+</head>
+<body>
+    <main class="product-page">
+        <a href="../index.html">&#8594; ORIGINAL MED</a>
+        <div class="gallery">{gallery}</div>
+        <p class="card-category">{_esc(cat_name)}</p>
+        <h1>{name}</h1>
+        <div class="price">{_num(p["price"])} <span>ج.م</span>{old_html}</div>
+        <p class="description">{_esc(desc)}</p>
+        <a class="add-btn" href="{order}">اطلب الآن</a>
+    </main>
+</body>
+</html>
+"""
+
+
+def _same(path, data):
+    try:
+        with open(path, "rb") as f:
+            return f.read() == data
+    except OSError:
+        return False
+
+
+class Prerenderer:
+    """``shard_size`` must match the ShardWriter the storefront is built with."""
+
+    def __init__(self, base_dir, shard_size=0, index_name="index.html", cache_path=None):
+        self.base_dir = base_dir
+        self.shard_size = shard_size
+        self.index_path = os.path.join(base_dir, index_name)
+        self.pages_dir = os.path.join(base_dir, PAGES_DIR)
+        self.cache_path = cache_path or os.path.join(base_dir, CACHE_NAME)
+
+    def first_page(self, products, categories):
+        plan = ShardWriter(None, None, self.shard_size).plan(products, categories)
+        return plan[0][1][:GRID_COUNT] if plan else []
+
+    def render_grid(self, products, categories):
+        """Write the first grid page into index.html; True if it changed."""
+        names = {c["id"]: c["name"] for c in categories}
+        cards = [card_html(p, i, names.get(p.get("category_id"), "متنوع"))
+                 for i, p in enumerate(self.first_page(products, categories))]
+        with open(self.index_path, encoding="utf-8", newline="") as f:
+            src = f.read()
+        nl = "\r\n" if "\r\n" in src else "\n"
+        body = nl + "".join(f"            {c}{nl}" for c in cards) + "        "
+        new, n = _GRID.subn(lambda m: m.group(1) + body + m.group(3), src, count=1)
+        if not n:
+            raise ValueError(f'{self.index_path} has no <section id="product-grid">')
+        if new == src:
+            return False
+        write_atomic(self.index_path, new.encode("utf-8"))
+        return True
+
+    def render_pages(self, products, categories):
+        """Write changed product pages; returns (written, removed, unchanged)."""
+        with open(self.index_path, encoding="utf-8") as f:
+            index = f.read()
+        m = _META.search(index)
+        site_url = m.group(1) if m else ""
+        if site_url and not site_url.endswith("/"):
+            site_url += "/"
+        m = _STYLESHEET.search(index)
+        stylesheet = m.group(1) if m else "styles/index.css"
+        try:
+            with open(self.cache_path, encoding="utf-8") as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            cache = {}
+        os.makedirs(self.pages_dir, exist_ok=True)
+        names = {c["id"]: c["name"] for c in categories}
+        new_cache, written = {}, 0
+        for p in products:
+            name = f"{p['id']}.html"
+            data = _page_html(p, names.get(p.get("category_id"), ""), site_url, stylesheet).encode("utf-8")
+            sha = hashlib.sha1(data).hexdigest()
+            new_cache[name] = sha
+            path = os.path.join(self.pages_dir, name)
+            if cache.get(name) == sha and os.path.exists(path):
+                continue
+            if name not in cache and _same(path, data):
+                continue  # cache lost: only rewrite what actually differs
+            # Plain write: a page torn by a crash differs from the cache and is redone next build
+            with open(path, "wb") as f:
+                f.write(data)
+            written += 1
+        removed = 0
+        for name in os.listdir(self.pages_dir):
+            if name.endswith(".html") and name not in new_cache:
+                os.remove(os.path.join(self.pages_dir, name))
+                removed += 1
+        if new_cache != cache:
+            write_atomic(self.cache_path, json.dumps(new_cache, sort_keys=True).encode("utf-8"))
+        return written, removed, len(products) - written
@@ -0,0 +1,285 @@
+"""Local preview of the storefront that behaves like the deployed site.
+
+Serves the site folder over HTTP the way the CDN does: the Cache-Control
+rules from vercel.json, strong ETags with If-None-Match / If-Modified-Since
+answered by 304, and gzip (or brotli) when the browser accepts it.  The
+.gz / .br files written by ``SiteBuilder.build`` are used when they are
+current; other text files are compressed on the fly, once per version.
+Only the published paths are served and dotfiles never are.
+
+Every request is logged with its status, bytes on the wire, encoding and
+latency (``on_request`` callback and an optional Metrics), so the page
+weight of a catalog or asset change can be measured without deploying.
+"""
+import email.utils
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlsplit
+
+DEFAULT_CACHE = "public, max-age=0, must-revalidate"  # Vercel's default for static files
+_COMPRESSIBLE = ("text/", "application/javascript", "application/json", "image/svg+xml")
+_TYPES = {".js": "application/javascript", ".mjs": "application/javascript", ".json": "application/json",
+          ".svg": "image/svg+xml", ".webp": "image/webp", ".avif": "image/avif"}
+
+
+def load_cache_rules(path):
+    """[(compiled source regex, {header: value})] from a vercel.json "headers" list."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            conf = json.load(f)
+    except (OSError, ValueError):
+        return []
+    rules = []
+    for rule in conf.get("headers", []):
+        try:
+            rules.append((re.compile(rule["source"]), {h["key"]: h["value"] for h in rule["headers"]}))
+        except (KeyError, TypeError, re.error):
+            continue
+    return rules
+
+
+class _Version:
+    # One file as of one (mtime, size): its ETag and any compressed bodies made for it
+    __slots__ = ("key", "etag", "encoded")
+
+    def __init__(self, key, etag):
+        self.key, self.etag, self.encoded = key, etag, {}
+
+
+class PreviewServer:
+    """``start()`` serves in a background thread, ``stop()`` shuts it down.
+
+    ``roots`` limits what is served to those top-level files / folders
+    (None = everything except dotfiles).  ``on_request(entry)`` gets a dict
+    per request: method, path, status, bytes, encoding, ms.
+    """
+
+    def __init__(self, base_dir, host="127.0.0.1", port=8000, roots=None,
+                 config="vercel.json", metrics=None, on_request=None):
+        self.base_dir = os.path.abspath(base_dir)
+        self.host, self.port = host, port
+        self.roots = set(roots) if roots else None
+        self.rules = load_cache_rules(os.path.join(self.base_dir, config))
+        self.metrics = metrics
+        self.on_request = on_request
+        self.totals = {"requests": 0, "bytes": 0, "not_modified": 0}
+        self._versions = {}
+        self._lock = threading.Lock()
+        self._httpd = None
+        self._thread = None
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}/"
+
+    def start(self):
+        server = self
+
+        class Handler(_Handler):
+            preview = server
+
+        self._httpd = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._httpd.daemon_threads = True
+        self.port = self._httpd.server_address[1]  # port=0 picks a free one
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="preview", daemon=True)
+        self._thread.start()
+        return self.url
+
+    def serve_forever(self):
+        if not self._httpd:
+            self.start()
+        try:
+            self._thread.join()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def stop(self):
+        if self._httpd:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    @property
+    def running(self):
+        return self._httpd is not None
+
+    # --- Lookup ---
+    def resolve(self, url_path):
+        """Absolute file path for a request path, or None (404)."""
+        rel = posixpath.normpath(unquote(url_path)).lstrip("/")
+        if rel in ("", "."):
+            rel = "index.html"
+        parts = rel.split("/")
+        if any(p.startswith(".") for p in parts) or (self.roots is not None and parts[0] not in self.roots):
+            return None
+        path = os.path.join(self.base_dir, *parts)
+        if os.path.isdir(path):
+            path = os.path.join(path, "index.html")
+        return path if os.path.isfile(path) else None
+
+    def cache_control(self, url_path):
+        headers = {}
+        for source, values in self.rules:
+            if source.fullmatch(url_path):
+                headers.update(values)
+        headers.setdefault("Cache-Control", DEFAULT_CACHE)
+        return headers
+
+    def version(self, path, st):
+        key = (st.st_mtime_ns, st.st_size)
+        with self._lock:
+            v = self._versions.get(path)
+        if v is None or v.key != key:
+            h = hashlib.sha1()
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    h.update(block)
+            v = _Version(key, h.hexdigest()[:20])
+            with self._lock:
+                self._versions[path] = v
+        return v
+
+    def body(self, path, st, v, accept):
+        """(bytes, encoding or None) for the client's Accept-Encoding."""
+        ctype = content_type(path)
+        if ctype.startswith(_COMPRESSIBLE):
+            for enc, ext in (("br", ".br"), ("gzip", ".gz")):
+                if enc not in accept:
+                    continue
+                pre = path + ext
+                if os.path.exists(pre) and os.path.getmtime(pre) >= st.st_mtime:
+                    with open(pre, "rb") as f:
+                        return f.read(), enc
+            if "gzip" in accept:
+                data = v.encoded.get("gzip")
+                if data is None:
+                    with open(path, "rb") as f:
+                        data = v.encoded["gzip"] = gzip.compress(f.read(), 6, mtime=0)
+                return data, "gzip"
+        with open(path, "rb") as f:
+            return f.read(), None
+
+    def log(self, entry):
+        with self._lock:
+            self.totals["requests"] += 1
+            self.totals["bytes"] += entry["bytes"]
+            self.totals["not_modified"] += entry["status"] == 304
+        if self.metrics:
+            self.metrics.record("preview", entry["ms"] / 1000, entry["bytes"], None if entry["status"] < 500 else str(entry["status"]),
+                                path=entry["path"], status=entry["status"], encoding=entry["encoding"])
+        if self.on_request:
+            self.on_request(entry)
+
+
+def content_type(path):
+    ext = os.path.splitext(path)[1].lower()
+    ctype = _TYPES.get(ext) or mimetypes.guess_type(path)[0] or "application/octet-stream"
+    return ctype + "; charset=utf-8" if ctype.startswith("text/") or ctype in ("application/javascript", "application/json") else ctype
+
+
+def _accepted(header):
+    return {part.split(";")[0].strip().lower() for part in (header or "").split(",")
+            if not part.strip().endswith(";q=0")}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    preview = None  # set per server
+    server_version = "StorePreview"
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self._serve(head=False)
+
+    def do_HEAD(self):
+        self._serve(head=True)
+
+    def _serve(self, head):
+        start = time.perf_counter()
+        pv = self.preview
+        url_path = urlsplit(self.path).path
+        status, sent, encoding = 404, 0, None
+        try:
+            path = pv.resolve(url_path)
+            if path is None:
+                body = b"404 Not Found\n"
+                self.send_response(404)
+                self.send_header("Content-Type", "text/plain; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                if not head:
+                    self.wfile.write(body)
+                    sent = len(body)
+                return
+            st = os.stat(path)
+            v = pv.version(path, st)
+            accept = _accepted(self.headers.get("Accept-Encoding"))
+            compressible = content_type(path).startswith(_COMPRESSIBLE)
+            etag = f'"{v.etag}"'
+            headers = {"Last-Modified": email.utils.formatdate(st.st_mtime, usegmt=True),
+                       **pv.cache_control(url_path)}
+            if compressible:
+                headers["Vary"] = "Accept-Encoding"
+            if self._not_modified(v.etag, st.st_mtime):
+                status = 304
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                for k, val in headers.items():
+                    self.send_header(k, val)
+                self.end_headers()
+                return
+            data, encoding = pv.body(path, st, v, accept)
+            status = 200
+            self.send_response(200)
+            self.send_header("Content-Type", content_type(path))
+            self.send_header("Content-Length", str(len(data)))
+            # Each encoding is a different representation, so a different tag
+            self.send_header("ETag", f'"{v.etag}-{encoding}"' if encoding else etag)
+            if encoding:
+                self.send_header("Content-Encoding", encoding)
+            for k, val in headers.items():
+                self.send_header(k, val)
+            self.end_headers()
+            if not head:
+                self.wfile.write(data)
+                sent = len(data)
+        except (BrokenPipeError, ConnectionResetError):
+            status = 499  # client went away
+        except OSError:
+            status = 500
+            self.send_error(500)
+        finally:
+            pv.log({"method": self.command, "path": url_path, "status": status, "bytes": sent,
+                    "encoding": encoding, "ms": (time.perf_counter() - start) * 1000})
+
+    def _not_modified(self, tag, mtime):
+        inm = self.headers.get("If-None-Match")
+        if inm is not None:
+            # Any of our representation tags (plain or per encoding) matches
+            tags = {t.strip()[2:] if t.strip().startswith("W/") else t.strip() for t in inm.split(",")}
+            tags = {t.strip('"') for t in tags}
+            return "*" in tags or any(t == tag or t.startswith(tag + "-") for t in tags)
+        ims = self.headers.get("If-Modified-Since")
+        if ims:
+            try:
+                return int(mtime) <= email.utils.parsedate_to_datetime(ims).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def log_message(self, fmt, *args):
+        pass  # requests are reported through PreviewServer.log
+
+
+def format_request(entry):
+    enc = f" {entry['encoding']}" if entry["encoding"] else ""
+    return f"{entry['status']} {entry['method']:<4} {entry['path']}  {entry['bytes']:,} B{enc}  {entry['ms']:.1f} ms"
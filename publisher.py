@@ -0,0 +1,123 @@
+"""Background publishing for the dashboard.
+
+Every save used to start its own git sync thread.  PublishQueue owns a
+single worker thread instead: edits call ``request()``, the worker waits for
+a quiet period so a burst of edits becomes one sync, and never runs two
+syncs at the same time.
+"""
+import threading
+import time
+
+
+class PublishQueue:
+    """Coalesce publish requests into single runs of ``task``.
+
+    ``task()`` does the actual sync and returns True on success.
+    ``on_status(status)`` is called from the worker thread with a dict
+    (state, pending, batch, last_duration, last_ok, last_error) whenever
+    anything changes.
+    A run starts once no request arrived for ``quiet`` seconds, or at the
+    latest ``max_delay`` seconds after the first pending request.
+    """
+
+    def __init__(self, task, quiet=5.0, max_delay=60.0, on_status=None):
+        self.task = task
+        self.quiet = quiet
+        self.max_delay = max_delay
+        self.on_status = on_status
+        self.pending = 0
+        self.running = False
+        self.batch = 0
+        self.last_duration = None
+        self.last_ok = None
+        self.last_error = None
+        self._first = self._last = 0.0
+        self._stopped = False
+        self._cv = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="publish-worker", daemon=True)
+        self._thread.start()
+
+    def request(self):
+        with self._cv:
+            now = time.monotonic()
+            if not self.pending:
+                self._first = now
+            self._last = now
+            self.pending += 1
+            self._cv.notify()
+        self._report()
+
+    def status(self):
+        with self._cv:
+            if self.running:
+                state = "syncing"
+            elif self.pending:
+                state = "waiting"
+            elif self.last_ok is False:
+                state = "failed"
+            else:
+                state = "idle"
+            return {"state": state, "pending": self.pending, "batch": self.batch,
+                    "last_duration": self.last_duration, "last_ok": self.last_ok,
+                    "last_error": self.last_error}
+
+    def flush(self, timeout=None):
+        """Publish pending requests now and wait for the worker to go idle.
+
+        Returns False if it was still busy after ``timeout`` seconds.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cv:
+            self._first = self._last = float("-inf")
+            self._cv.notify_all()
+            while self.pending or self.running:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cv.wait(remaining)
+        return True
+
+    def stop(self, timeout=None):
+        """Stop the worker after the current run; pending requests are dropped."""
+        with self._cv:
+            self._stopped = True
+            self._cv.notify()
+        self._thread.join(timeout)
+
+    def _report(self):
+        if self.on_status:
+            self.on_status(self.status())
+
+    def _wait_for_quiet(self):
+        # Called with the lock held and at least one pending request.
+        while not self._stopped:
+            deadline = min(self._last + self.quiet, self._first + self.max_delay)
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            self._cv.wait(remaining)
+
+    def _run(self):
+        while True:
+            with self._cv:
+                while not self.pending and not self._stopped:
+                    self._cv.wait()
+                self._wait_for_quiet()
+                if self._stopped:
+                    return
+                self.batch, self.pending = self.pending, 0
+                self.running = True
+            self._report()
+            start = time.monotonic()
+            error = None
+            try:
+                ok = bool(self.task())
+            except Exception as e:
+                ok, error = False, f"{type(e).__name__}: {e}"
+            with self._cv:
+                self.last_error = error
+                self.running = False
+                self.last_ok = ok
+                self.last_duration = time.monotonic() - start
+                self._cv.notify_all()
+            self._report()
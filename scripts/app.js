@@ -1,4 +1,5 @@
-// Products are loaded from scripts/products.js
+// Products are loaded from scripts/catalog-manifest.js + its shards
+// (or from scripts/products.js when there is no manifest)
 
 let cart = JSON.parse(localStorage.getItem('medicalRetailCart')) || [];
 
@@ -21,21 +22,110 @@ const lightboxImg = document.getElementById("img01");
 const captionText = document.getElementById("caption");
 const productDetailsModal = document.getElementById('productDetailsModal');
 
-// Fallback Image
-const FALLBACK_IMG = 'https://via.placeholder.com/300x250?text=لا+توجد+صورة';
+// Fallback Image (local: a third-party placeholder service costs every visitor an extra request)
+const FALLBACK_IMG = 'styles/placeholder.svg';
 
 // State
 let currentCategoryId = 'all';
 let currentUser = JSON.parse(localStorage.getItem('medicalRetailUser')) || null;
 
+// --- Catalog shards ---
+// The manifest lists one small file per category (or per N products);
+// `products` fills in as they arrive, so a category only waits for its own
+// shards and the home grid pulls in the rest once scrolled to the end.
+const catalogSharded = typeof catalogManifest !== 'undefined' && catalogManifest.version === 1;
+if (catalogSharded) window.products = [];
+const shardLoads = {};
+const shardItems = {};
+const failedShards = new Set();
+let homePristine = true; // untouched first view: keep its catalog order
+// Cards the publish step prerendered into index.html (ids in grid order);
+// the first renderProducts keeps them if its items start with the same ids
+let prerenderedIds = itemsGrid ? Array.from(itemsGrid.querySelectorAll('.item-card[data-id]'), c => c.dataset.id) : [];
+
+// Called by each shard file
+function catalogShardLoaded(key, items) {
+    if (shardItems[key]) return;
+    shardItems[key] = items;
+    // Keep manifest (= catalog) order no matter which shard arrived first
+    products.length = 0;
+    for (const s of catalogManifest.shards) {
+        if (shardItems[s.key]) for (const p of shardItems[s.key]) products.push(p);
+    }
+    if (productsById) for (const p of items) productsById.set(String(p.id), p);
+}
+
+function loadShard(shard) {
+    if (!shardLoads[shard.key]) {
+        shardLoads[shard.key] = new Promise(resolve => {
+            const s = document.createElement('script');
+            s.src = 'scripts/' + shard.file;
+            s.onload = resolve;
+            s.onerror = () => { failedShards.add(shard.key); resolve(); };
+            document.head.appendChild(s);
+        });
+    }
+    return shardLoads[shard.key];
+}
+
+function shardsFor(catId) {
+    if (!catalogSharded) return [];
+    return catalogManifest.shards.filter(s =>
+        catId === 'all' || s.categories.some(c => String(c) === String(catId)));
+}
+
+// True once every shard holding catId ('all' = whole catalog) has loaded or failed
+function catalogReady(catId) {
+    return shardsFor(catId).every(s => shardItems[s.key] || failedShards.has(s.key));
+}
+
+function ensureCatalog(catId) {
+    return Promise.all(shardsFor(catId).map(loadShard));
+}
+
+function showCatalogLoading() {
+    const noResults = document.getElementById('noResults');
+    if (noResults) noResults.classList.add('hidden');
+    if (itemsGrid) itemsGrid.innerHTML = '<p style="padding:2rem; text-align:center; color:#666;"><i class="fa-solid fa-spinner fa-spin"></i></p>';
+}
+
+// Home grid: load the remaining shards when the end of the grid comes into view
+function watchGridEnd() {
+    if (!itemsGrid || catalogReady('all') || !('IntersectionObserver' in window)) return;
+    const sentinel = document.createElement('div');
+    itemsGrid.parentNode.insertBefore(sentinel, itemsGrid.nextSibling);
+    const observer = new IntersectionObserver(entries => {
+        if (!entries.some(e => e.isIntersecting)) return;
+        observer.disconnect();
+        sentinel.remove();
+        ensureCatalog('all').then(() => { if (homePristine) renderProducts(products); });
+    }, { rootMargin: '600px' });
+    observer.observe(sentinel);
+}
+
 function init() {
     renderCategories();
-    renderProducts(products); // Render all initially
+    if (catalogSharded) {
+        const first = catalogManifest.shards[0];
+        if (!prerenderedIds.length) showCatalogLoading();
+        (first ? loadShard(first) : Promise.resolve()).then(() => {
+            if (!homePristine) return;
+            renderProducts(products);
+            watchGridEnd();
+        });
+    } else {
+        renderProducts(products); // Render all initially
+    }
     updateCartUI();
     updateAuthUI();
     setupEventListeners();
     loadCustomerData();
 
+    // Links from the static product pages: index.html?product=<id>&cat=<category id>
+    const params = new URLSearchParams(location.search);
+    const wanted = params.get('product');
+    if (wanted) ensureCatalog(params.get('cat') || 'all').then(() => openQuickView(wanted));
+
     // Force category view area
     const catPanel = document.getElementById('categoriesPanel');
     if (catPanel) {
@@ -110,64 +200,83 @@ function renderProducts(items) {
     if (!items || items.length === 0) {
         if (noResults) noResults.classList.remove('hidden');
         itemsGrid.innerHTML = '';
+        prerenderedIds = []; // those cards are gone, never append after them
         return;
     }
 
     if (noResults) noResults.classList.add('hidden');
 
-    itemsGrid.innerHTML = items.map((item, index) => {
-        let priceHtml = '';
-        if (item.old_price && item.old_price > item.price) {
-            priceHtml = `
-                <div class="product-price-container">
-                    <span class="price">${item.price} <span>ج.م</span></span>
-                    <span class="product-price old" style="font-size: 0.8rem; margin-right: 5px;">${item.old_price} ج.م</span>
-                </div>
-            `;
-        } else {
-            priceHtml = `<div class="price">${item.price} <span>ج.م</span></div>`;
-        }
+    // Hydrate: keep the prerendered cards and only add the ones after them
+    const kept = prerenderedIds;
+    prerenderedIds = [];
+    if (kept.length && kept.length <= items.length && kept.every((id, i) => String(items[i].id) === id)) {
+        itemsGrid.insertAdjacentHTML('beforeend', items.slice(kept.length).map((item, i) => cardHtml(item, kept.length + i)).join(''));
+        return;
+    }
+    itemsGrid.innerHTML = items.map(cardHtml).join('');
+}
 
-        let images = item.images && item.images.length > 0 ? item.images : [item.image];
-        let arrowsHtml = '';
+// One grid card; prerender.py card_html writes the same markup
+function cardHtml(item, index) {
+    let priceHtml = '';
+    if (item.old_price && item.old_price > item.price) {
+        priceHtml = `
+            <div class="product-price-container">
+                <span class="price">${item.price} <span>ج.م</span></span>
+                <span class="product-price old" style="font-size: 0.8rem; margin-right: 5px;">${item.old_price} ج.م</span>
+            </div>
+        `;
+    } else {
+        priceHtml = `<div class="price">${item.price} <span>ج.م</span></div>`;
+    }
 
-        if (images.length > 1) {
-            arrowsHtml = `
-                <button class="card-arrow prev" onclick="changeCardImage(event, ${item.id}, -1)">&#10094;</button>
-                <button class="card-arrow next" onclick="changeCardImage(event, ${item.id}, 1)">&#10095;</button>
-            `;
-        }
+    let images = item.images && item.images.length > 0 ? item.images : [item.image];
+    let arrowsHtml = '';
 
-        const animDelay = (index % 10) * 0.1;
+    if (images.length > 1) {
+        arrowsHtml = `
+            <button class="card-arrow prev" onclick="changeCardImage(event, ${item.id}, -1)">&#10094;</button>
+            <button class="card-arrow next" onclick="changeCardImage(event, ${item.id}, 1)">&#10095;</button>
+        `;
+    }
 
-        // Find category name
-        let catName = 'متنوع';
-        if (item.category_id) {
-            const cat = categories.find(c => c.id == item.category_id);
-            if (cat) catName = cat.name;
-        }
+    const animDelay = (index % 10) * 0.1;
 
-        return `
-        <div class="item-card slide-up" style="animation-delay: ${animDelay}s; cursor: pointer;" onclick="openQuickView(${item.id})">
-            <div class="card-img-container">
-                 <img src="${images[0] || FALLBACK_IMG}" alt="${item.name}" class="card-img" id="img-${item.id}" data-img-index="0" onerror="this.src='${FALLBACK_IMG}'">
-                 ${arrowsHtml}
+    // Find category name
+    let catName = 'متنوع';
+    if (item.category_id) {
+        const cat = categories.find(c => c.id == item.category_id);
+        if (cat) catName = cat.name;
+    }
+
+    return `
+    <div class="item-card slide-up" data-id="${item.id}" style="animation-delay: ${animDelay}s; cursor: pointer;" onclick="openQuickView(${item.id})">
+        <div class="card-img-container">
+             <img src="${imageVariant(item, images[0], 'card') || FALLBACK_IMG}" alt="${item.name}" class="card-img" id="img-${item.id}" data-img-index="0" loading="lazy" onerror="this.src='${FALLBACK_IMG}'">
+             ${arrowsHtml}
+        </div>
+        <div class="card-body">
+            <a href="#" class="card-category" onclick="event.stopPropagation(); filterByCategory(event, '${item.category_id}')">${catName}</a>
+            <h3 class="card-title" title="${item.name}">${item.name}</h3>
+            <div class="card-stock">
+                 ${item.description ? `<p class="product-desc" style="font-size: 0.75rem; color: #7f8c8d; margin-bottom: 5px; height: 32px; overflow: hidden; display: -webkit-box; -webkit-line-clamp: 2; -webkit-box-orient: vertical;">${item.description}</p>` : ''}
             </div>
-            <div class="card-body">
-                <a href="#" class="card-category" onclick="event.stopPropagation(); filterByCategory(event, '${item.category_id}')">${catName}</a>
-                <h3 class="card-title" title="${item.name}">${item.name}</h3>
-                <div class="card-stock">
-                     ${item.description ? `<p class="product-desc" style="font-size: 0.75rem; color: #7f8c8d; margin-bottom: 5px; height: 32px; overflow: hidden; display: -webkit-box; -webkit-line-clamp: 2; -webkit-box-orient: vertical;">${item.description}</p>` : ''}
-                </div>
-                <div class="card-footer">
-                    ${priceHtml}
-                    <button class="add-btn" title="أضف للسلة" onclick="event.stopPropagation(); addToCart(${item.id}, \`${item.name}\`, ${item.price}, '${images[0] || FALLBACK_IMG}', event)">
-                        <i class="fa-solid fa-cart-plus"></i>
-                    </button>
-                </div>
+            <div class="card-footer">
+                ${priceHtml}
+                <button class="add-btn" title="أضف للسلة" onclick="event.stopPropagation(); addToCart(${item.id}, \`${item.name}\`, ${item.price}, '${imageVariant(item, images[0], 'thumb') || FALLBACK_IMG}', event)">
+                    <i class="fa-solid fa-cart-plus"></i>
+                </button>
             </div>
         </div>
-    `}).join('');
+    </div>
+`;
+}
+
+// Downscaled copy of an image built by the dashboard at import
+// ('thumb', 'card' or 'zoom'); falls back to the original file.
+function imageVariant(item, src, size) {
+    const v = item && item.variants && item.variants[src];
+    return (v && v[size]) || src;
 }
 
 function changeCardImage(event, productId, step) {
@@ -180,7 +289,8 @@ function changeCardImage(event, productId, step) {
     const product = products.find(p => p.id == productId);
     if (!product) return;
 
-    const images = product.images && product.images.length > 0 ? product.images : [product.image];
+    const images = (product.images && product.images.length > 0 ? product.images : [product.image])
+        .map(src => imageVariant(product, src, 'card'));
 
     let nextIndex = currentIndex + step;
     if (nextIndex >= images.length) nextIndex = 0;
@@ -201,14 +311,85 @@ function changeCardImage(event, productId, step) {
     imgElement.setAttribute('data-img-index', nextIndex);
 }
 
-// Arabic normalization for search
+// Arabic normalization for search (keep in sync with search_index.py)
 function normalizeArabic(text) {
     if (!text) return "";
     return text
         .replace(/[أإآ]/g, 'ا')
         .replace(/ة/g, 'ه')
         .replace(/ى/g, 'ي')
-        .replace(/[ًٌٍَُِّْ]/g, '');
+        .replace(/[ًٌٍَُِّْـ]/g, '');
+}
+
+// Prebuilt search index (scripts/search-index.js, written by manage_store.py).
+// Names, descriptions and categories arrive already normalized, so only the
+// query is normalized here. Falls back to scanning products if it is missing.
+// It is not part of the page: <meta name="search-index"> names the file and
+// it is fetched once, when the visitor first searches.
+let searchPostings = null;
+let productsById = null;
+let searchIndexLoad = null;
+let searchIndexSettled = false; // loaded, failed or not published
+
+function loadSearchIndex() {
+    if (!searchIndexLoad) {
+        const meta = document.querySelector('meta[name="search-index"]');
+        searchIndexLoad = new Promise(resolve => {
+            if (!meta || typeof searchIndex !== 'undefined') return resolve();
+            const s = document.createElement('script');
+            s.src = meta.content;
+            s.onload = s.onerror = resolve;
+            document.head.appendChild(s);
+        }).then(() => { searchIndexSettled = true; });
+    }
+    return searchIndexLoad;
+}
+
+function hasSearchIndex() {
+    if (typeof searchIndex === 'undefined' || !searchIndex || searchIndex.version !== 1) return false;
+    if (!searchPostings) {
+        searchPostings = {};
+        for (const g in searchIndex.postings) {
+            const deltas = searchIndex.postings[g];
+            const ids = new Array(deltas.length);
+            let acc = 0;
+            for (let i = 0; i < deltas.length; i++) { acc += deltas[i]; ids[i] = acc; }
+            searchPostings[g] = ids;
+        }
+        productsById = new Map(products.map(p => [String(p.id), p]));
+    }
+    return true;
+}
+
+// term must already be normalized; returns matching products in catalog order
+function searchCatalog(term, withDescription) {
+    const n = searchIndex.gram;
+    let pool = null;
+    if (!withDescription && term.length >= n) {
+        for (let i = 0; i + n <= term.length; i++) {
+            const ids = searchPostings[term.substr(i, n)];
+            if (!ids) return [];
+            if (pool === null) {
+                pool = ids;
+            } else {
+                const keep = new Set(ids);
+                pool = pool.filter(id => keep.has(id));
+            }
+            if (pool.length === 0) return [];
+        }
+    }
+    const keys = pool ? pool.map(String) : Object.keys(searchIndex.docs);
+    const hits = [];
+    for (const key of keys) {
+        const doc = searchIndex.docs[key];
+        const p = productsById.get(key);
+        if (!doc || !p) continue;
+        const cat = searchIndex.categories[String(doc[2])] || "";
+        if (doc[0].includes(term) || cat.includes(term) || (withDescription && doc[1].includes(term))) {
+            hits.push(p);
+        }
+    }
+    return hits;
 }
 
 function filterAndSearch() {
@@ -216,10 +397,28 @@ function filterAndSearch() {
     if (searchInput) {
         term = normalizeArabic(searchInput.value.trim().toLowerCase());
     }
+    homePristine = false;
+
+    // Searching and "all" need the whole catalog, a category only its shards;
+    // searching also the index
+    const needed = (term || currentCategoryId === 'all') ? 'all' : currentCategoryId;
+    const waits = [];
+    if (!catalogReady(needed)) waits.push(ensureCatalog(needed));
+    if (term && !searchIndexSettled) waits.push(loadSearchIndex());
+    if (waits.length) {
+        showCatalogLoading();
+        Promise.all(waits).then(filterAndSearch);
+        return;
+    }
 
     let filtered = products;
 
-    if (term) {
+    if (term && hasSearchIndex()) {
+        // Names and categories through the postings; descriptions (not in the
+        // postings, so a full scan) only when no name or category matches
+        filtered = searchCatalog(term, false);
+        if (!filtered.length) filtered = searchCatalog(term, true);
+    } else if (term) {
         filtered = filtered.filter(p => {
             const name = normalizeArabic(p.name.toLowerCase());
             const desc = p.description ? normalizeArabic(p.description.toLowerCase()) : "";
@@ -230,7 +429,9 @@ function filterAndSearch() {
 
             return name.includes(term) || desc.includes(term) || catName.includes(term);
         });
+    }
 
+    if (term) {
         // Auto-scroll logic
         const catalogSec = document.getElementById('catalog');
         if (catalogSec) {
@@ -284,15 +485,24 @@ function handleLiveSearch(e) {
         if (query.length === 0) filterAndSearch();
         return;
     }
+    // Show what is loaded now, refresh once the rest of the catalog (and the index) is in
+    const waits = [];
+    if (!catalogReady('all')) waits.push(ensureCatalog('all'));
+    if (!searchIndexSettled) waits.push(loadSearchIndex());
+    if (waits.length) {
+        Promise.all(waits).then(() => {
+            if (normalizeArabic(e.target.value.toLowerCase().trim()).length >= 2) handleLiveSearch(e);
+        });
+    }
 
-    const results = products.filter(item => {
+    const results = (hasSearchIndex() ? searchCatalog(query, false) : products.filter(item => {
         let catName = "";
         const cat = categories.find(c => c.id == item.category_id);
         if (cat) catName = normalizeArabic(cat.name.toLowerCase());
         const iName = normalizeArabic(item.name.toLowerCase());
 
         return iName.includes(query) || catName.includes(query)
-    }).slice(0, 6);
+    })).slice(0, 6);
 
     if (results.length === 0) {
         dropdown.innerHTML = '<div class="search-dropdown-item" style="justify-content:center; color:#999;">لا توجد نتائج مطابقة</div>';
@@ -306,8 +516,8 @@ function handleLiveSearch(e) {
             }
 
             let img = FALLBACK_IMG;
-            if (item.images && item.images.length > 0) img = item.images[0];
-            else if (item.image) img = item.image;
+            if (item.images && item.images.length > 0) img = imageVariant(item, item.images[0], 'thumb');
+            else if (item.image) img = imageVariant(item, item.image, 'thumb');
 
             const a = document.createElement('a');
             a.href = "javascript:void(0);";
@@ -344,6 +554,8 @@ function handleLiveSearch(e) {
 
 function setupEventListeners() {
     if (searchInput) {
+        // Start fetching the search index as soon as the visitor heads for the box
+        searchInput.addEventListener('focus', loadSearchIndex, { once: true });
         searchInput.addEventListener('input', handleLiveSearch);
         searchInput.addEventListener('keypress', (e) => {
             if (e.key === 'Enter') {
@@ -723,7 +935,7 @@ function openQuickView(itemId) {
     if (!productDetailsModal) return;
 
     let images = item.images && item.images.length > 0 ? item.images : [item.image];
-    const imgUrl = images[0] || FALLBACK_IMG;
+    const imgUrl = imageVariant(item, images[0], 'zoom') || FALLBACK_IMG;
 
     document.getElementById('modalProductImg').src = imgUrl;
 
@@ -860,7 +1072,7 @@ function renderRelatedProducts(currentItem) {
         let images = item.images && item.images.length > 0 ? item.images : [item.image];
         return `
         <div class="related-product-card" onclick="openQuickView('${item.id}')">
-            <img class="related-product-img" src="${images[0] || FALLBACK_IMG}" onerror="this.onerror=null;this.src='${FALLBACK_IMG}';" alt="${item.name}">
+            <img class="related-product-img" src="${imageVariant(item, images[0], 'card') || FALLBACK_IMG}" onerror="this.onerror=null;this.src='${FALLBACK_IMG}';" alt="${item.name}">
             <div class="related-product-name" title="${item.name}">${item.name}</div>
             <div class="related-product-price">${parseFloat(item.price).toFixed(2)} ج.م</div>
         </div>
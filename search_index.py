@@ -0,0 +1,176 @@
+"""Arabic-normalized n-gram search index for the catalog.
+
+Built from the catalog by the site build and written into the built site as
+``scripts/search-index.js`` so the storefront gets the normalized text and
+the postings ready-made; the dashboard queries the same structure in memory.
+
+Search semantics match the old substring checks: the bigram postings narrow
+the candidates, then each candidate is verified with ``in`` on the
+pre-normalized fields.
+"""
+import hashlib
+import json
+import re
+
+from catalog import file_digest, write_atomic
+
+GRAM = 2
+INDEX_VERSION = 1
+
+_DIACRITICS = re.compile("[ً-ْـ]")  # harakat + tatweel
+
+
+def normalize_arabic(text):
+    """Same folding as normalizeArabic() in scripts/app.js, plus lower()."""
+    if not text:
+        return ""
+    text = str(text).lower().replace("أ", "ا").replace("إ", "ا").replace("آ", "ا")
+    return _DIACRITICS.sub("", text.replace("ة", "ه").replace("ى", "ي"))
+
+
+def grams(text, n=GRAM):
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+class SearchIndex:
+    """Normalized fields per product plus gram -> product id postings.
+
+    ``docs`` maps id -> (name, description, category_id); ``categories`` maps
+    category id -> normalized name.  Postings cover name, category name and
+    the id itself (the dashboard searches ids too).
+    """
+
+    def __init__(self, products=(), categories=()):
+        self.categories = {c["id"]: normalize_arabic(c["name"]) for c in categories}
+        self._cat_grams = {cid: grams(name) for cid, name in self.categories.items()}
+        self.docs = {}
+        self.order = {}
+        self.postings = {}
+        self._seq = 0
+        for p in products:
+            self.add(p)
+
+    def add(self, p):
+        pid = p["id"]
+        seq = self.order.get(pid)
+        if seq is not None:
+            self.remove(pid)  # re-adding an edited product keeps its position
+        else:
+            seq = self._seq
+            self._seq += 1
+        cid = p.get("category_id")
+        self.docs[pid] = (normalize_arabic(p.get("name")), normalize_arabic(p.get("description")), cid)
+        self.order[pid] = seq
+        postings = self.postings
+        for g in self._doc_grams(pid):
+            bucket = postings.get(g)
+            if bucket is None:
+                postings[g] = {pid}
+            else:
+                bucket.add(pid)
+
+    def remove(self, pid):
+        if pid not in self.docs:
+            return
+        for g in self._doc_grams(pid):
+            bucket = self.postings.get(g)
+            if bucket is not None:
+                bucket.discard(pid)
+                if not bucket:
+                    del self.postings[g]
+        del self.docs[pid]
+        del self.order[pid]
+
+    def _doc_grams(self, pid):
+        name, _, cid = self.docs[pid]
+        return grams(name) | grams(str(pid)) | self._cat_grams.get(cid, frozenset())
+
+    def update(self, store, dirty=None):
+        """Catch up with a CatalogStore after the products in ``dirty`` changed.
+
+        ``dirty=None`` or any category edit rebuilds the whole index.
+        """
+        cats = {c["id"]: normalize_arabic(c["name"]) for c in store.categories}
+        if dirty is None or cats != self.categories:
+            self.__init__(store.products, store.categories)
+            return
+        for pid in dirty:
+            p = store.product(pid)
+            if p is None:
+                self.remove(pid)
+            else:
+                self.add(p)
+
+    def candidates(self, q):
+        """Ids that may match ``q`` (already normalized), or None = all."""
+        qg = grams(q)
+        if not qg:
+            return None
+        lists = []
+        for g in qg:
+            ids = self.postings.get(g)
+            if ids is None:
+                return set()
+            lists.append(ids)
+        lists.sort(key=len)
+        out = set(lists[0])
+        for other in lists[1:]:
+            out &= other
+            if not out:
+                break
+        return out
+
+    def search(self, query, fields=("name", "id")):
+        """Ids whose fields contain ``query`` after normalization, in catalog order.
+
+        ``fields`` picks from name, id, category and description.  Gram
+        postings do not cover descriptions, so those are only checked on a
+        full scan of the pre-normalized text.
+        """
+        q = normalize_arabic(query.strip())
+        if not q:
+            return sorted(self.docs, key=self.order.__getitem__)
+        cands = None if "description" in fields else self.candidates(q)
+        pool = self.docs if cands is None else cands
+        cats = self.categories
+        hits = []
+        for pid in pool:
+            name, desc, cid = self.docs[pid]
+            if (("name" in fields and q in name)
+                    or ("id" in fields and q in str(pid))
+                    or ("category" in fields and q in cats.get(cid, ""))
+                    or ("description" in fields and q in desc)):
+                hits.append(pid)
+        hits.sort(key=self.order.__getitem__)
+        return hits
+
+    def to_json(self):
+        data = {
+            "version": INDEX_VERSION,
+            "gram": GRAM,
+            "categories": {str(k): v for k, v in self.categories.items()},
+            "docs": {str(k): list(v) for k, v in self.docs.items()},
+            # Postings are delta-encoded sorted ids: [3, 2, 10] means 3, 5, 15.
+            "postings": {g: _deltas(self.postings[g]) for g in sorted(self.postings)},
+        }
+        return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+    def to_js(self):
+        js = self.to_json().replace("\u2028", "\\u2028").replace("\u2029", "\\u2029")
+        return f"var searchIndex = {js};"
+
+    def write(self, path):
+        """Atomically write the JS index unless the file is already current."""
+        data = self.to_js().encode("utf-8")
+        if hashlib.sha1(data).hexdigest() == file_digest(path):
+            return False
+        write_atomic(path, data)
+        return True
+
+
+def _deltas(ids):
+    out, prev = [], 0
+    for i in sorted(ids):
+        out.append(i - prev)
+        prev = i
+    return out
@@ -0,0 +1,415 @@
+"""Production build of the storefront's static files.
+
+The repository only holds sources; the deployed site is built into its own
+folder (``dist/``, see manage_store.py and vercel.json).  ``copy_site``
+mirrors the source files there, then the generated files are written next
+to them and everything below works on that copy.
+
+index.html references scripts and styles by their source names
+(``scripts/app.js``).  ``fingerprint_index`` writes a minified copy of each
+referenced file as ``<name>.<hash>.<ext>`` and points index.html at it, so
+a file's URL only changes when its bytes do and everything except
+index.html can be cached forever (see vercel.json).  Shards under
+scripts/catalog/ and the images in assets/ are content-addressed already.
+
+``SiteBuilder.build`` runs that and, unless ``precompress`` is off, also
+writes ``.gz`` / ``.br`` siblings (brotli only if the ``brotli`` package
+is installed) of index.html, the fingerprinted files and the shards.  The
+deploy build leaves them out (Vercel compresses on its own); the preview
+server sends them and the build report shows the page weight with them.
+The built index.html is minified last, once prerender.py has filled in the
+grid; the copy in the repository stays readable.  Minification of the
+referenced files is cached by source hash in ``.build-cache.json``, so only
+changed inputs are reprocessed.
+
+The minifiers are deliberately conservative: comments and indentation go,
+line breaks stay (no reliance on JS semicolon insertion), and string,
+template and regex literals are copied untouched.
+"""
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+
+from catalog import write_atomic
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+HASH_LEN = 10
+CACHE_NAME = ".build-cache.json"
+# Written compact by manage_store.py already; minifying them is wasted work
+PREBUILT = {"scripts/search-index", "scripts/catalog-manifest"}
+
+# src/href (or a <meta> content) to a local script or stylesheet, with or
+# without an old fingerprint or ?v= query string
+_REF = re.compile(r'\b(src|href|content)="((?:scripts|styles)/[\w./-]+?)(?:\.[0-9a-f]{%d})?\.(js|css)(?:\?[^"]*)?"' % HASH_LEN)
+# What the build itself writes into a copied folder: fingerprinted files and their .gz / .br
+_GENERATED = re.compile(r"\.[0-9a-f]{%d}\.(?:js|css)(?:\.gz|\.br)?$" % HASH_LEN)
+
+# --- JS ---
+_JS_TOKEN = re.compile(r"""
+    (?P<ws>\s+)
+  | (?P<comment>//[^\n]*|/\*.*?(?:\*/|\Z))
+  | (?P<str>"(?:[^"\\\n]|\\.)*"|'(?:[^'\\\n]|\\.)*')
+  | (?P<word>[\w$\u0080-\uffff]+)
+  | (?P<other>.)
+""", re.S | re.X)
+_TEMPLATE_STOP = re.compile(r"[`\\]|\$\{")
+_REGEX_FLAGS = re.compile(r"[a-z]*")
+# A "/" after one of these starts a regex literal, anywhere else it divides
+_REGEX_AFTER = set("(,=:[!&|?{};+-*%<>~^") | {"", "return", "typeof", "case", "do", "else", "in",
+                                                "of", "new", "delete", "void", "throw", "instanceof",
+                                                "yield", "await"}
+
+
+def _is_word(ch):
+    return ch.isalnum() or ch in "_$" or ch > "\x7f"
+
+
+def _template_end(src, pos):
+    # Scan template text from pos; returns (end, closed).  closed=False means
+    # it stopped right after a "${".
+    while True:
+        m = _TEMPLATE_STOP.search(src, pos)
+        if not m:
+            return len(src), True
+        if m.group() == "\\":
+            pos = m.end() + 1
+        elif m.group() == "`":
+            return m.end(), True
+        else:
+            return m.end(), False
+
+
+def _regex_end(src, pos):
+    # pos is just past the opening "/"; returns the end of the literal with
+    # its flags, or None if this cannot be a regex after all.
+    in_class = False
+    n = len(src)
+    while pos < n:
+        ch = src[pos]
+        if ch == "\\":
+            pos += 2
+            continue
+        if ch == "\n":
+            return None
+        if ch == "[":
+            in_class = True
+        elif ch == "]":
+            in_class = False
+        elif ch == "/" and not in_class:
+            return _REGEX_FLAGS.match(src, pos + 1).end()
+        pos += 1
+    return None
+
+
+def minify_js(src):
+    out = []
+    last = ""      # last significant token, for regex-vs-division
+    tail = ""      # last character written
+    ws = None      # pending whitespace: " " or "\n"
+    braces = []    # "{" or "`" (a template's ${ ... }) nesting
+    pos, n = 0, len(src)
+    while pos < n:
+        m = _JS_TOKEN.match(src, pos)
+        kind, tok = m.lastgroup, m.group()
+        if kind == "ws" or kind == "comment":
+            if "\n" in tok:
+                ws = "\n"
+            elif ws is None:
+                ws = " "
+            pos = m.end()
+            continue
+        end = m.end()
+        if tok == "`":
+            end, closed = _template_end(src, end)
+            if not closed:
+                braces.append("`")
+            tok = src[pos:end]
+        elif tok == "}" and braces and braces[-1] == "`":
+            braces.pop()
+            end, closed = _template_end(src, end)
+            if not closed:
+                braces.append("`")
+            tok = src[pos:end]
+        elif tok == "{":
+            braces.append("{")
+        elif tok == "}" and braces:
+            braces.pop()
+        elif tok == "/" and last in _REGEX_AFTER:
+            rend = _regex_end(src, end)
+            if rend is not None:
+                end, tok = rend, src[pos:rend]
+        if ws and tail:
+            if ws == "\n" and tail != "\n":
+                out.append("\n")
+            elif ws == " " and ((_is_word(tail) and _is_word(tok[0])) or tail + tok[0] in ("++", "--", "//")):
+                out.append(" ")
+        ws = None
+        out.append(tok)
+        tail = tok[-1]
+        last = tok if kind == "word" else (tok if len(tok) == 1 else ")")
+        pos = end
+    return "".join(out)
+
+
+# --- CSS ---
+_CSS_TOKEN = re.compile(r"""
+    (?P<comment>/\*.*?(?:\*/|\Z))
+  | (?P<str>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')
+  | (?P<ws>\s+)
+  | (?P<other>[^"'/\s]+|.)
+""", re.S | re.X)
+
+
+def minify_css(src):
+    out = []
+    ws = False
+    for m in _CSS_TOKEN.finditer(src):
+        kind, tok = m.lastgroup, m.group()
+        if kind in ("comment", "ws"):
+            ws = True
+            continue
+        if ws and out and out[-1][-1] not in "{};:,>" and tok[0] not in "{};,>":
+            out.append(" ")
+        ws = False
+        if tok.startswith("}") and out and out[-1].endswith(";"):
+            out[-1] = out[-1][:-1]
+        out.append(tok.replace(";}", "}") if kind == "other" else tok)
+    return "".join(out)
+
+
+# --- HTML ---
+_HTML_RAW = re.compile(r"(<(pre|textarea|script|style)\b[^>]*>)(.*?)(</\2\s*>)", re.S | re.I)
+_HTML_COMMENT = re.compile(r"<!--(?!\[if).*?-->", re.S)
+_HTML_WS = re.compile(r"\s+")
+
+
+def _collapse(text):
+    text = _HTML_COMMENT.sub("", text)
+    return _HTML_WS.sub(lambda m: "\n" if "\n" in m.group() else " ", text)
+
+
+def minify_html(src):
+    out, pos = [], 0
+    for m in _HTML_RAW.finditer(src):
+        out.append(_collapse(src[pos:m.start()]))
+        body, tag = m.group(3), m.group(2).lower()
+        if tag == "script" and body.strip() and "json" not in m.group(1).lower():
+            body = minify_js(body)
+        elif tag == "style":
+            body = minify_css(body)
+        out.append(m.group(1) + body + m.group(4))
+        pos = m.end()
+    out.append(_collapse(src[pos:]))
+    return "".join(out).strip() + "\n"
+
+
+MINIFIERS = {"js": minify_js, "css": minify_css}
+
+
+def compress(path):
+    """Write path.gz (and path.br) unless they are already current.
+
+    Returns (gzip bytes, brotli bytes or None).
+    """
+    data = None
+    sizes = []
+    for ext, fn in ((".gz", lambda d: gzip.compress(d, 9, mtime=0)),
+                    (".br", brotli and (lambda d: brotli.compress(d, quality=11)))):
+        if fn is None:
+            sizes.append(None)
+            continue
+        out = path + ext
+        if not os.path.exists(out) or os.path.getmtime(out) < os.path.getmtime(path):
+            if data is None:
+                with open(path, "rb") as f:
+                    data = f.read()
+            write_atomic(out, fn(data))
+        sizes.append(os.path.getsize(out))
+    return tuple(sizes)
+
+
+def copy_site(src_dir, out_dir, paths, skip=()):
+    """Mirror the source ``paths`` (files or folders) into ``out_dir``.
+
+    Only files whose size or mtime differ are copied; copy2 keeps the mtime,
+    so the next build finds them current.  Dotfiles and the relative paths
+    in ``skip`` are left out.  Files in a copied folder whose source is gone
+    are removed, except the fingerprinted files the build writes there.
+    Returns the number of files copied.
+    """
+    skip = set(skip)
+    copied = 0
+    for rel in paths:
+        src = os.path.join(src_dir, rel)
+        if not os.path.isdir(src):
+            files = [rel] if os.path.exists(src) else []
+        else:
+            files = []
+            for folder, dirs, names in os.walk(src):
+                dirs[:] = [d for d in dirs if not d.startswith(".")]
+                base = os.path.relpath(folder, src_dir).replace(os.sep, "/")
+                files += [f"{base}/{n}" for n in names if not n.startswith(".")]
+        files = [f for f in files if f not in skip]
+        for f in files:
+            s, d = os.path.join(src_dir, f), os.path.join(out_dir, f)
+            st = os.stat(s)
+            try:
+                dt = os.stat(d)
+                if dt.st_size == st.st_size and int(dt.st_mtime) == int(st.st_mtime):
+                    continue
+            except FileNotFoundError:
+                os.makedirs(os.path.dirname(d), exist_ok=True)
+            shutil.copy2(s, d)
+            copied += 1
+        if os.path.isdir(src):
+            keep = set(files)
+            for folder, _, names in os.walk(os.path.join(out_dir, rel)):
+                base = os.path.relpath(folder, out_dir).replace(os.sep, "/")
+                for n in names:
+                    if f"{base}/{n}" not in keep and not _GENERATED.search(n):
+                        os.remove(os.path.join(folder, n))
+    return copied
+
+
+class SiteBuilder:
+    """Minify + fingerprint + precompress, reusing work from earlier runs.
+
+    ``cache_path`` defaults to ``.build-cache.json`` in ``base_dir``; keep it
+    outside a folder that is deployed.
+    """
+
+    def __init__(self, base_dir, cache_path=None, precompress=True):
+        self.base_dir = base_dir
+        self.cache_path = cache_path or os.path.join(base_dir, CACHE_NAME)
+        self.precompress = precompress
+        try:
+            with open(self.cache_path, encoding="utf-8") as f:
+                self.cache = json.load(f)
+        except (OSError, ValueError):
+            self.cache = {}
+        self._dirty = False
+        self.report = []   # (name, source bytes, output bytes, gz, br, rebuilt)
+
+    def save(self):
+        if self._dirty:
+            write_atomic(self.cache_path, json.dumps(self.cache, indent=1, sort_keys=True).encode("utf-8"))
+            self._dirty = False
+
+    def fingerprint(self, stem, ext, precompress=False):
+        """Write the minified ``<stem>.<hash>.<ext>``; returns its relative path."""
+        src_rel = f"{stem}.{ext}"
+        with open(os.path.join(self.base_dir, src_rel), "rb") as f:
+            data = f.read()
+        sha = hashlib.sha1(data).hexdigest()
+        hit = self.cache.get(src_rel)
+        rebuilt = not (hit and hit["sha"] == sha and os.path.exists(os.path.join(self.base_dir, hit["out"])))
+        if rebuilt:
+            if stem not in PREBUILT:
+                data = MINIFIERS[ext](data.decode("utf-8")).encode("utf-8")
+            rel = f"{stem}.{hashlib.sha1(data).hexdigest()[:HASH_LEN]}.{ext}"
+            path = os.path.join(self.base_dir, rel)
+            if not os.path.exists(path):
+                write_atomic(path, data)
+            self.cache[src_rel] = {"sha": sha, "out": rel}
+            self._dirty = True
+        rel = self.cache[src_rel]["out"]
+        path = os.path.join(self.base_dir, rel)
+        _prune(os.path.dirname(path), os.path.basename(stem), ext, os.path.basename(rel))
+        if precompress:
+            self.report.append((src_rel, os.path.getsize(os.path.join(self.base_dir, src_rel)),
+                                os.path.getsize(path), *self._compress(path), rebuilt))
+        return rel
+
+    def _compress(self, path):
+        return compress(path) if self.precompress else (None, None)
+
+    def fingerprint_index(self, index_name="index.html", precompress=False):
+        """Refresh every fingerprinted reference in index.html.
+
+        Returns True if index.html changed.  References to missing files are
+        left alone.
+        """
+        index_path = os.path.join(self.base_dir, index_name)
+        with open(index_path, encoding="utf-8", newline="") as f:
+            html = f.read()
+        done = {}
+
+        def swap(m):
+            attr, stem, ext = m.groups()
+            if (stem, ext) not in done:
+                try:
+                    done[stem, ext] = self.fingerprint(stem, ext, precompress)
+                except FileNotFoundError:
+                    return m.group()
+            return f'{attr}="{done[stem, ext]}"'
+
+        new = _REF.sub(swap, html)
+        self.save()
+        if new == html:
+            return False
+        write_atomic(index_path, new.encode("utf-8"))
+        return True
+
+    def build(self, index_name="index.html", shard_dir="scripts/catalog", drop_sources=False):
+        """Full production build; fills ``self.report`` (gz / br sizes are
+        None without ``precompress``).  ``drop_sources`` removes the
+        unfingerprinted inputs afterwards, for a folder that is deployed as is."""
+        self.report = []
+        rebuilt = self.fingerprint_index(index_name, precompress=True)
+        if drop_sources:
+            for name, *_ in self.report:
+                os.remove(os.path.join(self.base_dir, name))
+        path = os.path.join(self.base_dir, index_name)
+        with open(path, encoding="utf-8", newline="") as f:
+            html = f.read()
+        small = minify_html(html).encode("utf-8")
+        if small != html.encode("utf-8"):
+            write_atomic(path, small)
+            rebuilt = True
+        self.report.append((index_name, len(html.encode("utf-8")), len(small), *self._compress(path), rebuilt))
+        folder = os.path.join(self.base_dir, shard_dir)
+        if os.path.isdir(folder):
+            for fn in sorted(os.listdir(folder)):
+                if fn.endswith(".js"):
+                    path = os.path.join(folder, fn)
+                    size = os.path.getsize(path)
+                    gz_path = path + ".gz"
+                    rebuilt = not os.path.exists(gz_path)
+                    self.report.append((f"{shard_dir}/{fn}", size, size, *self._compress(path), rebuilt))
+                elif fn.endswith((".gz", ".br")) and not os.path.exists(os.path.join(folder, fn[:-3])):
+                    os.remove(os.path.join(folder, fn))  # sibling of a pruned shard
+        self.save()
+        return self.report
+
+
+def _prune(folder, name, ext, keep):
+    old = re.compile(r"%s\.[0-9a-f]{%d}\.%s" % (re.escape(name), HASH_LEN, ext))
+    for fn in os.listdir(folder):
+        base = fn[:-3] if fn.endswith((".gz", ".br")) else fn
+        if base != keep and old.fullmatch(base):
+            os.remove(os.path.join(folder, fn))
+
+
+def format_report(report):
+    """Human-readable before/after table for ``SiteBuilder.report``."""
+    lines = []
+    totals = [0, 0, 0, 0]
+    for name, before, after, gz, br, rebuilt in report:
+        lines.append(f"{'*' if rebuilt else ' '} {name:<44} {before:>10,} -> {after:>10,}"
+                     + (f"  gz {gz:>9,}" if gz is not None else "") + (f"  br {br:>9,}" if br is not None else ""))
+        totals[0] += before
+        totals[1] += after
+        totals[2] += gz or 0
+        totals[3] += br or 0
+    compressed = any(gz is not None for _, _, _, gz, _, _ in report)
+    lines.append(f"  {'total':<44} {totals[0]:>10,} -> {totals[1]:>10,}"
+                 + (f"  gz {totals[2]:>9,}" if compressed else "")
+                 + ((f"  br {totals[3]:>9,}" if brotli else "  (install brotli for .br files)") if compressed else ""))
+    return "\n".join(lines)
@@ -0,0 +1,78 @@
+import os
+
+import pytest
+
+from catalog import CatalogError, CatalogStore, _read_umask, load_catalog, parse_catalog
+
+
+def error_at(text):
+    with pytest.raises(CatalogError) as info:
+        parse_catalog(text)
+    e = info.value
+    return e.line, e.col, text[e.pos:e.pos + 4]
+
+
+def test_parses_js_literals():
+    text = ("// header\n"
+            "var products = [{id: 1, name: 'it\\'s', price: '12.5', /* note */ category_id: ''}, ];\n"
+            "var categories = [{\"id\": 2, \"name\": \"C\"}];\n"
+            "var other = {a: [1, 2]};\n")
+    products, categories = parse_catalog(text)
+    assert [(p["id"], p["name"], p["price"], p["category_id"], p["stock"]) for p in products] == \
+        [(1, "it's", 12.5, None, 0)]
+    assert categories == [{"id": 2, "name": "C", "image": ""}]
+
+
+@pytest.mark.parametrize("text, where", [
+    # missing comma between two keys, on the third line
+    ('var products = [\n  {"id": 1, "price": 5},\n  {"id": 2, "name": "b" "price": 5}\n];', (3, 25, '"pri')),
+    # bad field values point at the start of their record
+    ("var products = [\n{id: 1, price: 2},\n{name: 'x', price: 1}];", (3, 1, "{nam")),
+    ("var products = [{id: 1, price: 'abc'}];", (1, 17, "{id:")),
+    ('var products = [{"id": 1.5, "price": 1}];', (1, 17, '{"id')),
+    ("var products = [1, 2];", (1, 17, "1, 2")),
+    # NaN / Infinity decode fine but are not numbers a product can have
+    ('var products = [{"id": NaN, "price": 1}];', (1, 17, '{"id')),
+    ('var products = [{"id": 1, "price": 1, "stock": Infinity}];', (1, 17, '{"id')),
+    ("var products = [{id: 1, price: '1e999'}];", (1, 17, "{id:")),
+    ("var categories = {};", (1, 18, "{};")),
+    # strings: at the opening quote or the bad escape, in either quoting style
+    ('var products = [{"id": 1, "name": "open}];', (1, 35, '"ope')),
+    ('var products = [{"id": 1, "name": "a \\q"}];', (1, 38, "\\q\"}")),
+    ("var products = [{id: 1, name: 'a \\q'}];", (1, 34, "\\q'}")),
+    # truncated files
+    ("var products = [\n  {id: 1, price: 3},\n", (3, 1, "")),
+    ("var products = [{", (1, 18, "")),
+    ("var products", (1, 13, "")),
+])
+def test_error_positions(text, where):
+    assert error_at(text) == where
+
+
+def test_error_message_has_path_line_and_column(tmp_path):
+    path = tmp_path / "products.js"
+    path.write_text("var products = [\n  {id: 1 price: 2}\n];", encoding="utf-8")
+    with pytest.raises(CatalogError) as info:
+        load_catalog(str(path))
+    assert str(info.value) == f"{path}:2:10: expected ',' or '}}'"
+
+
+def test_product_index_follows_inserts_and_removals():
+    store = CatalogStore([{"id": i, "name": "", "price": 1} for i in (1, 2, 3)])
+    assert store.product_index(3) == 2
+    store.add_product({"id": 7, "name": "", "price": 1})
+    store.put_product({"id": 5, "name": "", "price": 1}, 0)
+    store.remove_products([2])
+    store.put_product({"id": 9, "name": "", "price": 1})
+    assert [store.product_index(p["id"]) for p in store.products] == [0, 1, 2, 3, 4]
+    assert [p["id"] for p in store.products] == [5, 1, 3, 7, 9]
+    assert store.product_index(2) is None
+
+
+@pytest.mark.skipif(not os.path.exists("/proc/self/status"), reason="umask is read from /proc")
+def test_umask_is_read_without_changing_it():
+    old = os.umask(0o027)
+    try:
+        assert _read_umask() == 0o027
+    finally:
+        os.umask(old)
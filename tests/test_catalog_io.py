@@ -0,0 +1,85 @@
+import io
+
+from catalog import CatalogStore
+from catalog_io import CatalogImporter, RowError, read_rows
+
+
+def make_store():
+    return CatalogStore(
+        [{"id": 1, "sku": "A-1", "name": "Pen", "price": 10, "old_price": None, "stock": 5, "category_id": 1},
+         {"id": 2, "sku": "B-2", "name": "Ink", "price": 20, "old_price": None, "stock": 0, "category_id": 1}],
+        [{"id": 1, "name": "Office", "image": ""}])
+
+
+def run_csv(store, text, **kw):
+    return CatalogImporter(store, **kw).run(read_rows(io.StringIO(text), "csv"))
+
+
+def test_upsert_by_id_and_by_sku():
+    store = make_store()
+    imp = run_csv(store, "id,sku,price,stock\n"
+                         "1,,12,\n"            # by id; blank cells keep the value
+                         ",B-2,25,3\n"         # by sku
+                         ",C-3,7,1\n")         # unknown sku and no name: rejected
+    assert (imp.rows, imp.added, imp.updated, imp.unchanged) == (3, 0, 2, 0)
+    assert [e.line for e in imp.errors] == [4]
+    assert (store.product(1)["price"], store.product(1)["stock"]) == (12, 5)
+    assert (store.product(2)["price"], store.product(2)["stock"]) == (25, 3)
+    assert imp.dirty == {1, 2}
+
+
+def test_id_wins_over_sku_and_sku_can_move():
+    store = make_store()
+    imp = run_csv(store, "id,sku,name,price\n2,A-9,Ink,20\n,A-9,,30\n,A-1,,11\n")
+    assert not imp.errors
+    assert store.product(2)["sku"] == "A-9" and store.product(2)["price"] == 30
+    assert store.product(1)["price"] == 11
+
+
+def test_unknown_id_falls_back_to_sku():
+    store = make_store()
+    imp = run_csv(store, "id,sku,name,price\n7,B-2,Ink,21\n8,Z-8,Nib,2\n")
+    assert not imp.errors and (imp.added, imp.updated) == (1, 1)
+    assert store.product(2)["price"] == 21 and store.product(7) is None
+    assert [p["sku"] for p in store.products].count("B-2") == 1
+    assert store.product(8)["sku"] == "Z-8"
+
+
+def test_adds_new_products_with_sku_lookup_afterwards():
+    store = make_store()
+    imp = run_csv(store, "sku,name,price,category\nN-1,Pad,4,Office\nN-1,,5,\n")
+    assert (imp.added, imp.updated) == (1, 1)
+    pid = store.products[-1]["id"]
+    assert pid == 3 and store.product(pid)["price"] == 5 and store.product(pid)["category_id"] == 1
+
+
+def test_unchanged_rows_are_not_dirty():
+    store = make_store()
+    imp = run_csv(store, "id,price\n1,10\n")
+    assert (imp.unchanged, imp.dirty) == (1, set())
+
+
+def test_bad_row_changes_nothing():
+    store = make_store()
+    before = ([dict(p) for p in store.products], [dict(c) for c in store.categories])
+    imp = run_csv(store, "id,name,price,stock,category,images\n"
+                         "1,Pen,-3,,,\n"                          # negative price
+                         "2,Ink,20,1.5,,\n"                       # fractional stock
+                         "9,New,5,1,Garden,missing.jpg\n",        # new category, then a missing image
+                  create_categories=True)
+    assert [str(e) for e in imp.errors] == ["line 2: price cannot be negative",
+                                           "line 3: stock must be a whole number, not 1.5",
+                                           "line 4: image not found: 'missing.jpg'"]
+    assert ([dict(p) for p in store.products], [dict(c) for c in store.categories]) == before
+    assert store.category_by_name("Garden") is None
+    assert imp.added == imp.updated == 0 and not imp.dirty
+    assert store.add_category("Garden")["id"] == 2      # the rejected row took no category id
+
+
+def test_jsonl_decode_errors_do_not_stop_the_import():
+    store = make_store()
+    rows = read_rows(io.StringIO('{"id": 1, "price": "1,250"}\n{oops\n[1]\n{"sku": "B-2", "old_price": null}\n'), "jsonl")
+    imp = CatalogImporter(store).run(rows)
+    assert [e.line for e in imp.errors] == [2, 3]
+    assert all(isinstance(e, RowError) for e in imp.errors)
+    assert store.product(1)["price"] == 1250 and imp.updated == 1 and imp.unchanged == 1
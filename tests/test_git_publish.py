@@ -0,0 +1,136 @@
+import subprocess
+
+import pytest
+
+from git_publish import GitPublisher
+
+SITE = ["index.html", "assets"]
+
+
+def git(cwd, *args):
+    return subprocess.run(["git", *args], cwd=cwd, check=True, capture_output=True).stdout
+
+
+def write(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding="utf-8")
+
+
+@pytest.fixture
+def repos(tmp_path, monkeypatch):
+    """(work tree, bare remote): the work tree has pushed one commit to main."""
+    monkeypatch.setenv("HOME", str(tmp_path))  # no user git config
+    monkeypatch.setenv("GIT_CONFIG_NOSYSTEM", "1")
+    for who in ("AUTHOR", "COMMITTER"):
+        monkeypatch.setenv(f"GIT_{who}_NAME", "Test")
+        monkeypatch.setenv(f"GIT_{who}_EMAIL", "test@example.com")
+    remote, work = tmp_path / "remote.git", tmp_path / "work"
+    git(tmp_path, "init", "-q", "--bare", "-b", "main", str(remote))
+    git(tmp_path, "init", "-q", "-b", "main", str(work))
+    write(work / "index.html", "<h1>v1</h1>")
+    write(work / "assets" / "a.txt", "a")
+    write(work / "notes.txt", "notes v1")
+    write(work / "draft.txt", "draft v1")
+    git(work, "add", ".")
+    git(work, "commit", "-q", "-m", "init")
+    git(work, "push", "-q", str(remote), "main")
+    return work, remote
+
+
+def user_edits(work):
+    # Work of the developer's that publishing must not touch
+    write(work / "notes.txt", "notes v2")
+    git(work, "add", "notes.txt")
+    write(work / "draft.txt", "draft v2")
+    write(work / "scratch.txt", "untracked")
+
+
+def user_state(work):
+    return (git(work, "diff", "--cached", "--", "notes.txt", "draft.txt"),
+            git(work, "diff", "--", "notes.txt", "draft.txt"),
+            git(work, "status", "--porcelain", "--", "notes.txt", "draft.txt", "scratch.txt"))
+
+
+def remote_file(remote, path):
+    return git(remote, "show", f"main:{path}").decode()
+
+
+def test_publish_commits_only_site_files(repos):
+    work, remote = repos
+    user_edits(work)
+    before = user_state(work)
+    write(work / "index.html", "<h1>v2</h1>")
+    write(work / "assets" / "b.txt", "b")
+
+    report = GitPublisher(str(work), SITE, remote=str(remote)).publish("update")
+
+    assert report["ok"], report["error"]
+    assert report["files"] == 2 and report["attempts"] == 1
+    assert remote_file(remote, "index.html") == "<h1>v2</h1>"
+    assert remote_file(remote, "assets/b.txt") == "b"
+    assert remote_file(remote, "notes.txt") == "notes v1"
+    assert user_state(work) == before
+    assert git(work, "status", "--porcelain", "--", *SITE) == b""
+
+
+def test_publish_keeps_staged_site_changes(repos):
+    work, remote = repos
+    write(work / "index.html", "<h1>staged</h1>")
+    git(work, "add", "index.html")
+    write(work / "index.html", "<h1>v2</h1>")
+    write(work / "assets" / "a.txt", "a2")
+
+    report = GitPublisher(str(work), SITE, remote=str(remote)).publish("update")
+
+    assert report["ok"], report["error"]
+    assert remote_file(remote, "index.html") == "<h1>v2</h1>"
+    assert git(work, "show", ":index.html") == b"<h1>staged</h1>"
+    assert git(work, "status", "--porcelain", "--", "assets") == b""
+
+
+def test_publish_refuses_other_branches(repos):
+    work, remote = repos
+    git(work, "checkout", "-q", "-b", "feature")
+    write(work / "index.html", "<h1>wip</h1>")
+
+    report = GitPublisher(str(work), SITE, remote=str(remote)).publish("update")
+
+    assert not report["ok"] and "feature is checked out, not main" in report["error"]
+    assert remote_file(remote, "index.html") == "<h1>v1</h1>"
+    assert git(work, "status", "--porcelain", "--", "index.html") == b" M index.html\n"
+
+
+def test_publish_without_changes(repos):
+    work, remote = repos
+    user_edits(work)
+    before = user_state(work)
+    head = git(work, "rev-parse", "HEAD")
+
+    report = GitPublisher(str(work), SITE, remote=str(remote)).publish()
+
+    assert report["ok"], report["error"]
+    assert report["files"] == 0 and report["commit"] is None
+    assert git(work, "rev-parse", "HEAD") == head
+    assert user_state(work) == before
+
+
+def test_rejected_push_rebases_and_retries(repos, tmp_path):
+    work, remote = repos
+    other = tmp_path / "other"
+    git(tmp_path, "clone", "-q", str(remote), str(other))
+    write(other / "assets" / "c.txt", "c")
+    git(other, "add", ".")
+    git(other, "commit", "-q", "-m", "from elsewhere")
+    git(other, "push", "-q", "origin", "main")
+    user_edits(work)
+    before = user_state(work)
+    write(work / "index.html", "<h1>v2</h1>")
+
+    report = GitPublisher(str(work), SITE, remote=str(remote), backoff=0).publish("update")
+
+    assert report["ok"], report["error"]
+    assert report["attempts"] == 2 and "rebase" in report["timings"]
+    assert remote_file(remote, "index.html") == "<h1>v2</h1>"
+    assert remote_file(remote, "assets/c.txt") == "c"
+    assert git(work, "rev-parse", "HEAD") == git(remote, "rev-parse", "main")
+    assert user_state(work) == before
@@ -0,0 +1,177 @@
+import copy
+import json
+
+import pytest
+
+import journal
+from catalog import CatalogStore, CatalogWriter
+from journal import Journal
+
+PRODUCTS = [{"id": i, "name": f"p{i}", "price": i * 10, "old_price": None, "stock": i, "category_id": 1,
+             "description": "", "images": [], "image": ""} for i in range(1, 6)]
+CATEGORIES = [{"id": 1, "name": "C", "image": ""}]
+
+
+@pytest.fixture
+def site(tmp_path):
+    """(products.js path, journal folder) with five products written."""
+    path = str(tmp_path / "products.js")
+    CatalogWriter(path).write(copy.deepcopy(PRODUCTS), copy.deepcopy(CATEGORIES))
+    return path, str(tmp_path / "journal")
+
+
+def start(site):
+    store, j = CatalogStore(), Journal(site[1])
+    return store, j, j.open(store, site[0])
+
+
+def set_price(j, store, pid, price):
+    tx = j.begin(store, f"price {pid}")
+    tx.touch_product(pid)
+    store.update_product(pid, {"price": price})
+    return j.commit(tx)
+
+
+def add(j, store, name):
+    tx = j.begin(store, "add")
+    pid = store.add_product({"name": name, "price": 1, "category_id": 1})
+    tx.created_product(pid)
+    j.commit(tx)
+    return pid
+
+
+def delete(j, store, pids):
+    tx = j.begin(store, "delete")
+    tx.touch_products(pids)
+    store.remove_products(pids)
+    j.commit(tx)
+
+
+def flush(j, store, path):
+    writer = CatalogWriter(path)
+    writer.write(store.products, store.categories)
+    j.checkpoint(store, writer.digest)
+
+
+def state(store):
+    return [(p["id"], p["price"]) for p in store.products], [c["id"] for c in store.categories]
+
+
+def test_replays_unwritten_edits_after_a_crash(site):
+    store, j, source = start(site)
+    assert source == "catalog"
+    assert set_price(j, store, 2, 99) == {2}
+    pid = add(j, store, "new")
+    delete(j, store, [1, 4])
+    expected = state(store)
+    j.close()  # no checkpoint: products.js never got these
+
+    store, j, source = start(site)
+    assert source == "journal"
+    assert state(store) == expected and j.unflushed
+    assert j.undo_label() == "delete"
+    assert store.product(pid)["name"] == "new"
+
+
+def test_undo_redo_survive_a_restart(site):
+    store, j, _ = start(site)
+    original = state(store)
+    set_price(j, store, 2, 99)
+    delete(j, store, [1, 3])
+    edited = state(store)
+    assert j.undo(store)[0] == "delete"
+    assert j.undo(store)[0] == "price 2"
+    assert state(store) == original  # deleted products are back in their places
+    assert j.redo(store)[0] == "price 2"
+    j.close()
+
+    store, j, _ = start(site)
+    assert store.product(2)["price"] == 99 and store.product(1) is not None
+    assert j.redo(store)[0] == "delete"
+    assert state(store) == edited
+    assert j.redo(store) is None
+    set_price(j, store, 5, 7)
+    assert j.redo_stack == []  # a new edit drops what could be redone
+
+
+def test_torn_last_line_is_dropped(site):
+    store, j, _ = start(site)
+    set_price(j, store, 2, 99)
+    set_price(j, store, 3, 77)
+    j.close()
+    with open(j.ops_path, "rb+") as f:
+        data = f.read()
+        f.truncate(len(data) - 10)  # the crash hit mid-write
+
+    store, j, source = start(site)
+    assert source == "journal"
+    assert (store.product(2)["price"], store.product(3)["price"]) == (99, 30)
+    set_price(j, store, 4, 1)  # appends after the cut, not after the torn bytes
+    j.close()
+    store, j, _ = start(site)
+    assert store.product(4)["price"] == 1
+
+
+def test_checkpoint_and_outside_change(site):
+    path = site[0]
+    store, j, _ = start(site)
+    set_price(j, store, 2, 99)
+    flush(j, store, path)
+    assert not j.unflushed
+    j.close()
+
+    store, j, source = start(site)
+    assert source == "journal" and not j.unflushed and store.product(2)["price"] == 99
+
+    j.close()
+    CatalogWriter(path).write([PRODUCTS[0]], CATEGORIES)  # e.g. a git pull
+    store, j, source = start(site)
+    assert source == "catalog" and state(store) == ([(1, 10)], [1])
+    assert j.undo(store) is None
+
+
+def test_compaction_keeps_recent_undo_and_replays_after_a_crash(site, monkeypatch):
+    monkeypatch.setattr(journal, "SNAPSHOT_EVERY", 4)
+    monkeypatch.setattr(journal, "UNDO_DEPTH", 2)
+    path = site[0]
+    store, j, _ = start(site)
+    for price in range(101, 106):
+        set_price(j, store, 1, price)
+    flush(j, store, path)
+    assert j.since_snapshot == 0
+    with open(j.snapshot_path, encoding="utf-8") as f:
+        assert json.load(f)["products"][0]["price"] == 105
+    with open(j.ops_path, "rb") as f:
+        assert len(f.read().splitlines()) == 2  # the last UNDO_DEPTH edits
+    set_price(j, store, 3, 333)
+    j.close()  # crash before the next write
+
+    store, j, source = start(site)
+    assert source == "journal" and j.unflushed
+    assert (store.product(1)["price"], store.product(3)["price"]) == (105, 333)
+    assert j.undo(store)[0] == "price 3"
+    assert j.undo(store)[0] == "price 1" and store.product(1)["price"] == 104
+    assert j.undo(store)[0] == "price 1" and store.product(1)["price"] == 103
+    assert j.undo(store) is None
+
+
+def test_compaction_waits_while_something_can_be_redone(site, monkeypatch):
+    monkeypatch.setattr(journal, "SNAPSHOT_EVERY", 2)
+    store, j, _ = start(site)
+    set_price(j, store, 1, 11)
+    set_price(j, store, 1, 12)
+    j.undo(store)
+    flush(j, store, site[0])
+    assert j.since_snapshot == 3
+    assert j.redo(store)[0] == "price 1" and store.product(1)["price"] == 12
+
+
+def test_pending_base_and_rebase(site):
+    store, j, _ = start(site)
+    set_price(j, store, 2, 50)
+    set_price(j, store, 2, 60)
+    pid = add(j, store, "new")
+    base = j.pending_base()
+    assert base[("p", 2)]["price"] == 20 and base[("p", pid)] is None
+    j.rebase(store, "digest")
+    assert j.pending_base() == {} and j.undo(store) is None and not j.unflushed
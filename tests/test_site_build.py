@@ -0,0 +1,49 @@
+import os
+
+from site_build import SiteBuilder, copy_site, minify_html
+
+
+def write(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding="utf-8")
+
+
+def test_copy_site_mirrors_sources(tmp_path):
+    src, out = tmp_path / "src", tmp_path / "dist"
+    write(src / "index.html", "<html>")
+    write(src / "styles" / "index.css", "a{}")
+    write(src / "styles" / ".tmp-1", "partial")
+    write(src / "assets" / "a.png", "png")
+    write(src / "assets" / "manifest.json", "{}")
+    paths = ["index.html", "styles", "assets"]
+
+    assert copy_site(str(src), str(out), paths, skip=["assets/manifest.json"]) == 3
+    assert sorted(os.listdir(out / "assets")) == ["a.png"]
+    assert not (out / "styles" / ".tmp-1").exists()
+    assert copy_site(str(src), str(out), paths, skip=["assets/manifest.json"]) == 0
+
+    # Sources that are gone go, what the build wrote next to them stays
+    write(out / "styles" / "index.0123456789.css", "a{}")
+    os.remove(src / "assets" / "a.png")
+    copy_site(str(src), str(out), paths)
+    assert sorted(os.listdir(out / "styles")) == ["index.0123456789.css", "index.css"]
+    assert sorted(os.listdir(out / "assets")) == ["manifest.json"]
+
+
+def test_minify_html_keeps_raw_blocks():
+    src = ('<div>\n    <!-- note -->\n    <p>a   b</p>\n</div>\n<pre>  x\n    y</pre>\n'
+           '<script type="application/ld+json">{"a":  1}</script>\n<script>\n  // c\n  f( 1 );\n</script>\n')
+    assert minify_html(src) == ('<div>\n<p>a b</p>\n</div>\n<pre>  x\n    y</pre>\n'
+                                '<script type="application/ld+json">{"a":  1}</script>\n<script>f(1);</script>\n')
+
+
+def test_fingerprint_index_rewrites_meta_content(tmp_path):
+    write(tmp_path / "index.html", '<meta name="search-index" content="scripts/search-index.js">\n'
+                                   '<script src="scripts/app.js?v=3"></script>\n')
+    write(tmp_path / "scripts" / "search-index.js", "var searchIndex = {};")
+    write(tmp_path / "scripts" / "app.js", "init( );\n")
+
+    assert SiteBuilder(str(tmp_path), str(tmp_path / "cache.json")).fingerprint_index()
+    html = (tmp_path / "index.html").read_text(encoding="utf-8")
+    app, index = sorted(n for n in os.listdir(tmp_path / "scripts") if n.count(".") == 2)
+    assert f'content="scripts/{index}"' in html and f'src="scripts/{app}"' in html
@@ -0,0 +1,173 @@
+"""Small previews of catalog images for the dashboard.
+
+Decoding a full-size photo takes tens of milliseconds, so it never happens
+on the Tk thread: ``get(path, on_ready)`` returns the PNG bytes at once
+when they are in memory and otherwise decodes in a worker thread and calls
+``on_ready(data)`` from there (data is None when the file can't be read).
+Callers marshal that back to Tk and build the PhotoImage themselves.
+
+Decoded thumbnails live in an LRU bounded by bytes, keyed by
+(path, mtime), so a replaced file is never shown stale.  With
+``cache_dir`` they are also written there as small PNGs and read back
+instead of decoding again, which keeps restarts cheap.  JPEGs are
+downscaled by the decoder itself (``Image.draft``), and callers pass the
+"thumb" variant of an imported image when it has one.  Pillow is
+optional: without it ``available()`` is False and there are no previews.
+"""
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+EDGE = 96                  # longest edge in pixels
+DISK_MAX_BYTES = 256 << 20  # on-disk cache is pruned to this at startup
+
+
+def available():
+    return Image is not None
+
+
+def render_thumbnail(path, edge=EDGE):
+    """PNG bytes of ``path`` scaled to fit ``edge`` x ``edge``."""
+    with Image.open(path) as im:
+        im.draft("RGB", (edge, edge))  # JPEG: decode at 1/2..1/8 scale straight away
+        im = ImageOps.exif_transpose(im)
+        if im.mode not in ("RGB", "RGBA"):
+            im = im.convert("RGBA" if "transparency" in im.info or im.mode in ("LA", "P") else "RGB")
+        im.thumbnail((edge, edge))
+        buf = io.BytesIO()
+        im.save(buf, "PNG")
+        return buf.getvalue()
+
+
+class ThumbnailCache:
+    def __init__(self, cache_dir=None, max_bytes=32 << 20, edge=EDGE, workers=2, metrics=None, render=render_thumbnail):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.edge = edge
+        self.metrics = metrics
+        self.render = render
+        self.nbytes = 0
+        self.stats = {"hits": 0, "disk": 0, "decoded": 0, "failed": 0}
+        self._lru = OrderedDict()  # (path, mtime_ns) -> PNG bytes, oldest first
+        self._waiting = {}         # key -> callbacks of requests in flight
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="thumbs")
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            self._pool.submit(self.prune_disk, DISK_MAX_BYTES)
+
+    def get(self, path, on_ready):
+        try:
+            key = (path, os.stat(path).st_mtime_ns)
+        except OSError:
+            return None
+        with self._lock:
+            data = self._lru.get(key)
+            if data is not None:
+                self._lru.move_to_end(key)
+                self.stats["hits"] += 1
+                return data
+            waiting = self._waiting.get(key)
+            self._waiting.setdefault(key, []).append(on_ready)
+        if waiting is None:
+            self._pool.submit(self._load, key)
+        return None
+
+    def _load(self, key):
+        data = None
+        try:
+            data = self._from_disk(key)
+            if data is None:
+                data = self._decode(key)
+        finally:
+            with self._lock:
+                if data is not None:
+                    self._put(key, data)
+                callbacks = self._waiting.pop(key, [])
+            for cb in callbacks:
+                cb(data)
+
+    def _decode(self, key):
+        path = key[0]
+        try:
+            if self.metrics:
+                with self.metrics.span("thumbnail_decode") as m:
+                    data = self.render(path, self.edge)
+                    m["bytes"] = os.path.getsize(path)
+            else:
+                data = self.render(path, self.edge)
+        except (OSError, ValueError):  # unreadable or not an image (PIL raises OSError subclasses)
+            with self._lock:
+                self.stats["failed"] += 1
+            return None
+        with self._lock:
+            self.stats["decoded"] += 1
+        self._to_disk(key, data)
+        return data
+
+    def _put(self, key, data):
+        old = self._lru.pop(key, None)
+        if old is not None:
+            self.nbytes -= len(old)
+        self._lru[key] = data
+        self.nbytes += len(data)
+        while self.nbytes > self.max_bytes and len(self._lru) > 1:
+            _, dropped = self._lru.popitem(last=False)
+            self.nbytes -= len(dropped)
+
+    # --- On-disk cache ---
+    def _disk_path(self, key):
+        name = hashlib.sha1(f"{key[0]}|{key[1]}|{self.edge}".encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, name + ".png")
+
+    def _from_disk(self, key):
+        if not self.cache_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)  # pruning drops the least recently used files
+        except OSError:
+            return None
+        with self._lock:
+            self.stats["disk"] += 1
+        return data
+
+    def _to_disk(self, key, data):
+        if not self.cache_dir:
+            return
+        path = self._disk_path(key)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)  # a cache file is complete or absent, no fsync needed
+        except OSError:
+            pass
+
+    def prune_disk(self, max_bytes):
+        """Delete the least recently used cache files beyond ``max_bytes``."""
+        try:
+            entries = sorted(os.scandir(self.cache_dir), key=lambda e: e.stat().st_mtime, reverse=True)
+        except OSError:
+            return
+        total = 0
+        for e in entries:
+            total += e.stat().st_size
+            if total > max_bytes or e.name.endswith(".tmp"):
+                try:
+                    os.remove(e.path)
+                except OSError:
+                    pass
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False)
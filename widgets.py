@@ -0,0 +1,163 @@
+"""Tk helpers shared by the dashboard pages."""
+
+
+class VirtualTreeview:
+    """Drive a ttk.Treeview that only holds the rows currently on screen.
+
+    The full (filtered) row order lives in ``keys``; the Treeview itself only
+    ever contains the visible window, and the scrollbar is driven from here.
+    Re-rendering diffs the window against the items already in the widget,
+    so a new filter or a data refresh touches only the rows that changed.
+    Item iids are ``str(key)``; the row whose key equals ``marked`` gets the
+    "marked" tag so it stays highlighted when it scrolls back into view
+    (re-selecting it would fire <<TreeviewSelect>> again).
+
+    ``picked`` is a multi-row selection kept by key, so it survives scrolling
+    (Treeview's own selection only covers rows that currently exist).
+    Ctrl+click toggles a row, Shift+click extends from ``anchor``; picked
+    rows get the "picked" tag and ``on_pick(picked)`` is called on change.
+    """
+
+    def __init__(self, tree, scrollbar, row_fn, row_height=35):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.row_fn = row_fn
+        self.row_height = row_height
+        self.keys = []
+        self.offset = 0
+        self.visible = 20
+        self.marked = None
+        self.picked = set()
+        self.anchor = None
+        self.on_pick = None
+        self._values = {}
+        self._window = {}  # iid -> key of the rows in the widget
+
+        scrollbar.configure(command=self.yview)
+        tree.configure(yscrollcommand="")
+        tree.bind("<Configure>", self._on_resize, add="+")
+        for seq in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            tree.bind(seq, self._on_wheel)
+        for seq, step in (("<Up>", -1), ("<Down>", 1)):
+            tree.bind(seq, lambda e, s=step: self._on_key(s))
+        for seq, step in (("<Prior>", -1), ("<Next>", 1)):
+            tree.bind(seq, lambda e, s=step: self._on_key(s * self.visible))
+        tree.bind("<Control-Button-1>", self._on_ctrl_click)
+        tree.bind("<Shift-Button-1>", self._on_shift_click)
+
+    def set_rows(self, keys):
+        self.keys = list(keys)
+        self.offset = max(0, min(self.offset, len(self.keys) - self.visible))
+        self.render()
+
+    def render(self):
+        window = self.keys[self.offset:self.offset + self.visible]
+        wanted = self._window = {str(k): k for k in window}
+        tree = self.tree
+        for iid in tree.get_children():
+            if iid not in wanted:
+                tree.delete(iid)
+                self._values.pop(iid, None)
+        for idx, (iid, key) in enumerate(wanted.items()):
+            tags = ("marked",) * (key == self.marked) + ("picked",) * (key in self.picked)
+            vals = (tuple(self.row_fn(key)), tags)
+            if tree.exists(iid):
+                if self._values.get(iid) != vals:
+                    tree.item(iid, values=vals[0], tags=tags)
+                if tree.index(iid) != idx:
+                    tree.move(iid, "", idx)
+            else:
+                tree.insert("", idx, iid=iid, values=vals[0], tags=tags)
+            self._values[iid] = vals
+        total = len(self.keys)
+        if total:
+            self.scrollbar.set(self.offset / total, min(1.0, (self.offset + self.visible) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def scroll_to(self, offset):
+        offset = max(0, min(int(offset), len(self.keys) - self.visible))
+        if offset != self.offset:
+            self.offset = offset
+            self.render()
+
+    def see(self, key):
+        """Scroll so ``key`` is on screen; returns False if it is filtered out."""
+        try:
+            idx = self.keys.index(key)
+        except ValueError:
+            return False
+        if not self.offset <= idx < self.offset + self.visible:
+            self.scroll_to(idx - self.visible // 2)
+        return True
+
+    def pick(self, keys):
+        """Replace the multi-row selection."""
+        self.picked = set(keys)
+        self.render()
+        if self.on_pick:
+            self.on_pick(self.picked)
+
+    def _on_ctrl_click(self, event):
+        key = self._window.get(self.tree.identify_row(event.y))
+        if key is not None:
+            self.anchor = key
+            self.pick(self.picked ^ {key})
+        return "break"
+
+    def _on_shift_click(self, event):
+        key = self._window.get(self.tree.identify_row(event.y))
+        if key is None:
+            return "break"
+        if self.anchor not in self.picked or self.anchor not in self.keys:
+            return self._on_ctrl_click(event)
+        i, j = self.keys.index(self.anchor), self.keys.index(key)
+        if i > j:
+            i, j = j, i
+        self.pick(self.picked | set(self.keys[i:j + 1]))
+        return "break"
+
+    def yview(self, *args):
+        if args and args[0] == "moveto":
+            self.scroll_to(float(args[1]) * len(self.keys))
+        elif args and args[0] == "scroll":
+            step = int(args[1]) * (self.visible if args[2] == "pages" else 1)
+            self.scroll_to(self.offset + step)
+
+    def _on_resize(self, event):
+        top = 30  # heading height until a real row can be measured
+        children = self.tree.get_children()
+        if children:
+            box = self.tree.bbox(children[0])
+            if box:
+                top = box[1]
+        visible = max(1, (event.height - top) // self.row_height)
+        if visible != self.visible:
+            self.visible = visible
+            self.set_rows(self.keys)
+
+    def _on_wheel(self, event):
+        if event.num == 4 or getattr(event, "delta", 0) > 0:
+            self.scroll_to(self.offset - 3)
+        else:
+            self.scroll_to(self.offset + 3)
+        return "break"
+
+    def _on_key(self, step):
+        # Let the Treeview move the cursor inside the window, take over at
+        # the edges so keyboard navigation scrolls through the whole list.
+        focus = self.tree.focus()
+        if not focus or not self.keys:
+            return None
+        idx = self.offset + self.tree.index(focus) + step
+        if self.offset <= idx < self.offset + len(self.tree.get_children()):
+            return None
+        idx = max(0, min(idx, len(self.keys) - 1))
+        if idx < self.offset:
+            self.scroll_to(idx)
+        elif idx >= self.offset + self.visible:
+            self.scroll_to(idx - self.visible + 1)
+        iid = str(self.keys[idx])
+        self.tree.selection_set(iid)
+        self.tree.focus(iid)
+        return "break"